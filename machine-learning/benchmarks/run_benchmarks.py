@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""Per-stage benchmarks for the ML pipeline.
+
+Usage
+-----
+python benchmarks/run_benchmarks.py [--frames 30] [--size 480] [--repeat 5]
+        [--image face.jpg] [--out results.json]
+        [--baseline baseline.json] [--tolerance 0.25] [--fail-on-regression]
+
+Stages (each timed ``--repeat`` times after one warm-up):
+
+    io.json_encode / io.json_decode      frame payload as base64 JSON
+    io.container_write / container_read  same payload as a frame container
+    decode                               `_decode_frame`, per frame
+    landmarks.face_mesh / hands / pose   MediaPipe solver, per frame
+    crop_transform                       `DecodedFrame.crop` + `crops_to_tensor`, per frame
+    forward.<behavior>                   model forward on a ready tensor, per sequence
+    predict.<behavior>                   end-to-end `_predict`, per request
+    batch                                `analyze_batch` over one entry per behaviour
+
+Each stage reports the number of samples, mean / p50 / p95 / p99 latency in
+ms, throughput in items per second and the process peak RSS after the stage.
+Synthetic frames contain nobody, so image behaviours end early with an
+``insufficient_*`` result unless ``--image`` points to a photo of a person.
+Models without weights are listed as ``skipped`` in their forward stage.
+
+With ``--baseline`` every stage's p50 is compared with a previous results
+file; a stage slower by more than ``--tolerance`` is listed as a regression.
+The feature cache is disabled (ML_CACHE_MB=0) unless ``--cache`` is given,
+otherwise every repeat after the first would be a cache hit.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "utils"))
+sys.path.insert(0, HERE)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _summary(samples_ms: List[float], items: int) -> Dict[str, Any]:
+    import numpy as np
+
+    arr = np.asarray(samples_ms)
+    total_s = arr.sum() / 1000
+    return {
+        "samples": len(arr),
+        "items_per_sample": items,
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "throughput_per_s": round(len(arr) * items / total_s, 2) if total_s else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+class Bench:
+    """Collects stage results in insertion order."""
+
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def stage(self, name: str, fn: Callable[[], Any], items: int = 1, per_item: List[Any] | None = None) -> None:
+        """Time ``fn()`` ``repeat`` times, or ``fn(x)`` for every x of ``per_item``."""
+
+        try:
+            samples = []
+            if per_item is not None:
+                fn(per_item[0])  # warm-up
+                for _ in range(self.repeat):
+                    for x in per_item:
+                        t0 = time.perf_counter()
+                        fn(x)
+                        samples.append((time.perf_counter() - t0) * 1000)
+            else:
+                fn()
+                for _ in range(self.repeat):
+                    t0 = time.perf_counter()
+                    fn()
+                    samples.append((time.perf_counter() - t0) * 1000)
+            self.stages[name] = _summary(samples, items)
+        except Exception as exc:
+            self.stages[name] = {"error": str(exc)}
+        print(f"{name}: {self.stages[name]}", file=sys.stderr)
+
+    def skip(self, name: str, reason: str) -> None:
+        """Record a stage that cannot run (e.g. a model without weights)."""
+
+        self.stages[name] = {"skipped": reason}
+        print(f"{name}: skipped ({reason})", file=sys.stderr)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """p50 ratio current / baseline per stage present in both."""
+
+    ratios, regressions = {}, []
+    for name, stage in results["stages"].items():
+        ref = baseline.get("stages", {}).get(name)
+        if not ref or "p50_ms" not in ref or "p50_ms" not in stage or not ref["p50_ms"]:
+            continue
+        ratio = round(stage["p50_ms"] / ref["p50_ms"], 3)
+        ratios[name] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return {"tolerance": tolerance, "p50_ratio": ratios, "regressions": regressions}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if not args.cache:
+        os.environ["ML_CACHE_MB"] = "0"
+
+    t0 = time.perf_counter()
+    import torch
+
+    import ml_analyzer
+    from batch_analyzer import analyze_batch
+    from frame_container import read_container, write_container
+    from image_batch import crops_to_tensor
+    from model_loader import ModelUnavailableError
+    from synthetic import jpeg_frames, landmark_sequence, wpm_sequence
+
+    import_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ml_analyzer.load_all_models()
+    load_s = time.perf_counter() - t0
+
+    frames = jpeg_frames(args.frames, args.size, image=args.image)
+    wpm = wpm_sequence(args.frames)
+    landmarks = landmark_sequence(args.frames)
+    bench = Bench(args.repeat)
+
+    # -- JSON / container I/O ------------------------------------------------
+    payload = {"eye_gaze": frames}
+    encoded = json.dumps(payload)
+    bench.stage("io.json_encode", lambda: json.dumps(payload))
+    bench.stage("io.json_decode", lambda: json.loads(encoded))
+    raw_payload = {"eye_gaze": [ml_analyzer._frame_bytes(f) for f in frames]}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payload.bin")
+        bench.stage("io.container_write", lambda: write_container(path, raw_payload))
+        bench.stage("io.container_read", lambda: read_container(path))
+
+    # -- Per-frame stages ----------------------------------------------------
+    bench.stage("decode", ml_analyzer._decode_frame, per_item=frames)
+    decoded = [ml_analyzer._decode_frame(f) for f in frames]
+    rgbs = [d.rgb for d in decoded]
+    bench.stage("landmarks.face_mesh", ml_analyzer._detect_face, per_item=rgbs)
+    bench.stage("landmarks.hands", ml_analyzer._detect_hand, per_item=rgbs)
+    bench.stage("landmarks.pose", ml_analyzer._detect_pose, per_item=rgbs)
+
+    def crop_transform(frame):
+        crop = frame.crop([0.35, 0.65], [0.35, 0.5], 10)
+        return crops_to_tensor([crop])
+
+    bench.stage("crop_transform", crop_transform, per_item=decoded)
+
+    # -- Model forward on ready tensors ----------------------------------------
+    image_seq = torch.rand(1, args.frames, 3, ml_analyzer.IMAGE_SIZE, ml_analyzer.IMAGE_SIZE)
+    inputs = {
+        "rapid_talking": torch.tensor(wpm, dtype=torch.float32).view(1, -1, 1),
+        "sit_stand": torch.tensor(landmarks, dtype=torch.float32).unsqueeze(0),
+        "eye_gaze": image_seq,
+        "tapping_hands": image_seq,
+        "tapping_feet": image_seq,
+    }
+    for behavior, x in inputs.items():
+        try:
+            model = ml_analyzer.get_model(behavior)
+        except ModelUnavailableError as exc:
+            bench.skip(f"forward.{behavior}", str(exc))
+            continue
+
+        def forward(model=model, x=x):
+            with torch.inference_mode():
+                return model(x)
+
+        bench.stage(f"forward.{behavior}", forward)
+
+    # -- End to end ----------------------------------------------------------
+    requests = {
+        "rapid_talking": wpm,
+        "sit_stand": landmarks,
+        "sit_stand_frames": frames,
+        "eye_gaze": frames,
+        "tapping_hands": frames,
+        "tapping_feet": frames,
+        "all": frames,
+    }
+    results = {}
+    for name, data in requests.items():
+        behavior = "sit_stand" if name == "sit_stand_frames" else name
+        bench.stage(f"predict.{name}", lambda b=behavior, d=data: ml_analyzer._predict(b, d))
+        results[name] = ml_analyzer._predict(behavior, data)
+
+    entries = [{"type": b, "data": d} for b, d in requests.items() if b not in ("all", "sit_stand_frames")]
+    bench.stage("batch", lambda: analyze_batch(entries), items=len(entries))
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "frames": args.frames,
+            "size": args.size,
+            "repeat": args.repeat,
+            "image": args.image,
+            "cache": args.cache,
+            "backend": os.environ.get("ML_BACKEND", "eager"),
+        },
+        "startup": {"import_s": round(import_s, 3), "load_models_s": round(load_s, 3)},
+        "stages": bench.stages,
+        "results": results,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the ML pipeline stage by stage")
+    parser.add_argument("--frames", type=int, default=30, help="Frames / sequence length per request")
+    parser.add_argument("--size", type=int, default=480, help="Frame edge in pixels")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--image", help="Pan over this photo instead of synthetic frames")
+    parser.add_argument("--cache", action="store_true", help="Keep the feature cache enabled")
+    parser.add_argument("--out", help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="Previous results file to compare p50 latencies with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50 slowdown vs baseline")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fp:
+            results["comparison"] = compare(results, json.load(fp), args.tolerance)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fp:
+            fp.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+    if args.fail_on_regression and results.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Synthetic inputs for the benchmarks: JPEG frames, WPM and pose sequences.
+
+Frames are smooth gradients with moving blobs and a little noise, JPEG
+encoded like a browser capture, so decode and landmark costs are realistic
+even though MediaPipe finds nobody in them.  Pass ``image`` to pan over a real
+photo instead when the crop and end-to-end stages should see detections.
+"""
+
+import base64
+import io
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+
+def _data_url(img: Image.Image, quality: int) -> str:
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def jpeg_frames(
+    n: int,
+    size: int = 480,
+    *,
+    seed: int = 0,
+    quality: int = 85,
+    image: str | None = None,
+) -> List[str]:
+    """`n` consecutive ``size``×``size`` frames as base64 JPEG data-URLs."""
+
+    if image is not None:
+        src = Image.open(image).convert("RGB")
+        side = int(min(src.size) * 0.9)
+        travel = max(1, min(src.size) - side)
+        frames = []
+        for i in range(n):
+            off = i % travel
+            crop = src.crop((off, off // 2, off + side, off // 2 + side)).resize((size, size))
+            frames.append(_data_url(crop, quality))
+        return frames
+
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    base = np.stack([xx, yy, 1.0 - xx * yy], axis=-1) * 180.0 + 40.0
+    centers = rng.random((3, 2)) * size
+    velocity = (rng.random((3, 2)) - 0.5) * 8.0
+    frames = []
+    for i in range(n):
+        frame = base.copy()
+        for (cx, cy), (vx, vy) in zip(centers, velocity):
+            px, py = (cx + vx * i) % size, (cy + vy * i) % size
+            blob = np.exp(-(((xx * size - px) ** 2 + (yy * size - py) ** 2) / (2 * (size / 12) ** 2)))
+            frame += blob[..., None] * 60.0
+        frame += rng.normal(0.0, 4.0, frame.shape)
+        frames.append(_data_url(Image.fromarray(np.clip(frame, 0, 255).astype(np.uint8)), quality))
+    return frames
+
+
+def wpm_sequence(n: int, *, seed: int = 0) -> List[float]:
+    """`n` words-per-minute values drifting around a speaking rate."""
+
+    rng = np.random.default_rng(seed)
+    return (140.0 + np.cumsum(rng.normal(0.0, 6.0, n))).round(1).tolist()
+
+
+def landmark_sequence(n: int, *, seed: int = 0) -> List[List[float]]:
+    """`n` frames of 33 normalised (x, y) pose landmarks with small jitter."""
+
+    rng = np.random.default_rng(seed)
+    pose = rng.random(66) * 0.6 + 0.2
+    steps = rng.normal(0.0, 0.004, (n, 66)).cumsum(axis=0)
+    return np.clip(pose + steps, 0.0, 1.0).round(5).tolist()
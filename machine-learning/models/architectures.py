@@ -8,18 +8,38 @@ only the forward pass needed for inference in production.
 
 from __future__ import annotations
 
+from typing import Dict, Tuple
+
 import torch
 import torch.nn as nn
 from torchvision import models
 
+# (h, c) of an nn.LSTM, carried between `forward_step` calls when streaming
+LSTMState = Tuple[torch.Tensor, torch.Tensor]
+
 __all__ = [
     "EyeGazeLSTM",
     "TappingCNN",
     "SitStandLSTM",
     "WPMModel",
+    "FrozenBackbone",
+    "FrameSequenceHead",
+    "BackboneHeadModel",
+    "split_frame_state_dict",
 ]
 
 
+def _mobilenet_v2(pretrained: bool) -> nn.Module:
+    """MobileNetV2 backbone.
+
+    Inference loads every weight from our own .pth files, so the ImageNet
+    weights are only fetched when explicitly asked for (training from scratch).
+    """
+
+    weights = models.MobileNet_V2_Weights.DEFAULT if pretrained else None
+    return models.mobilenet_v2(weights=weights)
+
+
 # ---------------------------------------------------------------------------
 # 1. Eye-gaze direction – MobileNetV2 backbone + LSTM
 # ---------------------------------------------------------------------------
@@ -28,9 +48,16 @@ __all__ = [
 class EyeGazeLSTM(nn.Module):
     """Image-sequence classifier for 5 gaze directions."""
 
-    def __init__(self, hidden_dim: int = 128, num_classes: int = 5, *, lstm_layers: int = 1):
+    def __init__(
+        self,
+        hidden_dim: int = 128,
+        num_classes: int = 5,
+        *,
+        lstm_layers: int = 1,
+        pretrained: bool = False,
+    ):
         super().__init__()
-        mobilenet = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.DEFAULT)
+        mobilenet = _mobilenet_v2(pretrained)
         self.feature_extractor = mobilenet.features  # (N, 1280, H/32, W/32)
         self.pool = nn.AdaptiveAvgPool2d((1, 1))
 
@@ -57,6 +84,15 @@ class EyeGazeLSTM(nn.Module):
         lstm_out, _ = self.lstm(feats)
         return self.classifier(lstm_out[:, -1, :])  # (B, num_classes)
 
+    def forward_step(self, x: torch.Tensor, state: LSTMState | None = None) -> Tuple[torch.Tensor, LSTMState]:
+        """Continue the sequence with new frames x (B, T_new, C, H, W) from `state`."""
+
+        b, t, c, h, w = x.shape
+        with torch.no_grad():
+            feats = self.pool(self.feature_extractor(x.reshape(-1, c, h, w))).view(b, t, -1)
+        lstm_out, state = self.lstm(feats, state)
+        return self.classifier(lstm_out[:, -1, :]), state
+
 
 # ---------------------------------------------------------------------------
 # 2. Tapping detection – MobileNetV2 backbone + LSTM (binary)
@@ -66,9 +102,9 @@ class EyeGazeLSTM(nn.Module):
 class TappingCNN(nn.Module):
     """Shared architecture for hand/foot tapping binary classifiers."""
 
-    def __init__(self, hidden_dim: int = 128):
+    def __init__(self, hidden_dim: int = 128, *, pretrained: bool = False):
         super().__init__()
-        mobilenet = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.DEFAULT)
+        mobilenet = _mobilenet_v2(pretrained)
         self.feature_extractor = mobilenet.features
         self.pool = nn.AdaptiveAvgPool2d((1, 1))
         for p in self.feature_extractor.parameters():  # freeze
@@ -86,6 +122,15 @@ class TappingCNN(nn.Module):
         lstm_out, _ = self.lstm(x)
         return self.classifier(lstm_out[:, -1])
 
+    def forward_step(self, x: torch.Tensor, state: LSTMState | None = None) -> Tuple[torch.Tensor, LSTMState]:
+        """Continue the sequence with new frames x (B, T_new, C, H, W) from `state`."""
+
+        b, t, c, h, w = x.shape
+        with torch.no_grad():
+            feats = self.pool(self.feature_extractor(x.reshape(-1, c, h, w))).view(b, t, -1)
+        lstm_out, state = self.lstm(feats, state)
+        return self.classifier(lstm_out[:, -1]), state
+
 
 # ---------------------------------------------------------------------------
 # 3. Sit/stand pose classifier – pure LSTM over key-point sequences
@@ -137,4 +182,112 @@ class WPMModel(nn.Module):
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         # x shape: (B, T, 1)
         out, _ = self.lstm(x)
-        return torch.sigmoid(self.fc(out[:, -1, :])) 
\ No newline at end of file
+        return torch.sigmoid(self.fc(out[:, -1, :]))
+
+    def forward_step(self, x: torch.Tensor, state: LSTMState | None = None) -> Tuple[torch.Tensor, LSTMState]:
+        """Continue the sequence with new values x (B, T_new, 1) from `state`."""
+
+        out, state = self.lstm(x, state)
+        return torch.sigmoid(self.fc(out[:, -1, :])), state
+
+
+# ---------------------------------------------------------------------------
+# 5. Shared frozen backbone + per-behaviour heads
+# ---------------------------------------------------------------------------
+#
+# EyeGazeLSTM and TappingCNN only differ in their LSTM/classifier: the frozen
+# MobileNetV2 features are the same.  Holding one backbone instead of three
+# saves ~9 MB of weights per process.  Their .pth files stay loadable through
+# `split_frame_state_dict`.
+
+
+class FrozenBackbone(nn.Module):
+    """Frozen MobileNetV2 features + global pool: (N, C, H, W) -> (N, 1280)."""
+
+    out_dim = 1280
+
+    def __init__(self, *, pretrained: bool = False):
+        super().__init__()
+        self.feature_extractor = _mobilenet_v2(pretrained).features
+        self.pool = nn.AdaptiveAvgPool2d((1, 1))
+        for p in self.feature_extractor.parameters():
+            p.requires_grad = False
+        self.eval()
+
+    def train(self, mode: bool = True) -> "FrozenBackbone":
+        # BatchNorm statistics must never drift: always stay in eval mode
+        return super().train(False)
+
+    @torch.no_grad()
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        feats = self.feature_extractor(x)
+        return self.pool(feats).flatten(1)
+
+
+class FrameSequenceHead(nn.Module):
+    """LSTM + linear classifier over pooled backbone features (B, T, 1280)."""
+
+    def __init__(self, hidden_dim: int = 128, num_classes: int = 2, *, lstm_layers: int = 1):
+        super().__init__()
+        self.lstm = nn.LSTM(
+            input_size=FrozenBackbone.out_dim,
+            hidden_size=hidden_dim,
+            num_layers=lstm_layers,
+            batch_first=True,
+        )
+        self.classifier = nn.Linear(hidden_dim, num_classes)
+
+    @classmethod
+    def from_state_dict(cls, state_dict: Dict[str, torch.Tensor]) -> "FrameSequenceHead":
+        """Build a head whose sizes match `state_dict` and load it."""
+
+        hidden_dim = state_dict["lstm.weight_hh_l0"].shape[1]
+        num_classes = state_dict["classifier.weight"].shape[0]
+        lstm_layers = sum(1 for k in state_dict if k.startswith("lstm.weight_hh_l"))
+        head = cls(hidden_dim, num_classes, lstm_layers=lstm_layers)
+        head.load_state_dict(state_dict)
+        return head
+
+    def forward(self, feats: torch.Tensor) -> torch.Tensor:
+        lstm_out, _ = self.lstm(feats)
+        return self.classifier(lstm_out[:, -1, :])
+
+    def forward_step(self, feats: torch.Tensor, state: LSTMState | None = None) -> Tuple[torch.Tensor, LSTMState]:
+        lstm_out, state = self.lstm(feats, state)
+        return self.classifier(lstm_out[:, -1, :]), state
+
+
+class BackboneHeadModel(nn.Module):
+    """Drop-in replacement for EyeGazeLSTM/TappingCNN built on a shared backbone.
+
+    Takes the same (B, T, C, H, W) input and returns the same logits.
+    """
+
+    def __init__(self, backbone: FrozenBackbone, head: FrameSequenceHead):
+        super().__init__()
+        self.backbone = backbone
+        self.head = head
+
+    def embed(self, x: torch.Tensor) -> torch.Tensor:
+        b, t, c, h, w = x.shape
+        return self.backbone(x.reshape(-1, c, h, w)).view(b, t, -1)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.head(self.embed(x))
+
+    def forward_step(self, x: torch.Tensor, state: LSTMState | None = None) -> Tuple[torch.Tensor, LSTMState]:
+        return self.head.forward_step(self.embed(x), state)
+
+
+def split_frame_state_dict(
+    state_dict: Dict[str, torch.Tensor],
+) -> Tuple[Dict[str, torch.Tensor], Dict[str, torch.Tensor]]:
+    """Split an EyeGazeLSTM/TappingCNN state dict into (backbone, head) parts."""
+
+    backbone, head = {}, {}
+    for key, value in state_dict.items():
+        if key.startswith("feature_extractor."):
+            backbone[key] = value
+        else:
+            head[key] = value
+    return backbone, head
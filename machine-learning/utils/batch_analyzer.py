@@ -3,10 +3,12 @@
 
 Invoked by Node.js mlController as:
 
-python batch_analyzer.py <tmp_json_file>
+python batch_analyzer.py <tmp_file>
 
-Where the temporary JSON file contains an array of objects, each at minimum
-containing a `type` (behaviour type) and `data` payload. The script returns a
+Where the temporary file (binary frame container or JSON) contains an array of objects, each at minimum
+containing a `type` (behaviour type) and `data` payload (for frame-based
+behaviours a frame list or an encoded clip, ``{"video": ..., "fps": 10}``,
+see video_clip.py). The script returns a
 JSON object with the following structure (written to stdout):
 
 {
@@ -18,19 +20,123 @@ JSON object with the following structure (written to stdout):
   "total_analyzed": 5
 }
 
-The placeholder implementation relies on the same random-based detector found
-in `ml_analyzer.py` so that the API can be exercised end-to-end even without
-trained models.
+Entries are preprocessed with the same code as `ml_analyzer.py`, then grouped
+by behaviour and sequence length so each model runs one forward pass per
+bucket instead of one per entry.
+
+With ``ML_TIMINGS=1`` the output carries a ``timings`` block (see
+instrumentation.py); ``ML_PROFILE`` profiles the whole batch.
+
+``python batch_analyzer.py <tmp_file> --stream`` keeps memory bounded for
+large batches: a JSON array is parsed one entry at a time (a frame container
+is memory-mapped anyway), entries run ``ML_STREAM_CHUNK`` at a time (default
+8) and each result is written as soon as its chunk is done, one NDJSON line
+per entry, followed by a summary line:
+
+{"index": 0, "result": {"behavior_type": "eye_gaze", "detected": true, ...}}
+{"index": 2, "result": {...}}
+{"done": true, "success": true, "total_analyzed": 2, "errors": 0}
+
+``index`` is the entry's position in the input array; entries without a
+type are skipped as in the default mode.
 """
 
+import argparse
 import json
 import os
 import sys
-from typing import Any, Dict, List
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, TextIO, Tuple
+
+import torch
 
-# Reuse single-behaviour predictor from ml_analyzer to ensure identical
-# preprocessing/model logic.
-from ml_analyzer import _predict  # type: ignore
+from frame_container import is_container, read_container
+from instrumentation import count, stage
+from weight_bundle import WeightBundleError
+
+# Reuse single-behaviour preprocessing/postprocessing from ml_analyzer to
+# ensure identical preprocessing/model logic.
+from ml_analyzer import (  # type: ignore
+    ALL_BEHAVIOR,
+    DEVICE,
+    MODEL_FILES,
+    ModelUnavailableError,
+    _error,
+    _format_output,
+    _forward,
+    _instrumented,
+    _load_payload,
+    _note_frames_used,
+    _predict,
+    _prepare_input,
+    get_model,
+)
+
+# Upper bounds on what is stacked into one forward pass.  Image models are
+# capped by total frames: past a few dozen 64x64 frames the backbone gets
+# cache-bound on CPU and larger batches stop paying off.
+MAX_BATCH = int(os.environ.get("ML_MAX_BATCH", "64"))
+MAX_BATCH_FRAMES = int(os.environ.get("ML_MAX_BATCH_FRAMES", "64"))
+
+# Entries preprocessed and predicted together in streaming mode
+STREAM_CHUNK = int(os.environ.get("ML_STREAM_CHUNK", "8"))
+
+
+# ---------------------------------------------------------------------------
+# Batched execution
+# ---------------------------------------------------------------------------
+
+
+def _predict_batched(entries: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """Predict every (behavior, data) entry, one forward pass per bucket.
+
+    Entries are grouped by behaviour and bucketed by exact input shape (so by
+    sequence length): the LSTMs read the last time step, so padding would
+    change their output.  Results come back in the original entry order.
+    """
+
+    results: List[Dict[str, Any] | None] = [None] * len(entries)
+    buckets: Dict[Tuple[str, Tuple[int, ...]], List[Tuple[int, torch.Tensor]]] = defaultdict(list)
+
+    for idx, (b_type, data) in enumerate(entries):
+        if b_type == ALL_BEHAVIOR:
+            results[idx] = _predict(b_type, data)
+            continue
+        if b_type not in MODEL_FILES:
+            results[idx] = _error("unsupported_behavior")
+            continue
+        try:
+            inputs, error = _prepare_input(b_type, data)
+        except Exception as exc:
+            results[idx] = _error(str(exc))
+            continue
+        if error is not None:
+            results[idx] = error
+        else:
+            buckets[(b_type, tuple(inputs.shape))].append((idx, inputs))
+
+    for (b_type, shape), items in buckets.items():
+        try:
+            model = get_model(b_type)
+        except (ModelUnavailableError, WeightBundleError) as exc:
+            for idx, _ in items:
+                results[idx] = _error(str(exc))
+            continue
+        batch_size = MAX_BATCH
+        if len(shape) == 4:  # (T, C, H, W) image sequence
+            batch_size = max(1, min(MAX_BATCH, MAX_BATCH_FRAMES // shape[0]))
+        for start in range(0, len(items), batch_size):
+            chunk = items[start:start + batch_size]
+            try:
+                with torch.inference_mode(), stage("forward"):
+                    out = _forward(model, torch.stack([t for _, t in chunk]).to(DEVICE))
+                for (idx, inputs), row in zip(chunk, out):
+                    results[idx] = _note_frames_used(_format_output(b_type, row), b_type, entries[idx][1], inputs)
+            except Exception as exc:
+                for idx, _ in chunk:
+                    results[idx] = _error(str(exc))
+
+    return results  # type: ignore[return-value]
 
 
 # ---------------------------------------------------------------------------
@@ -38,36 +144,206 @@ from ml_analyzer import _predict  # type: ignore
 # ---------------------------------------------------------------------------
 
 
+def _entry(entry: Dict[str, Any]) -> Tuple[str, Any] | None:
+    """(behavior, data) of one batch entry, None if it has no type."""
+
+    b_type = entry.get("type") or entry.get("behavior_type") or entry.get("behaviorType")
+    data = entry.get("data") or entry.get("frame_sequence") or entry.get("frame")
+    if not b_type:
+        return None
+    return b_type, data
+
+
+def _finish(b_type: str, single: Dict[str, Any]) -> Dict[str, Any]:
+    single["behavior_type"] = b_type
+    single["label"] = int(single.get("detected", False))
+    return single
+
+
+def analyze_batch(behaviors: List[Dict[str, Any]], *, batched: bool = True) -> Dict[str, Any]:
+    """Run every entry through the models and return the batch response object.
+
+    ``batched=False`` falls back to one `_predict` call per entry.
+    """
+
+    entries: List[Tuple[str, Any]] = []
+    for entry in behaviors:
+        parsed = _entry(entry)
+        if parsed is None:
+            # Skip invalid entries but continue processing others
+            continue
+        entries.append(parsed)
+    count("batch_entries", len(entries))
+
+    if batched:
+        predictions = _predict_batched(entries)
+    else:
+        predictions = [_predict(b_type, data) for b_type, data in entries]
+
+    results = [_finish(b_type, single) for (b_type, _), single in zip(entries, predictions)]
+
+    return {"success": True, "results": results, "total_analyzed": len(results)}
+
+
+# ---------------------------------------------------------------------------
+# Streaming mode
+# ---------------------------------------------------------------------------
+
+
+# A value or parse error within this many characters of the end of the
+# buffer may just be cut by the read (``tru``, ``1.``, ``"\\u00``)
+_READ_TAIL = 32
+
+
+def iter_json_array(fp: TextIO, read_size: int = 1 << 20) -> Iterator[Any]:
+    """Yield the elements of the JSON array in `fp` one at a time.
+
+    Only the element being parsed (plus one read) is held in memory, not the
+    whole document.  An element that fails to parse before the end of what
+    has been read is malformed, not incomplete, and raises right away.
+    """
+
+    decoder = json.JSONDecoder()
+    base_size = read_size
+    buf, pos, eof = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        more = "" if eof else fp.read(read_size)
+        eof = not more
+        buf, pos = buf[pos:] + more, 0
+        return bool(more)
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or not fill():
+                return buf[pos] if pos < len(buf) else ""
+
+    if next_char() != "[":
+        raise ValueError("Batch input must be a JSON array")
+    pos += 1
+    if next_char() == "]":
+        return
+    index = 0
+    while True:
+        next_char()
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+            incomplete = not eof and end > len(buf) - _READ_TAIL  # e.g. a number cut by the read
+        except json.JSONDecodeError as err:
+            # An unterminated string may end in the next read, wherever it started
+            cut = err.pos > len(buf) - _READ_TAIL or err.msg.startswith("Unterminated string")
+            if eof and cut:
+                raise ValueError(f"Truncated JSON array at element {index}") from None
+            if not cut:
+                raise ValueError(f"Invalid JSON in array element {index}: {err.msg}") from None
+            incomplete = True
+        if incomplete:
+            fill()
+            read_size *= 2  # large entries: fewer failed partial parses
+            continue
+        read_size = base_size
+        yield value
+        index += 1
+        pos = end
+        sep = next_char()
+        if sep == "]":
+            return
+        if sep != ",":
+            raise ValueError(f"Expected ',' or ']' after array element {index - 1}, got {sep!r}")
+        pos += 1
+
+
+def iter_batch_file(path: str) -> Iterator[Dict[str, Any]]:
+    """Entries of a batch file: a memory-mapped frame container or a streamed JSON array."""
+
+    if is_container(path):
+        yield from read_container(path)
+        return
+    with open(path, "r", encoding="utf-8") as fp:
+        yield from iter_json_array(fp)
+
+
+def stream_batch(
+    behaviors: Iterable[Dict[str, Any]],
+    emit: Callable[[Dict[str, Any]], None],
+    *,
+    chunk_size: int | None = None,
+) -> Dict[str, Any]:
+    """Analyze entries as they are read, calling ``emit({"index", "result"})`` per entry.
+
+    Entries are predicted ``chunk_size`` at a time (bucketed like
+    `analyze_batch` within the chunk) and released once emitted.  Returns the
+    summary line.
+    """
+
+    chunk_size = chunk_size or STREAM_CHUNK
+    total = errors = 0
+    pending: List[Tuple[int, Tuple[str, Any]]] = []
+
+    def flush() -> None:
+        nonlocal total, errors
+        predictions = _predict_batched([e for _, e in pending])
+        for (index, (b_type, _)), single in zip(pending, predictions):
+            result = _finish(b_type, single)
+            errors += "error" in result
+            emit({"index": index, "result": result})
+        total += len(pending)
+        pending.clear()
+
+    for index, entry in enumerate(behaviors):
+        parsed = _entry(entry)
+        if parsed is None:
+            continue
+        pending.append((index, parsed))
+        if len(pending) >= chunk_size:
+            flush()
+    if pending:
+        flush()
+    count("batch_entries", total)
+    return {"done": True, "success": True, "total_analyzed": total, "errors": errors}
+
+
+def _write_line(obj: Dict[str, Any]) -> None:
+    sys.stdout.write(json.dumps(obj) + "\n")
+    sys.stdout.flush()
+
+
 def main() -> None:
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="Analyze a batch of behaviour entries")
+    parser.add_argument("data_file", nargs="?", help="Frame container or JSON array of entries")
+    parser.add_argument("--stream", action="store_true", help="Write one NDJSON line per result as it is ready")
+    args = parser.parse_args()
+
+    if not args.data_file:
         print(json.dumps({"success": False, "error": "Missing data file argument"}))
         sys.exit(1)
 
-    data_file = sys.argv[1]
+    data_file = args.data_file
     if not os.path.exists(data_file):
         print(json.dumps({"success": False, "error": f"File not found: {data_file}"}))
         sys.exit(1)
 
+    if args.stream:
+        try:
+            summary = _instrumented("batch", None, lambda: stream_batch(iter_batch_file(data_file), _write_line))
+        except Exception as exc:
+            # Results already written stay valid; the summary reports the failure
+            _write_line({"done": True, "success": False, "error": str(exc)})
+            sys.exit(1)
+        _write_line(summary)
+        return
+
     try:
-        with open(data_file, "r", encoding="utf-8") as fp:
-            behaviors: List[Dict[str, Any]] = json.load(fp)
+        behaviors: List[Dict[str, Any]] = _load_payload(data_file)
     except Exception as exc:
-        print(json.dumps({"success": False, "error": f"Failed to read JSON: {exc}"}))
+        print(json.dumps({"success": False, "error": f"Failed to read input: {exc}"}))
         sys.exit(1)
 
-    results: List[Dict[str, Any]] = []
-    for entry in behaviors:
-        b_type = entry.get("type") or entry.get("behavior_type") or entry.get("behaviorType")
-        data = entry.get("data") or entry.get("frame_sequence") or entry.get("frame")
-        if not b_type:
-            # Skip invalid entries but continue processing others
-            continue
-        single = _predict(b_type, data)
-        single["behavior_type"] = b_type
-        single["label"] = int(single["detected"])
-        results.append(single)
-
-    output = {"success": True, "results": results, "total_analyzed": len(results)}
+    output = _instrumented("batch", None, lambda: analyze_batch(behaviors))
 
     sys.stdout.write(json.dumps(output))
 
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Compare full-frame landmark detection with the ML_LANDMARK_ROI mode.
+
+Usage
+-----
+python utils/check_landmark_roi.py --image face.jpg [--resolutions 1280x720 1920x1080 3840x2160]
+python utils/check_landmark_roi.py --frames-file clip.bin
+
+The input is an ordered clip: either a frames file (frame container or JSON
+list of data-URLs) or one still image pasted onto larger canvases and moved
+a few pixels per frame to simulate a subject drifting in a camera frame.
+Per resolution and solver it runs every frame through the default
+full-frame path and through the ROI path (one region state for the clip, as
+in `_features_chunk`) and reports the per-frame latency of both, their
+detection rates, how often the ROI path fell back to a full-frame search,
+and how closely the landmarks agree (mean / max absolute difference of
+normalised x, y over frames detected by both).  For the model inputs it
+reports the mean absolute difference of the 64x64 crops (0-255 scale) and
+of the sit_stand pose coordinates.
+
+Prints one JSON object.
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from PIL import Image
+
+import landmark_roi
+import ml_analyzer
+from image_batch import DecodedFrame
+from ml_analyzer import (
+    _ROI_STATE,
+    _detect_face,
+    _detect_hand,
+    _detect_pose,
+    _eye_crop_from,
+    _foot_crop_from,
+    _hand_crop_from,
+    _pose_xy_from,
+    landmark_roi_mode,
+)
+
+_DETECTORS: Dict[str, Callable[[np.ndarray], Any]] = {
+    "face_mesh": _detect_face,
+    "hands": _detect_hand,
+    "pose": _detect_pose,
+}
+
+# Model input built from each solver's landmarks
+_FEATURES = {
+    "face_mesh": ("eye_gaze", _eye_crop_from),
+    "hands": ("tapping_hands", _hand_crop_from),
+    "pose": ("tapping_feet", _foot_crop_from),
+}
+
+
+def _clip(path: str, n: int, width: int, height: int, scale: float) -> List[bytes]:
+    """`n` JPEG frames of the image (scaled to `scale` x canvas height) drifting over a grey canvas."""
+
+    img = Image.open(path).convert("RGB")
+    side = int(height * scale)
+    img = img.resize((side, int(img.height * side / img.width)))
+    span = max(1, width - img.width)
+    frames = []
+    for i in range(n):
+        canvas = Image.new("RGB", (width, height), (128, 128, 128))
+        # ~3 px per frame at 720p, proportionally more on larger canvases
+        x = (span // 4 + i * max(1, width // 400)) % span
+        canvas.paste(img, (x, (height - img.height) // 2))
+        buf = io.BytesIO()
+        canvas.save(buf, "JPEG", quality=85)
+        frames.append(buf.getvalue())
+    return frames
+
+
+def _xy(landmarks: Any) -> np.ndarray | None:
+    if landmarks is None:
+        return None
+    return np.array([(lm.x, lm.y) for lm in landmarks.landmark], dtype=np.float32)
+
+
+def _run(detect: Callable[[np.ndarray], Any], decoded: List[DecodedFrame], roi: bool) -> Dict[str, Any]:
+    landmarks, latency, searches = [], [], 0
+    with landmark_roi_mode(roi):
+        token = _ROI_STATE.set({})
+        try:
+            for frame in decoded:
+                state = _ROI_STATE.get()
+                had_region = bool(state) and any(v is not None for v in state.values())
+                t0 = time.perf_counter()
+                landmarks.append(detect(frame.rgb))
+                latency.append((time.perf_counter() - t0) * 1000)
+                searches += not had_region
+        finally:
+            _ROI_STATE.reset(token)
+    report = {
+        "latency_ms": {
+            "mean": round(float(np.mean(latency)), 2),
+            "p50": round(float(np.percentile(latency, 50)), 2),
+            "p95": round(float(np.percentile(latency, 95)), 2),
+        },
+        "detection_rate": round(sum(lm is not None for lm in landmarks) / len(landmarks), 4),
+    }
+    if roi:
+        report["full_frame_searches"] = searches
+    return {"report": report, "landmarks": landmarks}
+
+
+def _agreement(a: List[Any], b: List[Any]) -> Dict[str, Any]:
+    diffs = [np.abs(_xy(x) - _xy(y)) for x, y in zip(a, b) if x is not None and y is not None]
+    if not diffs:
+        return {"frames_compared": 0}
+    return {
+        "frames_compared": len(diffs),
+        "mean_abs_diff": round(float(np.mean([d.mean() for d in diffs])), 5),
+        "max_abs_diff": round(float(max(d.max() for d in diffs)), 5),
+    }
+
+
+def _feature_diff(a: List[Any], b: List[Any]) -> float | None:
+    diffs = [
+        float(np.abs(np.asarray(x, dtype=np.float32) - np.asarray(y, dtype=np.float32)).mean())
+        for x, y in zip(a, b)
+        if x is not None and y is not None
+    ]
+    return round(float(np.mean(diffs)), 4) if diffs else None
+
+
+def check(frames: List[Any], solvers: List[str]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    decoded = [ml_analyzer._decode_frame(f) for f in frames]
+    for frame in decoded:
+        frame.rgb  # decode outside the landmark timings
+    report: Dict[str, Any] = {
+        "frames": len(frames),
+        "size": list(decoded[0].size),
+        "decoded": list(decoded[0].rgb.shape[1::-1]),
+        "decode_ms": round((time.perf_counter() - t0) * 1000 / len(frames), 2),
+        "solvers": {},
+    }
+    for name in solvers:
+        detect = _DETECTORS[name]
+        detect(decoded[0].rgb)  # build the graph outside the timing
+        full = _run(detect, decoded, roi=False)
+        roi = _run(detect, decoded, roi=True)
+        entry = {
+            "full_frame": full["report"],
+            "roi": roi["report"],
+            "landmarks": _agreement(full["landmarks"], roi["landmarks"]),
+        }
+        behavior, crop_from = _FEATURES[name]
+        entry[f"{behavior}_crop_mad"] = _feature_diff(
+            [crop_from(f, lm) for f, lm in zip(decoded, full["landmarks"])],
+            [crop_from(f, lm) for f, lm in zip(decoded, roi["landmarks"])],
+        )
+        if name == "pose":
+            entry["sit_stand_xy_mad"] = _feature_diff(
+                [_pose_xy_from(lm) for lm in full["landmarks"]],
+                [_pose_xy_from(lm) for lm in roi["landmarks"]],
+            )
+        report["solvers"][name] = entry
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Full-frame vs ROI landmark detection")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--image", help="Still image to move across synthetic canvases")
+    source.add_argument("--frames-file", help="Frame container or JSON list of frames, in order")
+    parser.add_argument("--frames", type=int, default=30, help="Clip length with --image")
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        default=["1280x720", "1920x1080", "3840x2160"],
+        help="Canvas sizes with --image (WIDTHxHEIGHT)",
+    )
+    parser.add_argument("--scale", type=float, default=1.0, help="Image width as a fraction of the canvas height")
+    parser.add_argument("--solvers", nargs="+", default=list(_DETECTORS), choices=list(_DETECTORS))
+    args = parser.parse_args()
+
+    settings = {"search_side": landmark_roi.SEARCH_SIDE, "roi_side": landmark_roi.ROI_SIDE, "margin": landmark_roi.MARGIN}
+    if args.frames_file:
+        payload = ml_analyzer._load_payload(args.frames_file)
+        frames = payload if isinstance(payload, list) else payload.get("frame_sequence") or next(iter(payload.values()))
+        report = {"settings": settings, "clip": check(frames, args.solvers)}
+    else:
+        report = {"settings": settings, "resolutions": {}}
+        for resolution in args.resolutions:
+            width, height = (int(v) for v in resolution.lower().split("x"))
+            frames = _clip(args.image, args.frames, width, height, args.scale)
+            report["resolutions"][resolution] = check(frames, args.solvers)
+
+    sys.stdout.write(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Check the peak memory of frame-sequence requests against their budget.
+
+Usage
+-----
+python utils/check_memory.py --image face.jpg [--frames 50 200 800] [--size 640x480]
+        [--behaviors eye_gaze tapping_feet sit_stand]
+
+For every frame count the photo is panned over a canvas of --size and the
+JPEGs are written as a JSON payload of data-URLs (the largest form the
+Node controller sends).  Each (behaviour, count) then runs in a fresh
+process: the models are loaded and warmed up on a few frames, the payload
+is parsed, the kernel's peak-RSS counter is reset (``/proc/self/clear_refs``)
+and one `_predict` runs.  The report holds per run
+
+    payload_mb  RSS added by parsing the payload (not part of the budget)
+    peak_mb     peak RSS during `_predict` above the RSS before it
+    budget_mb   `ml_analyzer.peak_rss_target_mb` for that frame count
+
+A run whose result is an error (a model without weights, too few frames
+with landmarks) never reached the forward pass and is listed as
+``skipped`` instead of being checked.  The feature cache is disabled so
+nothing is retained between frames.  Exits non-zero if any run exceeds its
+budget or no run was measured at all.  Linux only.
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from io import BytesIO
+from typing import Any, Dict, List
+
+from PIL import Image
+
+_WARMUP_FRAMES = 4
+
+
+def _status_mb(field: str) -> float:
+    with open("/proc/self/status", "r", encoding="ascii") as fp:
+        for line in fp:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def _frames(image: str, n: int, size: tuple) -> List[str]:
+    src = Image.open(image).convert("RGB")
+    w, h = size
+    side = min(w, h)
+    person = src.resize((side, side))
+    frames = []
+    for i in range(n):
+        canvas = Image.new("RGB", (w, h), (128, 128, 128))
+        canvas.paste(person, ((w - side) // 2 + (i % 16) - 8, 0))
+        buf = BytesIO()
+        canvas.save(buf, "JPEG", quality=85)
+        frames.append("data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode("ascii"))
+    return frames
+
+
+def _child(behavior: str, path: str) -> Dict[str, Any]:
+    """One measured request in this (fresh) process."""
+
+    os.environ["ML_CACHE_MB"] = "0"
+    import ml_analyzer
+
+    with open(path, "r", encoding="utf-8") as fp:
+        warmup = json.load(fp)[:_WARMUP_FRAMES]
+    ml_analyzer._predict(behavior, warmup)
+    del warmup
+
+    before = _status_mb("VmRSS")
+    data = ml_analyzer._load_payload(path)
+    loaded = _status_mb("VmRSS")
+    with open("/proc/self/clear_refs", "w", encoding="ascii") as fp:
+        fp.write("5")  # reset VmHWM to the current RSS
+    result = ml_analyzer._predict(behavior, data)
+    peak = _status_mb("VmHWM")
+    return {
+        "frames": len(data),
+        "payload_mb": round(loaded - before, 1),
+        "peak_mb": round(peak - loaded, 1),
+        "budget_mb": round(ml_analyzer.peak_rss_target_mb(len(data)), 1),
+        "result": result,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Peak RSS of frame-sequence requests vs their budget")
+    parser.add_argument("--image", help="Photo to pan into synthetic frames")
+    parser.add_argument("--frames", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--size", default="640x480", help="Frame size WIDTHxHEIGHT")
+    parser.add_argument("--behaviors", nargs="+", default=["eye_gaze", "tapping_feet", "sit_stand"])
+    parser.add_argument("--child", nargs=2, metavar=("BEHAVIOR", "PAYLOAD"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.stdout.write(json.dumps(_child(*args.child)))
+        return
+    if not args.image:
+        parser.error("--image is required")
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    report: Dict[str, Any] = {"size": args.size, "runs": []}
+    failed = False
+    measured = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.frames:
+            path = os.path.join(tmp, f"frames-{n}.json")
+            with open(path, "w", encoding="utf-8") as fp:
+                json.dump(_frames(args.image, n, size), fp)
+            for behavior in args.behaviors:
+                proc = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", behavior, path],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                run = {"behavior": behavior, **json.loads(proc.stdout)}
+                error = run["result"].get("error")
+                if error:
+                    # Stopped before the forward pass (no weights, no landmarks):
+                    # its peak says nothing about the pipeline
+                    run["skipped"] = error
+                else:
+                    run["ok"] = run["peak_mb"] <= run["budget_mb"]
+                    failed |= not run["ok"]
+                    measured += 1
+                report["runs"].append(run)
+
+    report["measured"] = measured
+    sys.stdout.write(json.dumps(report, indent=2))
+    sys.exit(1 if failed or not measured else 0)
+
+
+if __name__ == "__main__":
+    main()
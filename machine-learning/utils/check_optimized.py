@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Report how far the optimized CPU backend drifts from the fp32 models.
+
+Usage
+-----
+python utils/check_optimized.py [--batch 8] [--steps 20] [--repeat 5]
+
+Every behaviour with weights is loaded as an eager fp32 model and converted
+with `optimize_model` (same weights); the others are reported as skipped.
+Both run on the same random inputs; per behaviour the report holds the max /
+mean absolute confidence difference, the fraction of samples whose predicted
+label (detected flag or gaze class) changes, the max raw output difference
+and the mean forward latency of both backends.  Time to optimize is reported
+for a cold and a warm artifact cache.
+
+Prints one JSON object.
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+import torch
+
+import model_loader
+import optimized_backend
+from ml_analyzer import _format_output
+from optimized_backend import optimize_model
+
+
+def _inputs(behavior: str, batch: int, steps: int) -> torch.Tensor:
+    if behavior == "rapid_talking":
+        return torch.rand(batch, steps, 1) * 200
+    if behavior == "sit_stand":
+        return torch.rand(batch, steps, 66)
+    return torch.rand(batch, steps, 3, 64, 64)
+
+
+def _label(result: Dict[str, Any]) -> Any:
+    return result.get("gaze", result.get("detected"))
+
+
+@torch.inference_mode()
+def _latency_ms(model: torch.nn.Module, x: torch.Tensor, repeat: int) -> float:
+    model(x)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        model(x)
+    return round((time.perf_counter() - t0) / repeat * 1000, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare optimized and fp32 model outputs")
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    model_loader.BACKEND = "eager"
+    # Fresh artifact directory so the cold/warm timings mean something
+    optimized_backend.CACHE_DIR = tempfile.mkdtemp(prefix="ml_optimized_")
+
+    report: Dict[str, Any] = {"threads": torch.get_num_threads(), "behaviors": {}}
+    try:
+        for behavior in model_loader.MODEL_CLASSES:
+            try:
+                eager = model_loader.get_model(behavior)
+            except model_loader.ModelUnavailableError as exc:
+                report["behaviors"][behavior] = {"skipped": str(exc)}
+                continue
+
+            optimized_backend._BACKBONES.clear()
+            t0 = time.perf_counter()
+            optimized = optimize_model(eager)
+            cold_s = time.perf_counter() - t0
+            optimized_backend._BACKBONES.clear()
+            t0 = time.perf_counter()
+            optimized = optimize_model(eager)
+            warm_s = time.perf_counter() - t0
+
+            x = _inputs(behavior, args.batch, args.steps)
+            with torch.inference_mode():
+                ref, out = eager(x), optimized(x)
+            ref_res = [_format_output(behavior, r) for r in ref]
+            out_res = [_format_output(behavior, o) for o in out]
+            drift = [abs(a["confidence"] - b["confidence"]) for a, b in zip(ref_res, out_res)]
+
+            report["behaviors"][behavior] = {
+                "confidence_drift_max": round(max(drift), 4),
+                "confidence_drift_mean": round(sum(drift) / len(drift), 4),
+                "label_changes": sum(_label(a) != _label(b) for a, b in zip(ref_res, out_res)) / len(ref_res),
+                "output_max_abs_diff": round((ref - out).abs().max().item(), 5),
+                "eager_ms": _latency_ms(eager, x, args.repeat),
+                "optimized_ms": _latency_ms(optimized, x, args.repeat),
+                "optimize_cold_s": round(cold_s, 3),
+                "optimize_warm_s": round(warm_s, 3),
+            }
+    finally:
+        shutil.rmtree(optimized_backend.CACHE_DIR, ignore_errors=True)
+
+    sys.stdout.write(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
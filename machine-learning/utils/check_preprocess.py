@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Compare the batched frame preprocessing with the reference ``_IMAGE_TF`` path.
+
+Usage
+-----
+python utils/check_preprocess.py --image face.jpg [--frames 8] [--sizes 640x480 ... 2560x1440]
+        [--atol-mean 0.02]
+
+For every frame size the photo is panned over a canvas of that size and
+JPEG encoded.  The reference decodes each frame at full size, detects
+landmarks on it, crops a PIL image and applies ``_IMAGE_TF``; the batched
+path is `_frame_features` + `crops_to_tensor` (reduced-size decoding for
+large frames, see image_batch.py).  Per size and image behaviour the report
+holds:
+
+    crop            max / mean absolute difference of the two paths given the
+                    same landmarks, and their per-frame decode + crop +
+                    transform time (landmark detection excluded)
+    landmark_drift  mean normalised landmark shift when MediaPipe sees the
+                    reduced decode instead of the full-size frame
+    end_to_end      `_frame_features` against the reference, both with their
+                    own landmarks
+
+Exits non-zero if frames decoded at full size are not identical to the
+reference, or a reduced decode's mean crop difference exceeds --atol-mean.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from io import BytesIO
+from typing import Any, Dict, List
+
+import numpy as np
+import torch
+from PIL import Image
+
+# Every frame must really be processed, not served from the feature cache
+os.environ["ML_CACHE_MB"] = "0"
+
+import ml_analyzer  # noqa: E402
+from image_batch import DECODE_MIN_SIDE, DecodedFrame, _draft_scale, crops_to_tensor
+
+# behaviour -> (detector, landmark points of the crop, margin)
+_BEHAVIORS = {
+    "eye_gaze": (ml_analyzer._detect_face, lambda lm: [lm.landmark[i] for i in ml_analyzer._EYE_IDXS], 10),
+    "tapping_hands": (ml_analyzer._detect_hand, lambda lm: list(lm.landmark), 10),
+    "tapping_feet": (ml_analyzer._detect_pose, lambda lm: [lm.landmark[i] for i in (27, 28)], 20),
+}
+
+
+def _frames(image: str, n: int, size: tuple) -> List[bytes]:
+    src = Image.open(image).convert("RGB")
+    w, h = size
+    # Full height: FaceMesh misses smaller faces on the wide canvases
+    side = min(w, h)
+    person = src.resize((side, side))
+    frames = []
+    for i in range(n):
+        canvas = Image.new("RGB", size, (90, 90, 90))
+        canvas.paste(person, ((w - side) // 2 + i * 3, 0))
+        buf = BytesIO()
+        canvas.save(buf, "JPEG", quality=85)
+        frames.append(buf.getvalue())
+    return frames
+
+
+def _landmarks(behavior: str, rgb: np.ndarray) -> tuple | None:
+    """Normalised (xs, ys) of the points a behaviour crops around, or None."""
+
+    detect, points, _ = _BEHAVIORS[behavior]
+    found = detect(rgb)
+    if found is None:
+        return None
+    pts = points(found)
+    return [p.x for p in pts], [p.y for p in pts]
+
+
+def _reference_crop(behavior: str, frame: bytes, xs: List[float], ys: List[float]) -> torch.Tensor | None:
+    """The previous path: full decode, pixel crop, `_IMAGE_TF`."""
+
+    margin = _BEHAVIORS[behavior][2]
+    rgb = np.array(Image.open(BytesIO(frame)).convert("RGB"))
+    h, w, _ = rgb.shape
+    x_min, x_max = max(min(xs) * w - margin, 0), min(max(xs) * w + margin, w)
+    y_min, y_max = max(min(ys) * h - margin, 0), min(max(ys) * h + margin, h)
+    if x_max - x_min < 10 or y_max - y_min < 10:
+        return None
+    crop = rgb[int(y_min): int(y_max), int(x_min): int(x_max)]
+    return ml_analyzer._IMAGE_TF(Image.fromarray(crop))
+
+
+def _diff(ref: List[torch.Tensor], new: List[np.ndarray]) -> Dict[str, float]:
+    diff = (torch.stack(ref) - crops_to_tensor(new)).abs()
+    return {"max_abs_diff": round(float(diff.max()), 6), "mean_abs_diff": round(float(diff.mean()), 6)}
+
+
+def _per_frame_ms(fn, items: List[Any], repeat: int = 3) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(*item)
+    return round((time.perf_counter() - t0) / (repeat * len(items)) * 1000, 3)
+
+
+def check(frames: List[bytes], size: tuple) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"draft_scale": _draft_scale(size, DECODE_MIN_SIDE)}
+    full = [np.array(Image.open(BytesIO(f)).convert("RGB")) for f in frames]
+    for behavior in _BEHAVIORS:
+        margin = _BEHAVIORS[behavior][2]
+        found = [(f, lm) for f, lm in zip(frames, (_landmarks(behavior, rgb) for rgb in full)) if lm is not None]
+        entry: Dict[str, Any] = {"frames": len(frames), "detected": len(found)}
+        report[behavior] = entry
+        if not found:
+            continue
+
+        # Crop + resize fidelity on the same (full-size) landmarks
+        ref = [_reference_crop(behavior, f, *lm) for f, lm in found]
+        new = [DecodedFrame(f).crop(*lm, margin) for f, lm in found]
+        entry["crop"] = _diff([r for r in ref if r is not None], [n for n in new if n is not None])
+        entry["crop"]["reference_ms"] = _per_frame_ms(lambda f, lm: _reference_crop(behavior, f, *lm), found)
+        entry["crop"]["batched_ms"] = _per_frame_ms(lambda f, lm: DecodedFrame(f).crop(*lm, margin), found)
+
+        # Landmarks detected on the reduced decode
+        drift = []
+        for f, (xs, ys) in found:
+            lm = _landmarks(behavior, DecodedFrame(f).rgb)
+            if lm is not None:
+                drift.append(np.abs(np.array(lm) - np.array([xs, ys])).mean())
+        entry["landmark_drift"] = round(float(np.mean(drift)), 6) if drift else None
+
+        # End to end: `_frame_features` against the reference path
+        feats = ml_analyzer._sequence_features(behavior, frames)
+        refs = [None if lm is None else _reference_crop(behavior, f, *lm)
+                for f, lm in zip(frames, (_landmarks(behavior, rgb) for rgb in full))]
+        pairs = [(r, n) for r, n in zip(refs, feats) if r is not None and n is not None]
+        entry["end_to_end"] = _diff([r for r, _ in pairs], [n for _, n in pairs]) if pairs else {}
+        entry["end_to_end"]["detection_mismatch"] = sum((r is None) != (n is None) for r, n in zip(refs, feats))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check batched preprocessing against _IMAGE_TF")
+    parser.add_argument("--image", required=True, help="Photo of a person to pan over the frames")
+    parser.add_argument("--frames", type=int, default=8)
+    parser.add_argument("--sizes", nargs="+", default=["640x480", "1280x720", "1920x1080", "2560x1440"])
+    parser.add_argument("--atol-mean", type=float, default=0.02, help="Allowed mean difference of reduced decodes")
+    args = parser.parse_args()
+
+    # crops_to_tensor against ToTensor on the same uint8 crops
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 256, (64, 64, 3), dtype=np.uint8) for _ in range(8)]
+    ref = torch.stack([ml_analyzer._IMAGE_TF(Image.fromarray(c)) for c in crops])
+    out = torch.empty(ref.shape)
+    report: Dict[str, Any] = {
+        "decode_min_side": DECODE_MIN_SIDE,
+        "to_tensor_max_abs_diff": float((crops_to_tensor(crops, out=out) - ref).abs().max()),
+        "sizes": {},
+    }
+
+    ok = report["to_tensor_max_abs_diff"] == 0.0
+    for spec in args.sizes:
+        size = tuple(int(v) for v in spec.lower().split("x"))
+        result = report["sizes"][spec] = check(_frames(args.image, args.frames, size), size)
+        for behavior in _BEHAVIORS:
+            entry = result[behavior]
+            if "crop" not in entry:
+                continue
+            if result["draft_scale"] == 1:
+                ok &= entry["crop"]["max_abs_diff"] == 0.0 and entry["end_to_end"].get("max_abs_diff", 0.0) == 0.0
+            else:
+                ok &= entry["crop"]["mean_abs_diff"] <= args.atol_mean
+
+    report["ok"] = bool(ok)
+    sys.stdout.write(json.dumps(report, indent=2) + "\n")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
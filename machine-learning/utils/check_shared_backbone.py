@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Check that the shared-backbone models match the original per-model ones.
+
+Usage
+-----
+python utils/check_shared_backbone.py [--frames 8] [--batch 2] [--atol 1e-5]
+
+For every image-sequence behaviour the original EyeGazeLSTM/TappingCNN is
+built and loaded from its .pth (or, if the file is missing, randomly
+initialised from a fixed seed with the backbone weights of the first model,
+mirroring the identical frozen ImageNet features of the real files).  Its
+state dict is then remapped onto FrozenBackbone + FrameSequenceHead, on its
+own backbone copy and on one backbone shared by all heads (as model_loader
+serves them), and both are compared against the original forward on the
+same random input.
+
+Prints a JSON report and exits non-zero if any difference exceeds --atol.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import torch
+
+from model_loader import FRAME_BEHAVIORS, MODEL_CLASSES, MODEL_FILES, project_root
+from models.architectures import (
+    BackboneHeadModel,
+    FrameSequenceHead,
+    FrozenBackbone,
+    split_frame_state_dict,
+)
+
+
+def _reference_models() -> dict:
+    torch.manual_seed(0)
+    refs, backbone_sd = {}, None
+    for behavior in FRAME_BEHAVIORS:
+        model = MODEL_CLASSES[behavior]()
+        path = os.path.join(project_root, MODEL_FILES[behavior])
+        if os.path.exists(path):
+            model.load_state_dict(torch.load(path, map_location="cpu"))
+        elif backbone_sd is not None:
+            model.feature_extractor.load_state_dict(backbone_sd)
+        if backbone_sd is None:
+            backbone_sd = model.feature_extractor.state_dict()
+        refs[behavior] = model.eval()
+    return refs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare shared-backbone outputs with per-model outputs")
+    parser.add_argument("--frames", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=2)
+    parser.add_argument("--atol", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    refs = _reference_models()
+    x = torch.rand(args.batch, args.frames, 3, 64, 64)
+
+    shared = FrozenBackbone()
+    heads, report = {}, {}
+    for i, (behavior, ref) in enumerate(refs.items()):
+        backbone_sd, head_sd = split_frame_state_dict(ref.state_dict())
+        if i == 0:
+            shared.load_state_dict(backbone_sd)
+        own = FrozenBackbone()
+        own.load_state_dict(backbone_sd)
+        heads[behavior] = FrameSequenceHead.from_state_dict(head_sd).eval()
+
+        with torch.no_grad():
+            expected = ref(x)
+            single = BackboneHeadModel(own, heads[behavior])(x)
+        report[behavior] = {"single_head_max_abs_diff": (single - expected).abs().max().item()}
+
+    with torch.no_grad():
+        for behavior, ref in refs.items():
+            diff = (BackboneHeadModel(shared, heads[behavior])(x) - ref(x)).abs().max().item()
+            report[behavior]["shared_backbone_max_abs_diff"] = diff
+
+    ok = all(v <= args.atol for r in report.values() for v in r.values())
+    sys.stdout.write(json.dumps({"ok": ok, "atol": args.atol, "behaviors": report}, indent=2))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Check that streaming inference matches full-window inference.
+
+Usage
+-----
+python utils/check_streaming.py [--steps 20] [--atol 1e-5]
+
+For every unidirectional model (WPMModel, EyeGazeLSTM, TappingCNN and the
+shared-backbone BackboneHeadModel) a random sequence is pushed through
+`forward_step` in uneven chunks, carrying the LSTM state; after every push
+the output must equal the plain forward pass over all steps so far.  The
+sit/stand bounded-window fallback and the StreamManager session path are
+checked the same way against `_predict`.
+
+Prints a JSON report and exits non-zero on any mismatch beyond --atol.
+"""
+
+import argparse
+import json
+import random
+import sys
+
+import torch
+
+import ml_analyzer
+import streaming
+from models.architectures import (
+    BackboneHeadModel,
+    EyeGazeLSTM,
+    FrameSequenceHead,
+    FrozenBackbone,
+    SitStandLSTM,
+    TappingCNN,
+    WPMModel,
+)
+
+
+def _chunks(total: int, rng: random.Random):
+    start = 0
+    while start < total:
+        size = rng.randint(1, 4)
+        yield start, min(total, start + size)
+        start += size
+
+
+@torch.no_grad()
+def _max_step_diff(model: torch.nn.Module, x: torch.Tensor, rng: random.Random) -> float:
+    state, worst = None, 0.0
+    for start, end in _chunks(x.shape[1], rng):
+        out, state = model.forward_step(x[:, start:end].contiguous(), state)
+        worst = max(worst, (out - model(x[:, :end].contiguous())).abs().max().item())
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare streaming and full-window outputs")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--atol", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    rng = random.Random(0)
+    image_seq = torch.rand(2, args.steps, 3, 64, 64)
+
+    report = {
+        "WPMModel": _max_step_diff(WPMModel().eval(), torch.rand(2, args.steps, 1) * 200, rng),
+        "EyeGazeLSTM": _max_step_diff(EyeGazeLSTM().eval(), image_seq, rng),
+        "TappingCNN": _max_step_diff(TappingCNN().eval(), image_seq, rng),
+        "BackboneHeadModel": _max_step_diff(
+            BackboneHeadModel(FrozenBackbone(), FrameSequenceHead(num_classes=2)).eval(), image_seq, rng
+        ),
+    }
+
+    # Session path: rapid_talking values pushed in pieces vs. one-shot _predict
+    values = [rng.uniform(80, 220) for _ in range(args.steps)]
+    manager = streaming.StreamManager()
+    sid = manager.open("rapid_talking")["session_id"]
+    worst = 0.0
+    for start, end in _chunks(len(values), rng):
+        pushed = manager.push(sid, values[start:end])
+        expected = ml_analyzer._predict("rapid_talking", values[:end])
+        worst = max(worst, abs(pushed["confidence"] - expected["confidence"]))
+    report["session:rapid_talking"] = worst
+
+    # Bidirectional fallback: bounded window equals the model on that window
+    poses = torch.rand(args.steps + streaming.SIT_STAND_WINDOW, 66)
+    sid = manager.open("sit_stand")["session_id"]
+    model: SitStandLSTM = ml_analyzer.get_model("sit_stand")
+    worst = 0.0
+    for start, end in _chunks(poses.shape[0], rng):
+        manager.push(sid, poses[start:end].tolist())
+        session = manager.sessions[sid]
+        window = poses[max(0, end - streaming.SIT_STAND_WINDOW):end].unsqueeze(0)
+        with torch.no_grad():
+            worst = max(worst, (session.last_output - model(window)[0]).abs().max().item())
+    report["session:sit_stand_window"] = worst
+
+    # Confidences are rounded to 4 decimals in the JSON results
+    ok = all(v <= (5e-5 if k == "session:rapid_talking" else args.atol) for k, v in report.items())
+    sys.stdout.write(json.dumps({"ok": ok, "atol": args.atol, "max_abs_diff": report}, indent=2))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
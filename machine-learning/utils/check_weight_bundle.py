@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Compare loading model weights from per-model ``.pth`` files and from a bundle.
+
+Usage
+-----
+python utils/check_weight_bundle.py [--bundle models/weights.safetensors] [--workers 3]
+
+The bundle's state dicts are also written to temporary ``.pth`` files.  Then
+``--workers`` processes are started at once per mode, each building every
+model in the bundle and loading its weights the way model_loader does:
+
+    pth     ``torch.load`` + ``load_state_dict`` (a private copy per worker)
+    bundle  models built on the ``meta`` device, `WeightBundle.state_dict`
+            + ``load_state_dict(assign=True)`` (tensors on the shared mapped
+            pages; checksums verified)
+
+Per mode it reports the mean load time and, from /proc/self/smaps_rollup
+while all workers are alive, their mean private and shared RSS (shared
+pages, libraries included, are counted once on the host).  Outputs must be
+identical.  Linux only.  Prints one JSON object.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+_MODES = ("pth", "bundle")
+
+
+def _rollup_mb() -> Dict[str, float]:
+    fields = {}
+    with open("/proc/self/smaps_rollup", "r", encoding="ascii") as fp:
+        for line in fp:
+            name, _, rest = line.partition(":")
+            if name in ("Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                fields[name] = int(rest.split()[0]) / 1024
+    return {
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+    }
+
+
+def _child(mode: str, bundle_path: str, pth_dir: str) -> None:
+    import torch
+
+    from model_loader import MODEL_CLASSES
+    from weight_bundle import WeightBundle
+
+    behaviors = WeightBundle(bundle_path).behaviors
+    with torch.device("meta" if mode == "bundle" else "cpu"):
+        models = {b: MODEL_CLASSES[b]().eval() for b in behaviors}
+    t0 = time.perf_counter()
+    bundle = WeightBundle(bundle_path) if mode == "bundle" else None
+    for behavior, model in models.items():
+        if bundle is not None:
+            model.load_state_dict(bundle.state_dict(behavior), assign=True)
+        else:
+            model.load_state_dict(torch.load(os.path.join(pth_dir, f"{behavior}.pth"), weights_only=True))
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    torch.manual_seed(0)
+    outputs = {}
+    with torch.inference_mode():
+        for behavior, model in models.items():
+            if behavior == "rapid_talking":
+                x = torch.rand(1, 8, 1)
+            elif behavior == "sit_stand":
+                x = torch.rand(1, 8, 66)
+            else:
+                x = torch.rand(1, 2, 3, 64, 64)
+            outputs[behavior] = model(x).flatten().tolist()
+    rss = _rollup_mb()
+    sys.stdout.write(json.dumps({
+        "load_ms": load_ms,
+        "private_mb": rss["private"],
+        "shared_mb": rss["shared"],
+        "outputs": outputs,
+    }) + "\n")
+    sys.stdout.flush()
+    sys.stdin.read()  # stay alive until every worker has measured
+
+
+def _run(mode: str, workers: int, bundle_path: str, pth_dir: str) -> List[Dict[str, Any]]:
+    procs = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, bundle_path, pth_dir],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        return [json.loads(p.stdout.readline()) for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+
+
+def main() -> None:
+    from model_loader import WEIGHT_BUNDLE
+
+    parser = argparse.ArgumentParser(description="Per-model .pth vs memory-mapped bundle loading")
+    parser.add_argument("--bundle", default=WEIGHT_BUNDLE, help="Bundle built by utils/weight_bundle.py")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "BUNDLE", "PTH_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    import torch
+
+    from weight_bundle import WeightBundle
+
+    bundle = WeightBundle(args.bundle)
+    report: Dict[str, Any] = {"path": args.bundle, "behaviors": bundle.behaviors, "workers": args.workers}
+    with tempfile.TemporaryDirectory() as pth_dir:
+        for behavior in bundle.behaviors:
+            state = {k: v.clone() for k, v in bundle.state_dict(behavior).items()}
+            torch.save(state, os.path.join(pth_dir, f"{behavior}.pth"))
+        runs = {mode: _run(mode, args.workers, args.bundle, pth_dir) for mode in _MODES}
+
+    for mode, results in runs.items():
+        report[mode] = {
+            key: round(sum(r[key] for r in results) / len(results), 1)
+            for key in ("load_ms", "private_mb", "shared_mb")
+        }
+    report["identical_outputs"] = all(r["outputs"] == runs["pth"][0]["outputs"] for rs in runs.values() for r in rs)
+    sys.stdout.write(json.dumps(report, indent=2))
+    if not report["identical_outputs"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Measure import-to-first-result time for each behaviour.
+
+Usage
+-----
+python utils/cold_start.py [--frames 30] [--behavior eye_gaze ...]
+
+Every behaviour runs in a fresh interpreter (so nothing is cached between
+them) with ``TORCH_HOME`` pointed at an empty directory, which proves no
+pretrained weights are downloaded or read from the torch hub cache.  Frame
+behaviours get synthetic JPEG frames; they may legitimately end with an
+``insufficient_*_frames`` error since there is no face/hand/pose in them, but
+the model load and the MediaPipe solver start-up are still paid for.
+
+Prints one JSON object: behaviour -> {"import_s", "first_result_s", "total_s", "result"}.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BEHAVIORS = ["rapid_talking", "sit_stand", "eye_gaze", "tapping_hands", "tapping_feet"]
+
+# Runs inside the child interpreter.  Timing starts before anything heavy is
+# imported; input construction is excluded from the measurement.
+_CHILD = r"""
+import time
+_t0 = time.perf_counter()
+import base64, io, json, sys
+import ml_analyzer
+_t_import = time.perf_counter()
+
+behavior, n_frames = sys.argv[1], int(sys.argv[2])
+if behavior == "rapid_talking":
+    data = [120.0 + i for i in range(n_frames)]
+elif behavior == "sit_stand":
+    data = [[0.5] * 66 for _ in range(n_frames)]
+else:
+    import numpy as np
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.fromarray(np.random.RandomState(0).randint(0, 255, (480, 640, 3), dtype=np.uint8)).save(buf, "JPEG")
+    frame = "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode()
+    data = [frame] * n_frames
+
+_t_start = time.perf_counter()
+result = ml_analyzer._predict(behavior, data)
+_t_done = time.perf_counter()
+
+sys.__stdout__.write(json.dumps({
+    "import_s": round(_t_import - _t0, 3),
+    "first_result_s": round(_t_done - _t_start, 3),
+    "total_s": round((_t_import - _t0) + (_t_done - _t_start), 3),
+    "result": result,
+}))
+"""
+
+
+def measure(behavior: str, n_frames: int) -> dict:
+    utils_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as torch_home:
+        env = dict(os.environ, TORCH_HOME=torch_home, PYTHONPATH=utils_dir)
+        proc = subprocess.run(
+            [sys.executable, "-c", _CHILD, behavior, str(n_frames)],
+            cwd=os.path.dirname(utils_dir),
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1:] or "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure cold-start latency per behaviour")
+    parser.add_argument("--frames", type=int, default=30, help="Sequence length per request")
+    parser.add_argument("--behavior", action="append", choices=BEHAVIORS, help="Limit to these behaviours")
+    args = parser.parse_args()
+
+    report = {b: measure(b, args.frames) for b in (args.behavior or BEHAVIORS)}
+    sys.stdout.write(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
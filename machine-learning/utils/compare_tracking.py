@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Compare MediaPipe static-image mode with tracking (video) mode.
+
+Usage
+-----
+python utils/compare_tracking.py --image face.jpg [--frames 60]
+python utils/compare_tracking.py --frames-file clip.bin
+
+The input is an ordered clip: either a frames file (frame container or JSON
+list of data-URLs, as written by the Node controller) or one still image that
+is panned slowly to simulate camera motion.  Every frame runs through the
+static solvers and through a fresh set of tracking solvers.  Per solver it
+reports the per-frame latency of both modes, their detection rates and how
+closely the landmarks agree (mean / max absolute difference of normalised
+x, y over frames detected in both modes), plus the behaviour predictions
+each mode leads to.
+
+Prints one JSON object.
+"""
+
+import argparse
+import base64
+import io
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from PIL import Image
+
+import ml_analyzer
+from ml_analyzer import (
+    _decode_image,
+    _detect_face,
+    _detect_hand,
+    _detect_pose,
+    _predict,
+    tracking_mode,
+    video_solvers,
+)
+
+_DETECTORS = {
+    "face_mesh": _detect_face,
+    "hands": _detect_hand,
+    "pose": _detect_pose,
+}
+
+
+def _panned_clip(path: str, n: int, size: int = 480) -> List[str]:
+    """`n` JPEG data-URLs of a crop drifting ~2 px per frame over the image."""
+
+    img = Image.open(path).convert("RGB")
+    w, h = img.size
+    side = int(min(w, h) * 0.9)
+    frames = []
+    for i in range(n):
+        # Back-and-forth so long clips stay inside the image
+        step = i % (2 * (min(w, h) - side) or 1)
+        off = step if step <= min(w, h) - side else 2 * (min(w, h) - side) - step
+        crop = img.crop((off, off // 2, off + side, off // 2 + side)).resize((size, size))
+        buf = io.BytesIO()
+        crop.save(buf, "JPEG", quality=85)
+        frames.append("data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode())
+    return frames
+
+
+def _xy(landmarks: Any) -> np.ndarray | None:
+    if landmarks is None:
+        return None
+    return np.array([(lm.x, lm.y) for lm in landmarks.landmark], dtype=np.float32)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 2)
+
+
+def _run(detect, rgbs: List[np.ndarray]) -> Dict[str, Any]:
+    landmarks, latency = [], []
+    for rgb in rgbs:
+        t0 = time.perf_counter()
+        landmarks.append(_xy(detect(rgb)))
+        latency.append((time.perf_counter() - t0) * 1000)
+    return {
+        "landmarks": landmarks,
+        "latency_ms": {
+            "first": round(latency[0], 2),
+            "mean": round(float(np.mean(latency)), 2),
+            "p50": _percentile(latency, 50),
+            "p95": _percentile(latency, 95),
+        },
+        "detection_rate": round(sum(lm is not None for lm in landmarks) / len(landmarks), 4),
+    }
+
+
+def _agreement(a: List[np.ndarray | None], b: List[np.ndarray | None]) -> Dict[str, Any]:
+    diffs = [np.abs(x - y) for x, y in zip(a, b) if x is not None and y is not None]
+    if not diffs:
+        return {"frames_compared": 0}
+    return {
+        "frames_compared": len(diffs),
+        "mean_abs_diff": round(float(np.mean([d.mean() for d in diffs])), 5),
+        "max_abs_diff": round(float(max(d.max() for d in diffs)), 5),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Static vs tracking MediaPipe landmarks")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--image", help="Still image to pan into a synthetic clip")
+    source.add_argument("--frames-file", help="Frame container or JSON list of frames, in order")
+    parser.add_argument("--frames", type=int, default=60, help="Clip length with --image")
+    parser.add_argument("--solvers", nargs="+", default=list(_DETECTORS), choices=list(_DETECTORS))
+    parser.add_argument(
+        "--behaviors",
+        nargs="*",
+        default=["eye_gaze", "tapping_hands", "tapping_feet", "sit_stand"],
+        help="Behaviours to predict in both modes",
+    )
+    args = parser.parse_args()
+
+    if args.image:
+        frames = _panned_clip(args.image, args.frames)
+    else:
+        payload = ml_analyzer._load_payload(args.frames_file)
+        frames = payload if isinstance(payload, list) else payload.get("frame_sequence") or next(iter(payload.values()))
+    rgbs = [np.array(_decode_image(f)) for f in frames]
+
+    report: Dict[str, Any] = {"frames": len(rgbs), "solvers": {}, "predictions": {}}
+    for name in args.solvers:
+        detect = _DETECTORS[name]
+        detect(rgbs[0])  # build the static graph outside the timing
+        static = _run(detect, rgbs)
+        with video_solvers():
+            detect(rgbs[0])
+        with video_solvers():  # reset: the timed run starts from a fresh detection
+            tracked = _run(detect, rgbs)
+        report["solvers"][name] = {
+            "static": {k: v for k, v in static.items() if k != "landmarks"},
+            "tracking": {k: v for k, v in tracked.items() if k != "landmarks"},
+            "agreement": _agreement(static["landmarks"], tracked["landmarks"]),
+        }
+
+    for behavior in args.behaviors:
+        with tracking_mode(False):
+            static = _predict(behavior, frames)
+        with tracking_mode(True):
+            tracked = _predict(behavior, frames)
+        report["predictions"][behavior] = {"static": static, "tracking": tracked}
+
+    sys.stdout.write(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Measure what frame selection does to accuracy, frames processed and time.
+
+Usage
+-----
+python utils/evaluate_frame_select.py --data labelled.json
+        [--threshold 2.0] [--max-frames 16] [--sampling uniform motion]
+python utils/evaluate_frame_select.py --image face.jpg [--entries 4] [--frames 30]
+
+``--data`` is a labelled set in the format of the ``/api/ml/evaluate`` body:
+a list (or ``{"behaviors": [...]}``) of ``{"type", "data", "label"}``
+entries.  ``--image`` instead builds an unlabelled set from a photo, panned
+in steps and held for a few frames each like a webcam at a fixed rate, so
+only the agreement with the unselected run is reported.
+
+The set is run through `analyze_batch` without selection, then once per
+variant: deduplication alone and deduplication plus the ``--max-frames`` cap
+for every ``--sampling`` mode.  Per run the report holds the accuracy on the
+labelled entries, the fraction of labels equal to the unselected run, the mean
+``frames_used`` of frame-based entries and the wall time.  The feature cache
+is off so every run pays its full preprocessing cost.
+
+Prints one JSON object.
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from io import BytesIO
+from typing import Any, Dict, List
+
+from PIL import Image
+
+os.environ["ML_CACHE_MB"] = "0"
+
+import frame_select  # noqa: E402
+from batch_analyzer import analyze_batch  # noqa: E402
+from ml_analyzer import frame_selection  # noqa: E402
+
+
+def _synthetic(image: str, entries: int, frames: int, hold: int = 3) -> List[Dict[str, Any]]:
+    src = Image.open(image).convert("RGB")
+    side = int(min(src.size) * 0.85)
+    travel = min(src.size) - side
+    out = []
+    for e in range(entries):
+        seq = []
+        for i in range(frames):
+            step = (e * 7 + i // hold * 4) % max(1, travel)
+            buf = BytesIO()
+            src.crop((step, step // 2, step + side, step // 2 + side)).resize((480, 480)).save(buf, "JPEG", quality=85)
+            seq.append("data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode("ascii"))
+        for behavior in ("eye_gaze", "tapping_hands", "sit_stand"):
+            out.append({"type": behavior, "data": seq})
+    return out
+
+
+def _run(entries: List[Dict[str, Any]], enabled: bool) -> Dict[str, Any]:
+    unlabelled = [{"type": e["type"], "data": e["data"]} for e in entries]
+    t0 = time.perf_counter()
+    with frame_selection(enabled):
+        results = analyze_batch(unlabelled)["results"]
+    return {"results": results, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def _score(entries: List[Dict[str, Any]], run: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    results = run["results"]
+    labelled = [(e["label"], r["label"]) for e, r in zip(entries, results) if e.get("label") is not None]
+    agree = [r["label"] == b["label"] for r, b in zip(results, baseline["results"])]
+    used = [r["frames_used"] for r in results if "frames_used" in r]
+    return {
+        "accuracy": round(sum(int(want) == got for want, got in labelled) / len(labelled), 4) if labelled else None,
+        "agreement_with_unselected": round(sum(agree) / len(agree), 4) if agree else None,
+        "mean_frames_used": round(sum(used) / len(used), 2) if used else None,
+        "errors": sum("error" in r for r in results),
+        "seconds": run["seconds"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate frame selection on a labelled set")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--data", help="Labelled JSON set (body format of /api/ml/evaluate)")
+    source.add_argument("--image", help="Build an unlabelled set from this photo")
+    parser.add_argument("--entries", type=int, default=4, help="With --image: sequences to build")
+    parser.add_argument("--frames", type=int, default=30, help="With --image: frames per sequence")
+    parser.add_argument("--threshold", type=float, default=frame_select.DEDUP_THRESHOLD)
+    parser.add_argument("--max-frames", type=int, default=16)
+    parser.add_argument("--sampling", nargs="+", default=["uniform", "motion"], choices=["uniform", "motion"])
+    args = parser.parse_args()
+
+    if args.data:
+        with open(args.data, "r", encoding="utf-8") as fp:
+            entries = json.load(fp)
+        entries = entries.get("behaviors", entries) if isinstance(entries, dict) else entries
+    else:
+        entries = _synthetic(args.image, args.entries, args.frames)
+
+    baseline = _run(entries, False)
+    report: Dict[str, Any] = {"entries": len(entries), "unselected": _score(entries, baseline, baseline)}
+    frames = [len(e["data"]) for e in entries if isinstance(e.get("data"), list)]
+    report["unselected"]["mean_frames_received"] = round(sum(frames) / len(frames), 2) if frames else None
+
+    variants = [("dedup", args.threshold, 0, "uniform")]
+    variants += [(f"dedup+cap{args.max_frames}_{s}", args.threshold, args.max_frames, s) for s in args.sampling]
+    for name, threshold, max_frames, sampling in variants:
+        frame_select.DEDUP_THRESHOLD, frame_select.MAX_FRAMES, frame_select.SAMPLING = threshold, max_frames, sampling
+        report[name] = _score(entries, _run(entries, True), baseline)
+
+    sys.stdout.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
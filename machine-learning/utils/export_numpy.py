@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Export the small LSTM models to ``.npz`` for the torch-free path.
+
+Usage
+-----
+python utils/export_numpy.py [--behavior rapid_talking sit_stand] [--atol 1e-5]
+
+Writes ``models/rapid_talking.npz`` and ``models/sit-stand.npz`` next to
+their ``.pth`` (see numpy_lstm.py; they are not tracked in git, the Docker
+images build them), then checks the NumPy implementation
+against torch on a batch of random variable-length sequences, each compared
+with the torch output for that sequence alone.  Re-run after retraining: the
+torch-free analyzer refuses an ``.npz`` whose recorded ``.pth`` checksum no
+longer matches.
+
+Prints a JSON report and exits non-zero on a mismatch beyond --atol.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import torch
+
+from model_loader import MODEL_FILES, get_model, project_root
+from numpy_lstm import NumpyLSTMModel, save_npz
+from weight_bundle import file_sha256
+
+# behaviour -> output activation applied after ``fc``
+EXPORTABLE = {"rapid_talking": "sigmoid", "sit_stand": "logits"}
+
+
+def npz_path(behavior: str) -> str:
+    return os.path.join(project_root, os.path.splitext(MODEL_FILES[behavior])[0] + ".npz")
+
+
+def export(behavior: str) -> str:
+    pth = os.path.join(project_root, MODEL_FILES[behavior])
+    if not os.path.exists(pth):
+        raise FileNotFoundError(f"{pth} not found: refusing to export random weights")
+    state = {k: v.detach().cpu().numpy() for k, v in get_model(behavior).state_dict().items()}
+    out = npz_path(behavior)
+    save_npz(out, state, behavior=behavior, output=EXPORTABLE[behavior], source_sha256=file_sha256(pth))
+    return out
+
+
+@torch.inference_mode()
+def max_diff(behavior: str, n: int = 16, max_len: int = 40) -> float:
+    model = get_model(behavior)
+    rng = np.random.default_rng(0)
+    size = model.lstm.input_size
+    scale = 200.0 if behavior == "rapid_talking" else 1.0
+    seqs = [(rng.random((int(rng.integers(1, max_len)), size)) * scale).astype(np.float32) for _ in range(n)]
+
+    numpy_out = NumpyLSTMModel.load(npz_path(behavior)).predict(seqs)
+    worst = 0.0
+    for seq, got in zip(seqs, numpy_out):
+        ref = model(torch.from_numpy(seq).unsqueeze(0))[0].numpy()
+        worst = max(worst, float(np.abs(ref - got).max()))
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export LSTM models to .npz and verify them")
+    parser.add_argument("--behavior", nargs="+", default=list(EXPORTABLE), choices=list(EXPORTABLE))
+    parser.add_argument("--atol", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    report = {}
+    for behavior in args.behavior:
+        path = export(behavior)
+        report[behavior] = {"path": os.path.relpath(path, project_root), "max_abs_diff": max_diff(behavior)}
+
+    ok = all(r["max_abs_diff"] <= args.atol for r in report.values())
+    sys.stdout.write(json.dumps({"ok": ok, "atol": args.atol, "exported": report}, indent=2))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
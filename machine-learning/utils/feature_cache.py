@@ -0,0 +1,206 @@
+"""Content-addressed two-tier cache for per-frame preprocessing results.
+
+Clients send overlapping sliding windows and the evaluation endpoint re-runs
+the same labelled set, so most frames of a request have been decoded,
+landmarked and cropped before.  Entries are keyed by a hash of the frame bytes
+(plus behaviour / stage, see `make_key`) and hold landmarks, 64×64 crop arrays
+or backbone feature vectors.
+
+* Tier 1: in-memory LRU bounded by an (estimated) byte budget.
+* Tier 2 (optional): an SQLite file that survives restarts.  Memory misses
+  fall through to it and hits are promoted back into memory.
+
+Configured from the environment by `get_cache`:
+
+    ML_CACHE_MB         memory budget in MB (default 256, 0 disables caching)
+    ML_CACHE_DB         path of the SQLite file (disk tier off when unset)
+    ML_CACHE_DISK_MB    disk budget in MB (default 2048)
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+__all__ = ["FeatureCache", "get_cache", "make_key"]
+
+# Bump when preprocessing changes so stale disk entries are never served
+# (2: image crops are stored as resized uint8 arrays, see image_batch.py)
+CACHE_VERSION = "2"
+
+_MISSING = object()
+
+
+def make_key(data: Any, *parts: str) -> str:
+    """Content hash of `data` (bytes-like) joined with `parts`, e.g. the behaviour."""
+
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return ":".join((digest, CACHE_VERSION) + parts)
+
+
+def _sizeof(value: Any) -> int:
+    """Rough in-memory footprint, good enough for budget accounting."""
+
+    if value is None:
+        return 16
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(_sizeof(v) if isinstance(v, (list, tuple, dict, np.ndarray)) else 24 for v in value)
+    if isinstance(value, dict):
+        return 232 + sum(_sizeof(v) + 64 for v in value.values())
+    return 64
+
+
+class FeatureCache:
+    """Thread-safe in-memory LRU with an optional SQLite second tier."""
+
+    def __init__(self, max_bytes: int, disk_path: str | None = None, max_disk_bytes: int = 2 << 30):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "disk_hits": 0,
+            "disk_writes": 0,
+            "disk_evictions": 0,
+        }
+
+        self._db = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        """(found, value); a cached ``None`` (e.g. "no face") is a hit.  Counts a hit or a miss."""
+
+        value = self._get(key)
+        return (False, None) if value is _MISSING else (True, value)
+
+    def put(self, key: str, value: Any) -> None:
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._put_memory(key, value, size)
+            if self._db is not None:
+                self._put_disk(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes if self._db is not None else None,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._disk_bytes = 0
+
+    # ------------------------------------------------------------------
+    # Internals (called with or taking the lock)
+    # ------------------------------------------------------------------
+
+    def _get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[0]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = pickle.loads(row[0])
+                    self.counters["hits"] += 1
+                    self.counters["disk_hits"] += 1
+                    self._put_memory(key, value, _sizeof(value))
+                    return value
+
+            self.counters["misses"] += 1
+            return _MISSING
+
+    def _put_memory(self, key: str, value: Any, size: int) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.counters["evictions"] += 1
+
+    def _put_disk(self, key: str, value: Any) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        cur = self._db.execute(
+            "INSERT OR IGNORE INTO cache (key, value, size, created) VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), time.time()),
+        )
+        if cur.rowcount:
+            self._disk_bytes += len(blob)
+            self.counters["disk_writes"] += 1
+        if self._disk_bytes > self.max_disk_bytes:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        # Drop the oldest entries until 10% under budget, leaving headroom
+        target = int(self.max_disk_bytes * 0.9)
+        rows = self._db.execute("SELECT key, size FROM cache ORDER BY created").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            doomed.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM cache WHERE key = ?", doomed)
+        self.counters["disk_evictions"] += len(doomed)
+
+
+_CACHE: FeatureCache | None = None
+
+
+def get_cache() -> FeatureCache | None:
+    """Process-wide cache configured from the environment (None when disabled)."""
+
+    global _CACHE
+    if _CACHE is None:
+        max_mb = float(os.environ.get("ML_CACHE_MB", "256"))
+        if max_mb <= 0:
+            return None
+        _CACHE = FeatureCache(
+            int(max_mb * 1024 * 1024),
+            disk_path=os.environ.get("ML_CACHE_DB") or None,
+            max_disk_bytes=int(float(os.environ.get("ML_CACHE_DISK_MB", "2048")) * 1024 * 1024),
+        )
+    return _CACHE
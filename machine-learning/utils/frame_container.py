@@ -0,0 +1,108 @@
+"""Compact binary container for frame payloads.
+
+The Node controller used to write base64 ``data:image/jpeg`` URLs inside a
+JSON temp file: ~33% bigger than the JPEGs and parsed twice.  This container
+stores the JPEGs as raw length-prefixed blobs next to a small JSON document:
+
+    offset  size  field
+    0       4     magic  b"BEAF"
+    4       1     version (1)
+    5       3     reserved (zero)
+    8       4     metadata length M (uint32, little endian)
+    12      M     metadata, UTF-8 JSON
+    12+M    ...   blobs: uint32 length N, then N bytes of JPEG, repeated
+
+Inside the metadata every frame is replaced by ``{"$frame": i}`` which refers
+to the i-th blob, so the same format carries a single-behaviour payload or a
+whole batch array.  `read_container` memory-maps the file and substitutes each
+placeholder with a zero-copy ``memoryview`` slice of the mapping.
+
+The writer lives in server/utils/frameContainer.js; `write_container` here is
+the Python equivalent used by the benchmarks.
+"""
+
+import json
+import mmap
+import struct
+from typing import Any, List
+
+MAGIC = b"BEAF"
+VERSION = 1
+_HEADER = struct.Struct("<4sB3xI")
+_LENGTH = struct.Struct("<I")
+
+__all__ = ["MAGIC", "is_container", "read_container", "write_container"]
+
+
+def is_container(path: str) -> bool:
+    """True if `path` starts with the container magic (vs. a JSON file)."""
+
+    with open(path, "rb") as fp:
+        return fp.read(len(MAGIC)) == MAGIC
+
+
+def _resolve(node: Any, blobs: List[memoryview]) -> Any:
+    if isinstance(node, dict):
+        if len(node) == 1 and "$frame" in node:
+            return blobs[node["$frame"]]
+        return {k: _resolve(v, blobs) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_resolve(v, blobs) for v in node]
+    return node
+
+
+def read_container(path: str) -> Any:
+    """Memory-map `path` and return its payload with frames as memoryviews.
+
+    The mapping stays alive as long as any returned memoryview does.
+    """
+
+    with open(path, "rb") as fp:
+        mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mm)
+    magic, version, meta_len = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a frame container")
+    if version != VERSION:
+        raise ValueError(f"Unsupported frame container version: {version}")
+
+    offset = _HEADER.size
+    meta = json.loads(bytes(view[offset:offset + meta_len]).decode("utf-8"))
+    offset += meta_len
+
+    blobs: List[memoryview] = []
+    end = len(view)
+    while offset < end:
+        (length,) = _LENGTH.unpack_from(view, offset)
+        offset += _LENGTH.size
+        if offset + length > end:
+            raise ValueError("Truncated frame container")
+        blobs.append(view[offset:offset + length])
+        offset += length
+
+    return _resolve(meta, blobs)
+
+
+def write_container(path: str, payload: Any) -> None:
+    """Write `payload`, storing every bytes/memoryview value as a blob."""
+
+    blobs: List[bytes] = []
+
+    def extract(node: Any) -> Any:
+        if isinstance(node, (bytes, bytearray, memoryview)):
+            blobs.append(bytes(node))
+            return {"$frame": len(blobs) - 1}
+        if isinstance(node, dict):
+            return {k: extract(v) for k, v in node.items()}
+        if isinstance(node, (list, tuple)):
+            return [extract(v) for v in node]
+        return node
+
+    meta = json.dumps(extract(payload)).encode("utf-8")
+    with open(path, "wb") as fp:
+        fp.write(_HEADER.pack(MAGIC, VERSION, len(meta)))
+        fp.write(meta)
+        for blob in blobs:
+            fp.write(_LENGTH.pack(len(blob)))
+            fp.write(blob)
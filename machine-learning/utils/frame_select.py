@@ -0,0 +1,108 @@
+"""Near-duplicate elimination and length capping for frame sequences.
+
+Optional stage in front of decoding, MediaPipe and the image models
+(``ML_FRAME_SELECT=1`` or ``"frame_select": true`` per request):
+
+1. Every frame gets a 32x32 grey thumbnail from a 1/8-scale JPEG draft
+   decode, well under a millisecond per frame.
+2. A frame is dropped as a near-duplicate when no thumbnail pixel differs
+   from the last kept frame by ``ML_DEDUP_THRESHOLD`` grey levels or more
+   (default 8; 0 keeps everything).  The largest difference rather than the
+   mean is used so a small moving region (a tapping hand) still counts:
+   webcam noise and re-encoding stay within about 4 levels, a one-pixel
+   shift of a 480p frame or a 20 px patch changing by 25 levels give 12+.
+3. If more than ``ML_MAX_FRAMES`` frames remain (default 0, no cap) they are
+   sampled down to that many.  ``ML_SAMPLING=uniform`` spaces them evenly;
+   ``motion`` spaces them evenly in cumulative change (mean thumbnail
+   difference), so stretches with movement keep more frames than still ones.
+
+Order is preserved, the first frame is always kept and at least
+``MIN_FRAMES`` survive if the sequence had that many (evenly spaced when
+deduplication leaves fewer).  Undecodable frames are dropped, as the full
+pipeline would drop them anyway.
+
+This module must not import torch: it runs before any model work.
+"""
+
+import os
+from io import BytesIO
+from typing import List, Sequence
+
+import numpy as np
+from PIL import Image
+
+__all__ = ["DEDUP_THRESHOLD", "MAX_FRAMES", "MIN_FRAMES", "SAMPLING", "select", "thumbnail"]
+
+DEDUP_THRESHOLD = float(os.environ.get("ML_DEDUP_THRESHOLD", "8"))
+MAX_FRAMES = int(os.environ.get("ML_MAX_FRAMES", "0"))
+SAMPLING = os.environ.get("ML_SAMPLING", "uniform")  # "uniform" or "motion"
+
+# Same minimum the analyzers need before they predict
+MIN_FRAMES = 3
+
+_THUMB = 32
+
+
+def thumbnail(data: bytes | memoryview) -> np.ndarray:
+    """(32, 32) float32 grey thumbnail of an encoded frame."""
+
+    img = Image.open(BytesIO(data))
+    # DCT-scaled decode (no-op for non-JPEG)
+    img.draft("L", (max(_THUMB, img.width // 8), max(_THUMB, img.height // 8)))
+    return np.asarray(img.convert("L").resize((_THUMB, _THUMB), Image.BILINEAR), dtype=np.float32)
+
+
+def _evenly(indices: List[int], n: int) -> List[int]:
+    picks = np.linspace(0, len(indices) - 1, n).round().astype(int)
+    return [indices[i] for i in sorted(set(picks.tolist()))]
+
+
+def select(
+    frames: Sequence[bytes | memoryview],
+    *,
+    threshold: float | None = None,
+    max_frames: int | None = None,
+    sampling: str | None = None,
+) -> List[int]:
+    """Indices of the frames to keep, in order (arguments default to the env settings)."""
+
+    threshold = DEDUP_THRESHOLD if threshold is None else threshold
+    max_frames = MAX_FRAMES if max_frames is None else max_frames
+    sampling = SAMPLING if sampling is None else sampling
+    if sampling not in ("uniform", "motion"):
+        raise ValueError(f"Unknown sampling: {sampling}")
+
+    valid: List[int] = []
+    kept: List[int] = []
+    motion: List[float] = []  # mean change since the previous kept frame
+    last = None
+    for i, frame in enumerate(frames):
+        try:
+            thumb = thumbnail(frame)
+        except Exception:
+            continue
+        valid.append(i)
+        diff = None if last is None else np.abs(thumb - last)
+        if diff is None or diff.max() >= threshold:
+            kept.append(i)
+            motion.append(0.0 if diff is None else float(diff.mean()))
+            last = thumb
+
+    if len(kept) < min(MIN_FRAMES, len(valid)):
+        # A still scene: keep a few evenly spaced frames rather than one
+        return _evenly(valid, min(MIN_FRAMES, len(valid)))
+
+    if max_frames and len(kept) > max_frames:
+        if sampling == "uniform":
+            return _evenly(kept, max_frames)
+        # Evenly spaced in cumulative motion (+1 so still stretches still get some)
+        cum = np.cumsum(np.asarray(motion) + 1.0)
+        targets = np.linspace(cum[0], cum[-1], max_frames)
+        picks = set(np.searchsorted(cum, targets).clip(0, len(kept) - 1).tolist())
+        # Several targets can land on one frame: top up with the most changed
+        for i in sorted(range(len(kept)), key=lambda k: -motion[k]):
+            if len(picks) >= max_frames:
+                break
+            picks.add(i)
+        return [kept[i] for i in sorted(picks)]
+    return kept
@@ -0,0 +1,167 @@
+"""Reduced-size JPEG decoding and batched crop -> tensor conversion.
+
+The per-frame reference path decodes every frame at camera resolution,
+crops a PIL image and runs ``_IMAGE_TF`` (Resize + ToTensor) on it, one
+float tensor per frame.  Here instead:
+
+* `DecodedFrame` decodes a JPEG in PIL draft mode (DCT scaling by 1/2, 1/4
+  or 1/8) to the smallest size whose short side is still at least
+  ``ML_DECODE_MIN_SIDE`` pixels (default 720, 0 always decodes full size);
+  MediaPipe runs on that image.  A crop box that would span fewer than
+  IMAGE_SIZE pixels at that scale is cut from a finer decode of the same
+  bytes instead, so small crops (eyes) keep their detail.
+* Frames that arrive decoded (video clips, see video_clip.py) are wrapped
+  with `DecodedFrame.from_array` and cropped at full size.
+* Crops stay uint8: each is resized to IMAGE_SIZE x IMAGE_SIZE with the PIL
+  bilinear filter ``_IMAGE_TF`` uses and kept as an (S, S, 3) array, a
+  quarter of the float tensor's size in the feature cache.
+* `FeatureBuffer` collects a sequence's crops as they are cut, one frame
+  at a time, in a uint8 tensor preallocated for all of its frames.
+* `crops_to_tensor` converts a whole sequence with one op into a
+  preallocated (T, 3, S, S) float32 tensor in [0, 1].
+
+Tolerance: frames decoded at full size (short side below twice
+ML_DECODE_MIN_SIDE, so up to 1080p at the default) give exactly the
+``_IMAGE_TF`` output.  For larger frames, crops cut from a reduced decode
+stay within a mean absolute difference of 0.02 of the full-size crop on the
+same landmarks, but MediaPipe's landmarks themselves move by up to about 1%
+of the frame on the smaller image, so crops can shift by that much.
+check_preprocess.py measures both.  Landmark detection costs the same at
+any input size, so a lower ML_DECODE_MIN_SIDE only saves decode time.
+"""
+
+import os
+from io import BytesIO
+from typing import Any, Dict, Sequence
+
+import numpy as np
+import torch
+from PIL import Image
+
+from instrumentation import stage
+
+__all__ = ["DECODE_MIN_SIDE", "IMAGE_SIZE", "DecodedFrame", "FeatureBuffer", "crops_to_tensor"]
+
+IMAGE_SIZE = 64
+DECODE_MIN_SIDE = int(os.environ.get("ML_DECODE_MIN_SIDE", "720"))
+
+# Scale factors JPEG DCT decoding supports
+_SCALES = (8, 4, 2, 1)
+
+
+def _draft_scale(size: Sequence[int], min_side: int) -> int:
+    """Largest DCT reduction keeping the short side at least `min_side`."""
+
+    if min_side <= 0:
+        return 1
+    short = min(size)
+    return next(s for s in _SCALES if s == 1 or short // s >= min_side)
+
+
+class DecodedFrame:
+    """One image frame, decoded once for landmarks and finer on demand for crops."""
+
+    def __init__(self, data: bytes | memoryview, min_side: int | None = None):
+        self._data = data
+        img = Image.open(BytesIO(data))
+        self.size = img.size  # full resolution (w, h)
+        scale = _draft_scale(self.size, DECODE_MIN_SIDE if min_side is None else min_side)
+        self._decoded: Dict[int, np.ndarray] = {}
+        self.rgb = self._decode(scale, img)
+
+    @classmethod
+    def from_array(cls, rgb: np.ndarray) -> "DecodedFrame":
+        """A frame that is already decoded (e.g. from a video clip), used at full size."""
+
+        frame = cls.__new__(cls)
+        frame._data = None
+        frame.size = (rgb.shape[1], rgb.shape[0])
+        frame._decoded = {1: rgb}
+        frame.rgb = rgb
+        return frame
+
+    def _decode(self, scale: int, img: Image.Image | None = None) -> np.ndarray:
+        if scale not in self._decoded:
+            img = img or Image.open(BytesIO(self._data))
+            if scale > 1:
+                w, h = self.size
+                img.draft("RGB", (w // scale, h // scale))  # no-op for non-JPEG
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            self._decoded[scale] = np.asarray(img)
+        return self._decoded[scale]
+
+    def _scale_of(self, rgb: np.ndarray) -> float:
+        return self.size[0] / rgb.shape[1]
+
+    def crop(self, xs: Sequence[float], ys: Sequence[float], margin: int, size: int = IMAGE_SIZE) -> np.ndarray | None:
+        """(size, size, 3) uint8 crop of the box around normalised points plus `margin`.
+
+        `margin` is in full-resolution pixels; None if the box is degenerate.
+        """
+
+        w, h = self.size
+        x_min, x_max = max(min(xs) * w - margin, 0), min(max(xs) * w + margin, w)
+        y_min, y_max = max(min(ys) * h - margin, 0), min(max(ys) * h + margin, h)
+        if x_max - x_min < 10 or y_max - y_min < 10:
+            return None
+
+        rgb = self.rgb
+        scale = self._scale_of(rgb)
+        if scale > 1 and min(x_max - x_min, y_max - y_min) / scale < size:
+            needed = min(x_max - x_min, y_max - y_min) / size
+            finer = next(s for s in _SCALES if s == 1 or (s < scale and s <= needed))
+            with stage("decode"):
+                rgb = self._decode(finer)
+            scale = self._scale_of(rgb)
+
+        crop = rgb[int(y_min / scale): int(y_max / scale), int(x_min / scale): int(x_max / scale)]
+        if crop.size == 0:
+            return None
+        with stage("transform"):
+            # Same filter as transforms.Resize on a PIL image
+            return np.asarray(Image.fromarray(crop).resize((size, size), Image.BILINEAR))
+
+
+class FeatureBuffer:
+    """Per-frame features of one sequence, written in order into a preallocated tensor.
+
+    Sized for every frame of the sequence up front; frames without a
+    detection are not appended, so the first ``len(buffer)`` rows are the
+    kept frames.  Rows never written are never touched, so their pages do
+    not count towards the RSS.
+    """
+
+    def __init__(self, capacity: int, shape: Sequence[int], dtype: torch.dtype = torch.uint8):
+        self.data = torch.empty((capacity, *shape), dtype=dtype)
+        self._rows = self.data.numpy()  # same memory; takes arrays and lists as they are
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def append(self, value: Any) -> None:
+        self._rows[self._len] = value
+        self._len += 1
+
+    def tensor(self) -> torch.Tensor:
+        """The appended rows (a view, no copy)."""
+
+        return self.data[: self._len]
+
+
+def crops_to_tensor(crops: Sequence[np.ndarray] | torch.Tensor, out: torch.Tensor | None = None) -> torch.Tensor:
+    """(T, 3, S, S) float32 in [0, 1] from T uint8 (S, S, 3) crops.
+
+    `crops` is a list of arrays or one (T, S, S, 3) uint8 tensor such as
+    `FeatureBuffer.tensor()`.  Equal to stacking ``ToTensor()`` of each
+    crop.  `out`, if given, must already have that shape and is filled in
+    place.
+    """
+
+    with stage("transform"):
+        src = crops if isinstance(crops, torch.Tensor) else torch.from_numpy(np.stack(crops))
+        src = src.permute(0, 3, 1, 2)
+        if out is None:
+            out = torch.empty(src.shape, dtype=torch.float32, device=src.device)
+        return torch.div(src, 255, out=out)
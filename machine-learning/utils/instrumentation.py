@@ -0,0 +1,235 @@
+"""Request timings, profiling hooks and process-wide counters.
+
+Stages are timed with `stage(name)` wherever the analyzers do real work:
+
+    load_payload     reading the JSON / frame-container temp file
+    select           frame selection thumbnails (see frame_select.py)
+    preprocess       all per-frame work of one sequence (cache lookups included)
+    decode           base64 / JPEG decode, per frame
+    landmarks        MediaPipe solver calls, per frame
+    transform        crop resize + tensor conversion, per frame
+    forward          model forward passes
+    model_load       building a model and loading its weights (first use)
+
+``decode``, ``landmarks`` and ``transform`` are nested in ``preprocess`` and
+are missing when frames are preprocessed on the process pool.
+
+Per request (``ML_TIMINGS=1``, ``--timings`` or ``"timings": true``) the
+analyzers attach a ``timings`` block to the result: total and per-stage
+milliseconds plus frames received / kept, and frames dropped by frame
+selection.  Independently of that, every stage and request feeds cheap
+process-wide counters that a long-running worker reports through `summary`
+(``{"op": "metrics"}``) for scraping.
+
+``ML_PROFILE=cprofile`` (or ``torch`` for torch.profiler) writes one profile
+per request to ``ML_PROFILE_DIR`` (default: the temp directory).
+
+This module must not import torch: numpy_analyzer uses it too.
+"""
+
+import contextlib
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator
+
+__all__ = [
+    "COUNTERS",
+    "RequestTimings",
+    "configure_profiling",
+    "count",
+    "profiled",
+    "recording",
+    "record_request",
+    "stage",
+    "summary",
+]
+
+TIMINGS = os.environ.get("ML_TIMINGS", "0") == "1"
+PROFILE = os.environ.get("ML_PROFILE", "")  # "", "cprofile" or "torch"
+PROFILE_DIR = os.environ.get("ML_PROFILE_DIR") or tempfile.gettempdir()
+
+_STARTED = time.time()
+
+
+class RequestTimings:
+    """Stage durations and counts of one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "stages_ms": {name: round(ms, 3) for name, ms in self.stages.items()},
+            **self.counts,
+        }
+
+
+class _Counters:
+    """Totals since process start; cheap enough to update on every call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )
+        self.stages: Dict[str, Dict[str, float]] = defaultdict(lambda: {"calls": 0, "total_ms": 0.0})
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def add_stage(self, name: str, ms: float) -> None:
+        with self._lock:
+            entry = self.stages[name]
+            entry["calls"] += 1
+            entry["total_ms"] += ms
+
+    def add_count(self, name: str, n: int) -> None:
+        with self._lock:
+            self.counts[name] += n
+
+    def add_request(self, label: str, ms: float, error: bool) -> None:
+        with self._lock:
+            entry = self.requests[label]
+            entry["count"] += 1
+            entry["errors"] += int(error)
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+
+
+COUNTERS = _Counters()
+_CURRENT: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        current = _CURRENT.get()
+        if current is not None:
+            current.stages[name] += ms
+        COUNTERS.add_stage(name, ms)
+
+
+def count(name: str, n: int = 1) -> None:
+    current = _CURRENT.get()
+    if current is not None:
+        current.counts[name] += n
+    COUNTERS.add_count(name, n)
+
+
+@contextlib.contextmanager
+def recording(enabled: bool | None = None) -> Iterator[RequestTimings | None]:
+    """Collect a `RequestTimings` for the enclosed request (None when disabled)."""
+
+    if not (TIMINGS if enabled is None else enabled):
+        yield None
+        return
+    timings = RequestTimings()
+    token = _CURRENT.set(timings)
+    try:
+        yield timings
+    finally:
+        _CURRENT.reset(token)
+
+
+def record_request(label: str, ms: float, error: bool = False) -> None:
+    COUNTERS.add_request(label, ms, error)
+
+
+# ---------------------------------------------------------------------------
+# Profiling
+# ---------------------------------------------------------------------------
+
+
+def configure_profiling(mode: str | None, out_dir: str | None = None) -> None:
+    """CLI override of ML_PROFILE / ML_PROFILE_DIR."""
+
+    global PROFILE, PROFILE_DIR
+    if mode is not None:
+        if mode not in ("", "cprofile", "torch"):
+            raise ValueError(f"Unknown profiler: {mode}")
+        PROFILE = mode
+    if out_dir:
+        PROFILE_DIR = out_dir
+
+
+def _profile_path(label: str, ext: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(PROFILE_DIR, f"ml-{label}-{stamp}-{os.getpid()}-{time.monotonic_ns() % 10**6}.{ext}")
+
+
+@contextlib.contextmanager
+def profiled(label: str) -> Iterator[None]:
+    """Profile the enclosed block if ML_PROFILE is set and write it to a file."""
+
+    if PROFILE == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = _profile_path(label, "prof")
+            profiler.dump_stats(path)
+            print(f"cProfile written to {path}", file=sys.stderr)
+    elif PROFILE == "torch":
+        from torch.profiler import ProfilerActivity, profile
+
+        with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+            yield
+        path = _profile_path(label, "json")
+        prof.export_chrome_trace(path)
+        print(f"torch.profiler trace written to {path}", file=sys.stderr)
+    else:
+        yield
+
+
+# ---------------------------------------------------------------------------
+# Summary
+# ---------------------------------------------------------------------------
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summary(**extra: Any) -> Dict[str, Any]:
+    """Compact JSON-able snapshot of the counters."""
+
+    with COUNTERS._lock:
+        requests = {
+            label: {**e, "total_ms": round(e["total_ms"], 1), "max_ms": round(e["max_ms"], 1)}
+            for label, e in COUNTERS.requests.items()
+        }
+        stages = {
+            name: {
+                "calls": e["calls"],
+                "total_ms": round(e["total_ms"], 1),
+                "mean_ms": round(e["total_ms"] / e["calls"], 3) if e["calls"] else 0.0,
+            }
+            for name, e in COUNTERS.stages.items()
+        }
+        counts = dict(COUNTERS.counts)
+    return {
+        "pid": os.getpid(),
+        "uptime_s": round(time.time() - _STARTED, 1),
+        "peak_rss_mb": _peak_rss_mb(),
+        "requests": requests,
+        "stages": stages,
+        "counts": counts,
+        **extra,
+    }
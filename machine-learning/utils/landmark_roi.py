@@ -0,0 +1,120 @@
+"""Resolution-adaptive landmark detection with region-of-interest reuse.
+
+Optional mode for the static MediaPipe solvers (``ML_LANDMARK_ROI=1`` or
+``"landmark_roi": true`` per request).  By default each frame's whole
+decoded image goes to FaceMesh / Hands / Pose.  Instead:
+
+1. Within a sequence, the landmarks of the previous frame give a region of
+   interest: their bounding box grown by ``ML_LANDMARK_ROI_MARGIN`` (0.5, so
+   twice the box size) on every side.  That region is cut from the decoded
+   frame, scaled to at most ``ML_LANDMARK_ROI_SIDE`` pixels (256) on its long
+   side and run through the solver; the landmarks are mapped back to
+   normalised full-frame coordinates.
+2. If there is no region yet or the solver finds nothing in it, the whole
+   frame is searched, scaled to at most ``ML_LANDMARK_SEARCH_SIDE`` pixels
+   (640) on its long side.
+
+The 64x64 model crops are still cut from the decoded frame at full detail
+(`image_batch.DecodedFrame.crop`) with the mapped landmarks, so only the
+landmark positions can differ from the default mode.  In the region the
+subject fills most of the image, so a face too small to be found in a
+downscaled full frame is still found there.  check_landmark_roi.py measures
+the time, the detection rate and the landmark and crop differences.
+
+Tracking solvers (``ML_TRACKING``) follow their own region from frame to
+frame and need the full image, so this mode only applies to static solvers.
+This module must not import torch, and imports OpenCV on first use only
+(ml_analyzer imports it on every start).
+"""
+
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+__all__ = ["MARGIN", "ROI_SIDE", "SEARCH_SIDE", "Landmarks", "detect", "fit"]
+
+ROI_SIDE = int(os.environ.get("ML_LANDMARK_ROI_SIDE", "256"))
+SEARCH_SIDE = int(os.environ.get("ML_LANDMARK_SEARCH_SIDE", "640"))
+MARGIN = float(os.environ.get("ML_LANDMARK_ROI_MARGIN", "0.5"))
+
+# Normalised (x0, y0, x1, y1) region per solver, carried between frames
+Box = Tuple[float, float, float, float]
+
+
+class Point(NamedTuple):
+    x: float
+    y: float
+    z: float = 0.0
+    visibility: float = 0.0
+
+
+class Landmarks:
+    """Landmarks mapped back to the full frame; same ``.landmark[i].x/.y`` as MediaPipe's."""
+
+    __slots__ = ("landmark",)
+
+    def __init__(self, landmark: List[Point]):
+        self.landmark = landmark
+
+
+def fit(rgb: np.ndarray, side: int) -> np.ndarray:
+    """`rgb` scaled down so its long side is at most `side` (as is if already)."""
+
+    h, w = rgb.shape[:2]
+    scale = side / max(h, w)
+    if side <= 0 or scale >= 1:
+        return rgb
+    import cv2
+
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    # Bilinear like MediaPipe's own input scaling; PIL took ~20 ms at 1080p
+    return cv2.resize(rgb, size, interpolation=cv2.INTER_LINEAR)
+
+
+def _region(landmarks: Any) -> Box:
+    xs = [p.x for p in landmarks.landmark]
+    ys = [p.y for p in landmarks.landmark]
+    x0, x1, y0, y1 = min(xs), max(xs), min(ys), max(ys)
+    mx, my = (x1 - x0) * MARGIN, (y1 - y0) * MARGIN
+    return max(0.0, x0 - mx), max(0.0, y0 - my), min(1.0, x1 + mx), min(1.0, y1 + my)
+
+
+def _mapped(landmarks: Any, box: Box) -> Landmarks:
+    x0, y0, x1, y1 = box
+    w, h = x1 - x0, y1 - y0
+    return Landmarks([
+        Point(x0 + p.x * w, y0 + p.y * h, p.z, getattr(p, "visibility", 0.0)) for p in landmarks.landmark
+    ])
+
+
+def detect(
+    rgb: np.ndarray,
+    run: Callable[[np.ndarray], Any],
+    state: Dict[str, Box | None] | None,
+    key: str,
+) -> Any:
+    """Landmarks of one subject in `rgb`, or None.
+
+    `run(image)` runs the solver and returns its landmarks (or None).
+    `state` holds the regions of the sequence being processed (None for a
+    lone frame); ``state[key]`` is read and updated.
+    """
+
+    box = state.get(key) if state is not None else None
+    if box is not None:
+        h, w = rgb.shape[:2]
+        x0, y0, x1, y1 = int(box[0] * w), int(box[1] * h), int(np.ceil(box[2] * w)), int(np.ceil(box[3] * h))
+        if x1 - x0 >= 8 and y1 - y0 >= 8:
+            found = run(fit(np.ascontiguousarray(rgb[y0:y1, x0:x1]), ROI_SIDE))
+            if found is not None:
+                # Normalise by the pixel box actually cut
+                landmarks = _mapped(found, (x0 / w, y0 / h, x1 / w, y1 / h))
+                state[key] = _region(landmarks)
+                return landmarks
+
+    # Normalised coordinates do not depend on the scale of the searched image
+    found = run(fit(rgb, SEARCH_SIDE))
+    if state is not None:
+        state[key] = _region(found) if found is not None else None
+    return found
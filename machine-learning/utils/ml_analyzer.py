@@ -3,25 +3,34 @@
 
 This script is invoked by the Node mlController using the following CLI:
 
-python ml_analyzer.py --data <tmp_json_file> --behavior <behavior_type>
+python ml_analyzer.py --data <tmp_file> --behavior <behavior_type>
 
-It must read the JSON payload from the file, run the behaviour specific
+The data file is either a binary frame container (see frame_container.py) or
+plain JSON.  It must read the payload from the file, run the behaviour specific
 model/prediction logic, and write a single JSON object **to stdout** so that
 Node.js can capture and forward it to the client.
 
-For the purposes of this repo (demo / placeholder), we implement a very light
-weight random-based detector. The interface can later be replaced by real
-model inference code with minimal changes (just replace `_predict`).
+``--serve`` runs it as one of the Node server's persistent workers (see
+`serve` and server/config/mlWorkerPool.js).  Models are loaded by
+model_loader.py; a behaviour whose weights are missing returns an error
+result instead of a prediction.
 """
 
 # fmt: off
 import argparse
 import base64
+import hashlib
 import json
+import multiprocessing
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextvars import ContextVar
 from io import BytesIO
-from typing import Any, Dict, List
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
 # Silence any prints while importing model_loader to keep stdout clean
 import contextlib
@@ -31,14 +40,24 @@ import torch
 from PIL import Image
 from torchvision import transforms
 
-# Local util that loads and caches models
+# Local util that loads and caches models (each one on first use)
 _silent = io.StringIO()
 with contextlib.redirect_stdout(_silent):
-    from model_loader import load_all_models
+    from model_loader import MODEL_FILES, ModelUnavailableError, get_model, load_all_models
+    from models.architectures import BackboneHeadModel
 
 # For eye gaze preprocessing
 import numpy as np
-import mediapipe as mp
+
+from feature_cache import get_cache, make_key
+from frame_container import is_container, read_container
+from frame_select import select as select_frames
+from image_batch import IMAGE_SIZE, DecodedFrame, FeatureBuffer, crops_to_tensor
+import landmark_roi
+from instrumentation import configure_profiling, count, profiled, record_request, recording, stage, summary
+from torch_threads import configure as configure_torch_threads
+from video_clip import VideoClip, is_video_payload
+from weight_bundle import WeightBundleError
 
 # ---------------------------------------------------------------------------
 # Globals
@@ -46,23 +65,20 @@ import mediapipe as mp
 
 
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-# Load *once* so subsequent calls are fast
-MODELS = load_all_models()
+
+# Intra-op threads sized for ML_WORKERS processes, one inter-op thread
+# (see torch_threads.py)
+configure_torch_threads()
 
 
-# Common image transform (matches notebook training — 64×64 RGB, no normalisation)
-IMAGE_SIZE = 64
+# Common image transform (matches notebook training — 64×64 RGB, no normalisation).
+# Frames are preprocessed with the equivalent batched path in image_batch.py;
+# this stays the reference it is checked against.
 _IMAGE_TF = transforms.Compose([
     transforms.Resize((IMAGE_SIZE, IMAGE_SIZE)),
     transforms.ToTensor(),  # outputs [0,1] float32
 ])
 
-# Mediapipe FaceMesh for eye region extraction
-_mp_face_mesh = mp.solutions.face_mesh.FaceMesh(
-    static_image_mode=True,
-    max_num_faces=1,
-    refine_landmarks=False,
-)
 
 # Landmarks indices around both eyes (approx.)
 _EYE_IDXS = [
@@ -70,9 +86,113 @@ _EYE_IDXS = [
     362, 398, 384, 385, 386, 387, 388, 466, 263, 249, 390, 373, 374, 380
 ]
 
-# MediaPipe Hands and Pose instances
-_mp_hands = mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=2)
-_mp_pose = mp.solutions.pose.Pose(static_image_mode=True)
+# MediaPipe solvers are created on first use: importing mediapipe and building
+# a graph costs hundreds of ms and most requests need at most one of them.
+_SOLVERS: Dict[str, Any] = {}
+
+# Tracking (video) mode: ordered frame sequences run through solvers created
+# with ``static_image_mode=False``, which detect once and then track the
+# landmarks from frame to frame.  Their state must never carry over from one
+# sequence (patient) to the next, so `video_solvers` either resets the shared
+# set or activates a set owned by a streaming session.  Unordered single
+# frames always use the static solvers above.
+TRACKING = os.environ.get("ML_TRACKING", "0") == "1"
+_TRACKING_MODE: ContextVar[bool] = ContextVar("tracking_mode", default=TRACKING)
+_ACTIVE_SOLVERS: ContextVar[Dict[str, Any] | None] = ContextVar("active_solvers", default=None)
+_VIDEO_SOLVERS: Dict[str, Any] = {}
+
+# Resolution-adaptive mode for the static solvers: full-frame searches on a
+# downscaled copy, then the previous frame's landmark region of the same
+# sequence (see landmark_roi.py).  `_ROI_STATE` holds the regions of the
+# sequence being processed.
+LANDMARK_ROI = os.environ.get("ML_LANDMARK_ROI", "0") == "1"
+_LANDMARK_ROI: ContextVar[bool] = ContextVar("landmark_roi", default=LANDMARK_ROI)
+_ROI_STATE: ContextVar[Dict[str, Any] | None] = ContextVar("roi_state", default=None)
+
+
+def _make_solver(name: str, static: bool) -> Any:
+    import mediapipe as mp
+
+    if name == "face_mesh":
+        # FaceMesh for eye region extraction
+        return mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=static,
+            max_num_faces=1,
+            refine_landmarks=False,
+        )
+    if name == "hands":
+        return mp.solutions.hands.Hands(static_image_mode=static, max_num_hands=2)
+    if name == "pose":
+        return mp.solutions.pose.Pose(static_image_mode=static)
+    if name == "holistic":
+        return mp.solutions.holistic.Holistic(static_image_mode=static)
+    raise KeyError(f"Unknown MediaPipe solver: {name}")
+
+
+def _solver(name: str) -> Any:
+    """Return the MediaPipe solver ``face_mesh``, ``hands``, ``pose`` or ``holistic``.
+
+    Inside `video_solvers` this is the tracking solver of the active set,
+    otherwise the cached static one.
+    """
+
+    solvers = _ACTIVE_SOLVERS.get()
+    static = solvers is None
+    if static:
+        solvers = _SOLVERS
+    if name not in solvers:
+        solvers[name] = _make_solver(name, static)
+    return solvers[name]
+
+
+@contextlib.contextmanager
+def video_solvers(solvers: Dict[str, Any] | None = None):
+    """Run the enclosed landmark detection in tracking mode.
+
+    `solvers` is a dict owned by the caller (a streaming session) whose
+    tracking state continues across calls.  Without it the process-wide set
+    is reset first, so every sequence starts with a fresh detection.
+    """
+
+    if solvers is None:
+        solvers = _VIDEO_SOLVERS
+        for solver in solvers.values():
+            solver.reset()
+    token = _ACTIVE_SOLVERS.set(solvers)
+    try:
+        yield solvers
+    finally:
+        _ACTIVE_SOLVERS.reset(token)
+
+
+@contextlib.contextmanager
+def tracking_mode(enabled: bool | None):
+    """Enable/disable tracking for ordered sequences (None keeps the current mode)."""
+
+    token = _TRACKING_MODE.set(_TRACKING_MODE.get() if enabled is None else bool(enabled))
+    try:
+        yield
+    finally:
+        _TRACKING_MODE.reset(token)
+
+
+@contextlib.contextmanager
+def landmark_roi_mode(enabled: bool | None):
+    """Enable/disable resolution-adaptive landmark detection (None keeps the current mode)."""
+
+    token = _LANDMARK_ROI.set(_LANDMARK_ROI.get() if enabled is None else bool(enabled))
+    try:
+        yield
+    finally:
+        _LANDMARK_ROI.reset(token)
+
+
+def close_solvers(solvers: Dict[str, Any]) -> None:
+    """Release the MediaPipe graphs of a solver set (e.g. a closed session)."""
+
+    for solver in solvers.values():
+        solver.close()
+    solvers.clear()
 
 
 # ---------------------------------------------------------------------------
@@ -80,225 +200,735 @@ _mp_pose = mp.solutions.pose.Pose(static_image_mode=True)
 # ---------------------------------------------------------------------------
 
 
-def _decode_image(data_url: str) -> Image.Image:
-    """Convert a base-64 data-URL string to a PIL Image."""
+# Raw JPEG bytes as handed out by frame_container (no base64 step)
+_BINARY_FRAME = (bytes, bytearray, memoryview)
 
-    # Expected format: "data:image/jpeg;base64,<encoded>"
-    if "," in data_url:
-        _, b64 = data_url.split(",", 1)
-    else:
-        b64 = data_url
-    try:
-        byte_data = base64.b64decode(b64)
-        return Image.open(BytesIO(byte_data)).convert("RGB")
-    except Exception as exc:
-        raise ValueError(f"Invalid base64 image: {exc}") from exc
 
+def _is_frame(value: Any) -> bool:
+    return isinstance(value, (str,) + _BINARY_FRAME)
 
-def _frames_to_tensor(frames: List[str]) -> torch.Tensor:
-    """Turn list of base64 images into (T, C, H, W) float tensor."""
 
-    tensors = []
-    for f in frames:
+def _decode_image(data_url: str | memoryview) -> Image.Image:
+    """Convert a base-64 data-URL string (or raw JPEG bytes) to a PIL Image."""
+
+    with stage("decode"):
+        if isinstance(data_url, _BINARY_FRAME):
+            try:
+                return Image.open(BytesIO(data_url)).convert("RGB")
+            except Exception as exc:
+                raise ValueError(f"Invalid image bytes: {exc}") from exc
+
+        # Expected format: "data:image/jpeg;base64,<encoded>"
+        if "," in data_url:
+            _, b64 = data_url.split(",", 1)
+        else:
+            b64 = data_url
         try:
-            img = _decode_image(f)
-            tensors.append(_IMAGE_TF(img))
-        except Exception:
-            continue
-    if not tensors:
-        raise ValueError("No valid images provided")
-    return torch.stack(tensors, dim=0)  # (T, 3, H, W)
+            byte_data = base64.b64decode(b64)
+            return Image.open(BytesIO(byte_data)).convert("RGB")
+        except Exception as exc:
+            raise ValueError(f"Invalid base64 image: {exc}") from exc
 
 
-def _eye_crop(img: Image.Image) -> Image.Image | None:
-    """Return a 64×64 crop that covers both eyes or None if no face."""
+def _decode_frame(frame: str | memoryview | np.ndarray) -> DecodedFrame:
+    """Decode a data-URL or raw frame for landmarks, at reduced size if large.
 
-    rgb = np.array(img)  # PIL to numpy RGB
-    results = _mp_face_mesh.process(rgb)
-    if not results.multi_face_landmarks:
-        return None
+    RGB arrays (video clip frames) are already decoded and used as they are.
+    """
 
-    h, w, _ = rgb.shape
-    xs, ys = [], []
-    for lm_idx in _EYE_IDXS:
-        lm = results.multi_face_landmarks[0].landmark[lm_idx]
-        xs.append(lm.x * w)
-        ys.append(lm.y * h)
+    if isinstance(frame, np.ndarray):
+        return DecodedFrame.from_array(frame)
+    with stage("decode"):
+        try:
+            return DecodedFrame(_frame_bytes(frame))
+        except Exception as exc:
+            raise ValueError(f"Invalid image: {exc}") from exc
 
-    x_min, x_max = max(min(xs) - 10, 0), min(max(xs) + 10, w)
-    y_min, y_max = max(min(ys) - 10, 0), min(max(ys) + 10, h)
 
-    if x_max - x_min < 10 or y_max - y_min < 10:
-        return None
+def _eye_crop_from(frame: DecodedFrame, face: Any) -> np.ndarray | None:
+    """Crop covering both eyes from FaceMesh landmarks (None if no face)."""
 
-    crop = rgb[int(y_min): int(y_max), int(x_min): int(x_max)]
-    if crop.size == 0:
+    if face is None:
         return None
-    crop_pil = Image.fromarray(crop)
-    return crop_pil
+    xs = [face.landmark[i].x for i in _EYE_IDXS]
+    ys = [face.landmark[i].y for i in _EYE_IDXS]
+    return frame.crop(xs, ys, 10)
 
 
-def _hand_crop(img: Image.Image) -> Image.Image | None:
-    """Return crop around first detected hand suitable for tapping models."""
+def _hand_crop_from(frame: DecodedFrame, hand: Any) -> np.ndarray | None:
+    """Crop around one hand's landmarks (None if no hand)."""
 
-    rgb = np.array(img)
-    results = _mp_hands.process(rgb)
-    if not results.multi_hand_landmarks:
+    if hand is None:
         return None
+    xs = [lm.x for lm in hand.landmark]
+    ys = [lm.y for lm in hand.landmark]
+    return frame.crop(xs, ys, 10)
 
-    h, w, _ = rgb.shape
-    xs, ys = [], []
-    for lm in results.multi_hand_landmarks[0].landmark:
-        xs.append(lm.x * w)
-        ys.append(lm.y * h)
 
-    x_min, x_max = max(min(xs) - 10, 0), min(max(xs) + 10, w)
-    y_min, y_max = max(min(ys) - 10, 0), min(max(ys) + 10, h)
-    if x_max - x_min < 10 or y_max - y_min < 10:
-        return None
-    crop = rgb[int(y_min): int(y_max), int(x_min): int(x_max)]
-    if crop.size == 0:
+def _foot_crop_from(frame: DecodedFrame, pose: Any) -> np.ndarray | None:
+    """Crop around the feet from Pose landmarks (None if no pose)."""
+
+    if pose is None:
         return None
-    return Image.fromarray(crop)
+    # ankle indices 27 (left) and 28 (right)
+    ankles = [pose.landmark[i] for i in (27, 28)]
+    xs = [a.x for a in ankles]
+    ys = [a.y for a in ankles]
+    return frame.crop(xs, ys, 20)
 
 
-def _foot_crop(img: Image.Image) -> Image.Image | None:
-    """Return crop around feet region using Pose landmarks (ankles)."""
+def _pose_xy_from(pose: Any) -> List[float] | None:
+    """Flatten 33 pose landmarks to normalized (x, y) pairs (None if no pose)."""
 
-    rgb = np.array(img)
-    results = _mp_pose.process(rgb)
-    if not results.pose_landmarks:
+    if pose is None:
         return None
+    coords = []
+    for lm in pose.landmark:
+        coords.extend([lm.x, lm.y])  # already normalized
+    return coords
 
-    h, w, _ = rgb.shape
-    # ankle indices 27 (left) and 28 (right)
-    ankles = [results.pose_landmarks.landmark[i] for i in (27, 28)]
-    xs = [a.x * w for a in ankles]
-    ys = [a.y * h for a in ankles]
-    x_min, x_max = max(min(xs) - 20, 0), min(max(xs) + 20, w)
-    y_min, y_max = max(min(ys) - 20, 0), min(max(ys) + 20, h)
-    if x_max - x_min < 10 or y_max - y_min < 10:
-        return None
-    crop = rgb[int(y_min): int(y_max), int(x_min): int(x_max)]
-    if crop.size == 0:
-        return None
-    return Image.fromarray(crop)
+
+def _landmarks(name: str, rgb: np.ndarray, run: Callable[[np.ndarray], Any]) -> Any:
+    """`run(rgb)`, or through landmark_roi for static solvers when that mode is on."""
+
+    with stage("landmarks"):
+        if not _LANDMARK_ROI.get() or _ACTIVE_SOLVERS.get() is not None:
+            return run(rgb)
+        return landmark_roi.detect(rgb, run, _ROI_STATE.get(), name)
+
+
+def _first_face(image: np.ndarray) -> Any:
+    results = _solver("face_mesh").process(image)
+    return results.multi_face_landmarks[0] if results.multi_face_landmarks else None
+
+
+def _first_hand(image: np.ndarray) -> Any:
+    results = _solver("hands").process(image)
+    return results.multi_hand_landmarks[0] if results.multi_hand_landmarks else None
 
 
-def _pose_xy(img: Image.Image) -> List[float] | None:
+def _pose(image: np.ndarray) -> Any:
+    return _solver("pose").process(image).pose_landmarks
+
+
+def _detect_face(rgb: np.ndarray) -> Any:
+    return _landmarks("face_mesh", rgb, _first_face)
+
+
+def _detect_hand(rgb: np.ndarray) -> Any:
+    return _landmarks("hands", rgb, _first_hand)
+
+
+def _detect_pose(rgb: np.ndarray) -> Any:
+    return _landmarks("pose", rgb, _pose)
+
+
+def _eye_crop(frame: DecodedFrame) -> np.ndarray | None:
+    """Return a 64×64 crop that covers both eyes or None if no face."""
+
+    return _eye_crop_from(frame, _detect_face(frame.rgb))
+
+
+def _hand_crop(frame: DecodedFrame) -> np.ndarray | None:
+    """Return crop around first detected hand suitable for tapping models."""
+
+    return _hand_crop_from(frame, _detect_hand(frame.rgb))
+
+
+def _foot_crop(frame: DecodedFrame) -> np.ndarray | None:
+    """Return crop around feet region using Pose landmarks (ankles)."""
+
+    return _foot_crop_from(frame, _detect_pose(frame.rgb))
+
+
+def _pose_xy(frame: DecodedFrame) -> List[float] | None:
     """Extract 33 (x,y) pose landmarks as flat list normalized to image size."""
-    rgb = np.array(img)
-    res = _mp_pose.process(rgb)
-    if not res.pose_landmarks:
+
+    return _pose_xy_from(_detect_pose(frame.rgb))
+
+
+def _detect_all(rgb: np.ndarray, holistic: bool = False) -> Tuple[Any, Any, Any]:
+    """(face, hand, pose) landmarks of one frame, each landmark model run once.
+
+    With ``holistic`` a single Holistic pass provides all three.  Its face
+    and pose output match FaceMesh/Pose, but its hands are tracked from
+    pose-guided crops, so hand crops can differ slightly from `Hands`.
+    """
+
+    if holistic:
+        with stage("landmarks"):
+            res = _solver("holistic").process(rgb)
+        hand = res.left_hand_landmarks or res.right_hand_landmarks
+        return res.face_landmarks, hand, res.pose_landmarks
+    return _detect_face(rgb), _detect_hand(rgb), _detect_pose(rgb)
+
+
+# ---------------------------------------------------------------------------
+# Per-frame preprocessing (optionally fanned out over a process pool)
+# ---------------------------------------------------------------------------
+
+# Number of preprocessing processes; 0/1 keeps everything in this process.
+# Each worker process gets its own lazily created MediaPipe solvers.
+PREPROCESS_WORKERS = int(os.environ.get("ML_PREPROCESS_WORKERS", "0"))
+_MIN_CHUNK = 4
+_POOL: ProcessPoolExecutor | None = None
+
+# "Analyze all" mode: one request -> every frame-based behaviour.  Holistic
+# (one landmark pass instead of three) is opt-in, see `_detect_all`.
+ALL_BEHAVIOR = "all"
+ALL_FRAME_BEHAVIORS = ("eye_gaze", "tapping_hands", "tapping_feet", "sit_stand")
+HOLISTIC = os.environ.get("ML_HOLISTIC", "0") == "1"
+_ALL_HOLISTIC = "all_holistic"  # worker-side mode name, picklable
+
+_INSUFFICIENT = {
+    "eye_gaze": "insufficient_eye_frames",
+    "tapping_hands": "insufficient_tapping_frames",
+    "tapping_feet": "insufficient_tapping_frames",
+    "sit_stand": "insufficient_pose_frames",
+}
+
+_CROP_FNS = {
+    "eye_gaze": _eye_crop,
+    "tapping_hands": _hand_crop,
+    "tapping_feet": _foot_crop,
+}
+
+
+def _frame_features(behavior: str, frame: str) -> Any:
+    """Decode one frame into its model features, or None if nothing usable.
+
+    (64, 64, 3) uint8 crop for the image behaviours (see `crops_to_tensor`),
+    66 pose coordinates for sit_stand.
+    """
+
+    try:
+        if behavior in (ALL_BEHAVIOR, _ALL_HOLISTIC):
+            return _all_features(frame, holistic=behavior == _ALL_HOLISTIC)
+        decoded = _decode_frame(frame)
+        if behavior == "sit_stand":
+            return _pose_xy(decoded)
+        return _CROP_FNS[behavior](decoded)
+    except Exception:
         return None
-    h, w, _ = rgb.shape
-    coords = []
-    for lm in res.pose_landmarks.landmark:
-        coords.extend([lm.x, lm.y])  # already normalized
-    return coords
 
 
-def _predict(behavior: str, data: Any) -> Dict[str, Any]:
-    """Run inference for a single behaviour and return unified JSON."""
+def _all_features(frame: str, holistic: bool = False) -> Dict[str, Any]:
+    """Features for every frame-based behaviour from one decode + landmark pass."""
+
+    decoded = _decode_frame(frame)
+    face, hand, pose = _detect_all(decoded.rgb, holistic)
+    return {
+        "eye_gaze": _eye_crop_from(decoded, face),
+        "tapping_hands": _hand_crop_from(decoded, hand),
+        "tapping_feet": _foot_crop_from(decoded, pose),
+        "sit_stand": _pose_xy_from(pose),
+    }
+
+
+def _features_chunk(
+    behavior: str,
+    frames: List[str],
+    roi: bool | None = None,
+    roi_state: Dict[str, Any] | None = None,
+) -> List[Any]:
+    # `roi` carries the landmark ROI mode into pool workers; the frames are
+    # one sequence, so landmark regions carry over from frame to frame (and
+    # from the previous chunk with `roi_state`)
+    with landmark_roi_mode(roi):
+        token = _ROI_STATE.set({} if roi_state is None else roi_state)
+        try:
+            return [_frame_features(behavior, f) for f in frames]
+        finally:
+            _ROI_STATE.reset(token)
+
+
+def _init_preprocess_worker() -> None:
+    # Parallelism comes from the processes themselves
+    torch.set_num_threads(1)
+
+
+def _preprocess_pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(
+            max_workers=PREPROCESS_WORKERS,
+            # spawn: forking after torch/MediaPipe threads exist is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_preprocess_worker,
+        )
+    return _POOL
+
 
-    if behavior not in MODELS:
-        return {"detected": False, "confidence": 0.0, "error": "unsupported_behavior"}
+def _frame_bytes(frame: str | memoryview | np.ndarray) -> bytes | memoryview | np.ndarray:
+    """Raw image bytes of a frame (base64 data-URL decoded, binary and arrays passed through)."""
 
-    model = MODELS[behavior].to(DEVICE)
+    if isinstance(frame, _BINARY_FRAME + (np.ndarray,)):
+        return frame
+    return base64.b64decode(frame.split(",", 1)[1] if "," in frame else frame)
 
+
+# Optional near-duplicate removal / length cap ahead of the per-frame work
+# (see frame_select.py); ``"frame_select"`` overrides it per request.
+FRAME_SELECT = os.environ.get("ML_FRAME_SELECT", "0") == "1"
+_FRAME_SELECT: ContextVar[bool] = ContextVar("frame_select", default=FRAME_SELECT)
+
+
+@contextlib.contextmanager
+def frame_selection(enabled: bool | None):
+    """Enable/disable frame selection (None keeps the current setting)."""
+
+    token = _FRAME_SELECT.set(_FRAME_SELECT.get() if enabled is None else bool(enabled))
     try:
-        if behavior == "eye_gaze":
-            if isinstance(data, dict):
-                frames = data.get("frame_sequence") or data.get(behavior) or []
-            else:
-                frames = data
-
-            crops = []
-            for f in frames:
-                try:
-                    img = _decode_image(f)
-                    eye = _eye_crop(img)
-                    if eye is not None:
-                        crops.append(_IMAGE_TF(eye))
-                except Exception:
-                    continue
-
-            if len(crops) < 3:  # need at least a few frames
-                return {"detected": False, "confidence": 0.0, "error": "insufficient_eye_frames"}
-
-            frames_tensor = torch.stack(crops, dim=0).unsqueeze(0).to(DEVICE)  # (1, T, C, H, W)
-            logits = model(frames_tensor)  # shape (1, 5)
-
-            probs = torch.softmax(logits, dim=1)[0]
-            prob, idx = probs.max(dim=0)
-            gaze_classes = ["down", "left", "right", "straight", "up"]
-            label = gaze_classes[idx.item()] if idx < len(gaze_classes) else str(idx.item())
-
-            return {
-                "detected": True,
-                "confidence": round(prob.item(), 4),
-                "gaze": label,
-            }
-
-        elif behavior in ("tapping_hands", "tapping_feet"):
-            if isinstance(data, dict):
-                frames = data.get("frame_sequence") or data.get(behavior) or []
-            else:
-                frames = data
-
-            crops = []
-            for f in frames:
-                try:
-                    img = _decode_image(f)
-                    crop_fn = _hand_crop if behavior == "tapping_hands" else _foot_crop
-                    cimg = crop_fn(img)
-                    if cimg is not None:
-                        crops.append(_IMAGE_TF(cimg))
-                except Exception:
-                    continue
-
-            if len(crops) < 3:
-                return {"detected": False, "confidence": 0.0, "error": "insufficient_tapping_frames"}
-
-            frames_tensor = torch.stack(crops, dim=0).unsqueeze(0).to(DEVICE)
-            logits = model(frames_tensor)
-            prob = torch.softmax(logits, dim=1)[0, 1].item()
-
-        elif behavior == "sit_stand":
-            # If provided as frames, extract pose landmarks; else assume already sequence
-            if isinstance(data, list) and data and isinstance(data[0], str):
-                # list of base64 images
-                seq = []
-                for f in data:
-                    try:
-                        img = _decode_image(f)
-                        coords = _pose_xy(img)
-                        if coords is not None:
-                            seq.append(coords)
-                    except Exception:
-                        continue
-                if len(seq) < 3:
-                    return {"detected": False, "confidence": 0.0, "error": "insufficient_pose_frames"}
-            else:
-                seq = data if isinstance(data, list) else data.get(behavior) or []
+        yield
+    finally:
+        _FRAME_SELECT.reset(token)
+
 
-            seq_tensor = torch.tensor(seq, dtype=torch.float32)
-            if seq_tensor.dim() == 1:
-                seq_tensor = seq_tensor.unsqueeze(0)
-            seq_tensor = seq_tensor.unsqueeze(0).to(DEVICE)
-            logits = model(seq_tensor)
-            prob = torch.softmax(logits, dim=1)[0, 1].item()
+def _select_frames(frames: List[Any] | VideoClip) -> List[Any] | VideoClip:
+    """The frames left after frame selection (all of them when it is off).
 
-        elif behavior == "rapid_talking":
-            seq = data if isinstance(data, list) else data.get(behavior) or []
-            seq_tensor = torch.tensor(seq, dtype=torch.float32).view(1, -1, 1).to(DEVICE)
-            prob = model(seq_tensor).squeeze().item()
+    Video clips are sampled at a fixed rate instead (see video_clip.py).
+    """
+
+    if isinstance(frames, VideoClip) or not _FRAME_SELECT.get() or not frames or len(frames) < 2:
+        return frames
+    raw = []
+    for frame in frames:
+        try:
+            raw.append(_frame_bytes(frame))
+        except Exception:
+            continue  # undecodable frame, dropped like before
+    with stage("select"):
+        keep = select_frames(raw)
+    count("frames_dropped", len(frames) - len(keep))
+    return [raw[i] for i in keep]
 
+
+def _note_frames_used(result: Dict[str, Any], behavior: str, data: Any, inputs: torch.Tensor) -> Dict[str, Any]:
+    """Add ``frames_used`` to a frame-based result when frame selection is on."""
+
+    if _FRAME_SELECT.get() and behavior != "rapid_talking":
+        frames = _frame_list(behavior, data)
+        if isinstance(frames, list) and frames and _is_frame(frames[0]):
+            result["frames_used"] = int(inputs.shape[0])
+    return result
+
+
+def _extract_frames(behavior: str, frames: List[str] | VideoClip) -> List[Any]:
+    """Per-frame features in frame order, frames with no detection dropped."""
+
+    received = 0
+    kept = []
+    with stage("preprocess"):
+        for feature in _iter_sequence_features(behavior, frames):
+            received += 1
+            if feature is not None:
+                kept.append(feature)
+    count("frames_received", received)
+    count("frames_kept", len(kept))
+    return kept
+
+
+def _frame_capacity(frames: List[Any] | VideoClip) -> int:
+    """Frames a sequence can yield, known before any of them is decoded."""
+
+    return frames.capacity if isinstance(frames, VideoClip) else len(frames)
+
+
+# Per-frame feature layout of each behaviour in a `FeatureBuffer`
+_FEATURE_LAYOUT = {
+    "eye_gaze": ((IMAGE_SIZE, IMAGE_SIZE, 3), torch.uint8),
+    "tapping_hands": ((IMAGE_SIZE, IMAGE_SIZE, 3), torch.uint8),
+    "tapping_feet": ((IMAGE_SIZE, IMAGE_SIZE, 3), torch.uint8),
+    "sit_stand": ((66,), torch.float32),
+}
+
+
+def _extract_tensor(behavior: str, frames: List[Any] | VideoClip) -> torch.Tensor:
+    """Features of the frames with a detection, written into one preallocated tensor.
+
+    (T, 64, 64, 3) uint8 crops for the image behaviours, (T, 66) float32
+    pose coordinates for sit_stand.  The buffer is sized for every frame of
+    the (validated) sequence before the first one is decoded; each crop is
+    copied in as soon as it is cut and nothing else is kept per frame.
+    """
+
+    buffer = FeatureBuffer(_frame_capacity(frames), *_FEATURE_LAYOUT[behavior])
+    received = 0
+    with stage("preprocess"):
+        for feature in _iter_sequence_features(behavior, frames):
+            received += 1
+            if feature is not None:
+                buffer.append(feature)
+    count("frames_received", received)
+    count("frames_kept", len(buffer))
+    return buffer.tensor()
+
+
+# Frames are preprocessed one window at a time (at least two chunks per
+# pool worker), so raw bytes and decoded images never outlive their window
+PREPROCESS_WINDOW = int(os.environ.get("ML_PREPROCESS_WINDOW", "16"))
+
+# Peak-RSS budget of one frame-sequence request above the RSS after its
+# payload is parsed.  The fixed part covers one MobileNet chunk (~30 MB at
+# ML_FORWARD_CHUNK=32), the decode window and the allocator's slack; per
+# frame it is the 12 KB uint8 crop, doubled for the same slack.  Measured
+# at 640x480: 18-88 MB for 20-1200 frames (eye_gaze, the largest).
+PEAK_RSS_BASE_MB = 96
+PEAK_RSS_PER_FRAME_KB = 24
+
+
+def peak_rss_target_mb(frames: int) -> float:
+    """Peak-RSS budget in MB of a request with `frames` frames (see check_memory.py)."""
+
+    return PEAK_RSS_BASE_MB + frames * PEAK_RSS_PER_FRAME_KB / 1024
+
+
+def _sequence_features(behavior: str, frames: List[str]) -> List[Any]:
+    """Per-frame features in frame order, None where nothing was detected."""
+
+    return list(_iter_sequence_features(behavior, frames))
+
+
+def _iter_sequence_features(behavior: str, frames: List[Any] | VideoClip) -> Iterator[Any]:
+    """Yield per-frame features in frame order, None where nothing was detected.
+
+    Frames run ``PREPROCESS_WINDOW`` at a time: a window's raw bytes,
+    decoded images and landmarks are released before the next window is
+    decoded, so memory does not grow with the sequence length.  Frames
+    already seen (same bytes, same behaviour) come from the feature cache;
+    only the misses are decoded and run through MediaPipe.  In tracking
+    mode landmarks depend on the preceding frames, so the sequence runs in
+    order through the tracking solvers (reset once per sequence) and
+    bypasses the cache.  With ML_LANDMARK_ROI the search region comes from
+    the previous frame, so those sequences bypass the cache as well.  A
+    `VideoClip` is decoded a window at a time as well.
+    """
+
+    window = max(PREPROCESS_WINDOW, 2 * PREPROCESS_WORKERS * _MIN_CHUNK)
+    tracking = _ACTIVE_SOLVERS.get() is None and _TRACKING_MODE.get() and _frame_capacity(frames) > 1
+    roi_state: Dict[str, Any] = {}
+    source = iter(frames)
+    first = True
+    while chunk := list(islice(source, window)):
+        # Solver contexts must not stay entered across a yield
+        if _ACTIVE_SOLVERS.get() is not None:
+            features = _features_chunk(behavior, chunk)
+        elif tracking:
+            with video_solvers(None if first else _VIDEO_SOLVERS):
+                features = _features_chunk(behavior, chunk)
+        elif _LANDMARK_ROI.get():
+            features = _compute_frames(behavior, chunk, roi_state)
         else:
-            prob = 0.0
+            features = _cached_features(behavior, chunk)
+        del chunk
+        first = False
+        yield from features
+
+
+def _cached_features(behavior: str, frames: List[Any]) -> List[Any]:
+    """Static-mode features of `frames`, through the feature cache when enabled."""
+
+    cache = get_cache()
+    if cache is None:
+        return _compute_frames(behavior, frames)
+
+    frames = list(frames)
+    features: List[Any] = [None] * len(frames)
+    keys: List[str | None] = [None] * len(frames)
+    todo: List[int] = []
+    for i, frame in enumerate(frames):
+        try:
+            frames[i] = _frame_bytes(frame)
+        except Exception:
+            continue  # undecodable frame, dropped like before
+        keys[i] = make_key(frames[i], behavior)
+        found, value = cache.lookup(keys[i])
+        if found:
+            features[i] = value
+        else:
+            todo.append(i)
+
+    if todo:
+        computed = _compute_frames(behavior, [frames[i] for i in todo])
+        for i, value in zip(todo, computed):
+            features[i] = value
+            cache.put(keys[i], value)
+    return features
+
+
+def _compute_frames(behavior: str, frames: List[Any], roi_state: Dict[str, Any] | None = None) -> List[Any]:
+    """Run `_frame_features` over frames, serially or on the preprocessing pool.
+
+    `roi_state` carries landmark regions on from the previous frames of the
+    sequence (serial path only; each pool chunk starts a fresh search).
+    """
+
+    features = None
+    if PREPROCESS_WORKERS > 1 and len(frames) > _MIN_CHUNK:
+        size = max(_MIN_CHUNK, -(-len(frames) // PREPROCESS_WORKERS))
+        # memoryviews into the container mapping cannot be pickled
+        frames = [bytes(f) if isinstance(f, memoryview) else f for f in frames]
+        chunks = [frames[i:i + size] for i in range(0, len(frames), size)]
+        try:
+            # map() yields in submission order, so frame order is kept
+            results = _preprocess_pool().map(
+                _features_chunk, [behavior] * len(chunks), chunks, [_LANDMARK_ROI.get()] * len(chunks)
+            )
+            features = [f for chunk in results for f in chunk]
+        except BrokenProcessPool as exc:
+            global _POOL
+            print(f"Preprocessing pool failed, running serially: {exc}", file=sys.stderr)
+            _POOL = None
+    if features is None:
+        features = _features_chunk(behavior, frames, roi_state=roi_state)
+    return features
+
+
+# Also cache 1280-d backbone features per crop (ML_CACHE_FEATURES=1)
+CACHE_FEATURES = os.environ.get("ML_CACHE_FEATURES", "0") == "1"
+_BACKBONE_TAGS: Dict[int, str] = {}
+
+
+def _backbone_tag(backbone: torch.nn.Module) -> str:
+    """Short fingerprint of a backbone's weights, so cached features never mix models."""
+
+    tag = _BACKBONE_TAGS.get(id(backbone))
+    if tag is None and hasattr(backbone, "fingerprint"):
+        # Optimized backbones are frozen TorchScript without a state dict
+        tag = _BACKBONE_TAGS[id(backbone)] = backbone.fingerprint
+    if tag is None:
+        h = hashlib.blake2b(digest_size=8)
+        for tensor in backbone.state_dict().values():
+            h.update(tensor.detach().cpu().numpy().tobytes())
+        tag = _BACKBONE_TAGS[id(backbone)] = h.hexdigest()
+    return tag
+
+
+# Frames per MobileNet pass (over the whole batch) for long image sequences
+FORWARD_CHUNK = int(os.environ.get("ML_FORWARD_CHUNK", "32"))
+
+
+def _forward(model: torch.nn.Module, inputs: torch.Tensor) -> torch.Tensor:
+    """``model(inputs)`` for a (B, T, ...) batch.
+
+    Image sequences may be given as (B, T, S, S, 3) uint8 crops (see
+    `_prepare_input`); they are converted to float one chunk at a time.
+    Image heads on a shared backbone reuse cached per-crop backbone features
+    when feature caching is on; only unseen crops go through MobileNet.
+    Image sequences longer than ``ML_FORWARD_CHUNK`` frames in total run
+    through `forward_step` a chunk of time steps at a time, carrying the
+    LSTM state, so MobileNet's activations exist for one chunk only; the
+    output is the whole sequence's.
+    """
+
+    cache = get_cache()
+    cached = CACHE_FEATURES and cache is not None and isinstance(model, BackboneHeadModel)
+    b, t = inputs.shape[:2]
+    step = max(1, FORWARD_CHUNK // b)
+    # A traced model without an eager copy runs the whole sequence at once
+    steppable = getattr(model, "supports_step", hasattr(model, "forward_step"))
+    if inputs.dim() == 5 and t > step and steppable:
+        state = None
+        for start in range(0, t, step):
+            x = _float_frames(inputs[:, start:start + step])
+            if cached:
+                out, state = model.head.forward_step(_embed_cached(model, x), state)
+            else:
+                out, state = model.forward_step(x, state)
+        return out
+    inputs = _float_frames(inputs)
+    if cached:
+        return model.head(_embed_cached(model, inputs))
+    return model(inputs)
+
+
+def _float_frames(inputs: torch.Tensor) -> torch.Tensor:
+    """(B, T, 3, S, S) float32 model input from (B, T, S, S, 3) uint8 crops (others as is)."""
+
+    if inputs.dtype != torch.uint8:
+        return inputs
+    b, t, s = inputs.shape[:3]
+    return crops_to_tensor(inputs.reshape(b * t, s, s, 3)).view(b, t, 3, s, s)
+
+
+def _embed_cached(model: BackboneHeadModel, inputs: torch.Tensor) -> torch.Tensor:
+    """(B, T, F) backbone features of a (B, T, C, H, W) batch through the feature cache."""
+
+    cache = get_cache()
+    b, t = inputs.shape[:2]
+    flat = inputs.reshape(b * t, *inputs.shape[2:])
+    tag = _backbone_tag(model.backbone)
+    feats: List[Any] = [None] * len(flat)
+    keys: List[str] = []
+    todo: List[int] = []
+    for i, crop in enumerate(flat):
+        keys.append(make_key(crop.cpu().numpy().tobytes(), "mobilenet", tag))
+        found, value = cache.lookup(keys[i])
+        if found:
+            feats[i] = value
+        else:
+            todo.append(i)
+
+    if todo:
+        computed = model.backbone(flat[todo]).cpu().numpy()
+        for j, i in enumerate(todo):
+            feats[i] = computed[j]
+            cache.put(keys[i], computed[j])
+
+    return torch.from_numpy(np.stack(feats)).to(inputs.device).view(b, t, -1)
+
+
+def _error(code: str) -> Dict[str, Any]:
+    return {"detected": False, "confidence": 0.0, "error": code}
+
+
+# A frame-based payload may be an encoded clip instead of a frame list,
+# ``{"video": <bytes | data-URL | path>, "fps": 10}``, decoded with OpenCV
+# while the sequence is processed (see video_clip.py; ``--video`` on the
+# CLI).  Whether it may name a local file: only CLI and batch callers may;
+# `serve` turns it off since its requests come from HTTP clients.
+VIDEO_PATHS = True
+
+
+def _frame_list(behavior: str, data: Any) -> List[str] | VideoClip:
+    if is_video_payload(data):
+        return VideoClip(data["video"], data.get("fps"), allow_path=VIDEO_PATHS)
+    if isinstance(data, dict):
+        return data.get("frame_sequence") or data.get(behavior) or []
+    return data
+
 
-        prob = float(max(0.0, min(1.0, prob)))  # clamp to [0,1]
-        return {"detected": prob > 0.5, "confidence": round(prob, 4)}
+def _prepare_input(behavior: str, data: Any) -> Tuple[torch.Tensor | None, Dict[str, Any] | None]:
+    """Turn one behaviour payload into its unbatched model input.
+
+    Returns ``(tensor, None)`` where tensor is (T, 64, 64, 3) uint8 crops
+    for the image models (converted to float by `_forward`, a chunk at a
+    time) and (T, F) for the sequence models, or ``(None, error_result)``
+    when the payload does not contain enough usable frames.
+    """
+
+    if behavior in ("eye_gaze", "tapping_hands", "tapping_feet"):
+        crops = _extract_tensor(behavior, _select_frames(_frame_list(behavior, data)))
+
+        if len(crops) < 3:  # need at least a few frames
+            return None, _error(_INSUFFICIENT[behavior])
+        return crops, None
+
+    if behavior == "sit_stand":
+        # If provided as frames, extract pose landmarks; else assume already sequence
+        if is_video_payload(data) or (isinstance(data, list) and data and _is_frame(data[0])):
+            # list of base64 images or a video clip
+            seq = _extract_tensor(behavior, _select_frames(_frame_list(behavior, data)))
+            if len(seq) < 3:
+                return None, _error(_INSUFFICIENT[behavior])
+            return seq, None
+
+        seq = data if isinstance(data, list) else data.get(behavior) or []
+        seq_tensor = torch.tensor(seq, dtype=torch.float32)
+        if seq_tensor.dim() == 1:
+            seq_tensor = seq_tensor.unsqueeze(0)
+        return seq_tensor, None
+
+    if behavior == "rapid_talking":
+        seq = data if isinstance(data, list) else data.get(behavior) or []
+        return torch.tensor(seq, dtype=torch.float32).view(-1, 1), None
+
+    return None, _error("unsupported_behavior")
+
+
+def _format_output(behavior: str, out: torch.Tensor) -> Dict[str, Any]:
+    """Turn one sequence's model output (batch dim removed) into the unified JSON."""
+
+    if behavior == "eye_gaze":
+        probs = torch.softmax(out, dim=0)
+        prob, idx = probs.max(dim=0)
+        gaze_classes = ["down", "left", "right", "straight", "up"]
+        label = gaze_classes[idx.item()] if idx < len(gaze_classes) else str(idx.item())
+
+        return {
+            "detected": True,
+            "confidence": round(prob.item(), 4),
+            "gaze": label,
+        }
+
+    if behavior in ("tapping_hands", "tapping_feet", "sit_stand"):
+        prob = torch.softmax(out, dim=0)[1].item()
+    elif behavior == "rapid_talking":
+        prob = out.squeeze().item()
+    else:
+        prob = 0.0
+
+    prob = float(max(0.0, min(1.0, prob)))  # clamp to [0,1]
+    return {"detected": prob > 0.5, "confidence": round(prob, 4)}
+
+
+def _predict_all(data: Any, holistic: bool | None = None) -> Dict[str, Any]:
+    """Run every frame-based behaviour on one frame sequence.
+
+    Each frame is decoded once and each landmark model runs once per frame;
+    returns ``{behaviour: unified result}``.
+    """
+
+    holistic = HOLISTIC if holistic is None else holistic
+    frames = _select_frames(_frame_list(ALL_BEHAVIOR, data))
+    capacity = _frame_capacity(frames)
+    buffers = {behavior: FeatureBuffer(capacity, *_FEATURE_LAYOUT[behavior]) for behavior in ALL_FRAME_BEHAVIORS}
+    received = kept = 0
+    with stage("preprocess"):
+        for per_frame in _iter_sequence_features(_ALL_HOLISTIC if holistic else ALL_BEHAVIOR, frames):
+            received += 1
+            if per_frame is None:
+                continue
+            kept += 1
+            for behavior, value in per_frame.items():
+                if value is not None:
+                    buffers[behavior].append(value)
+    count("frames_received", received)
+    count("frames_kept", kept)
+
+    results: Dict[str, Any] = {}
+    for behavior in ALL_FRAME_BEHAVIORS:
+        feats = buffers.pop(behavior).tensor()  # released once its model has run
+        if len(feats) < 3:
+            results[behavior] = _error(_INSUFFICIENT[behavior])
+            continue
+        try:
+            model = get_model(behavior)
+            with torch.inference_mode(), stage("forward"):
+                out = _forward(model, feats.unsqueeze(0).to(DEVICE))[0]
+            results[behavior] = _format_output(behavior, out)
+            if _FRAME_SELECT.get():
+                results[behavior]["frames_used"] = len(feats)
+        except Exception as exc:
+            results[behavior] = _error(str(exc))
+    return results
+
+
+def _predict(behavior: str, data: Any) -> Dict[str, Any]:
+    """Run inference for a single behaviour and return unified JSON."""
+
+    if behavior == ALL_BEHAVIOR:
+        try:
+            return _predict_all(data)
+        except Exception as exc:
+            return _error(str(exc))
+
+    if behavior not in MODEL_FILES:
+        return _error("unsupported_behavior")
+
+    try:
+        model = get_model(behavior)
+    except (ModelUnavailableError, WeightBundleError) as exc:
+        return _error(str(exc))
+
+    try:
+        inputs, error = _prepare_input(behavior, data)
+        if error is not None:
+            return error
+        with torch.inference_mode(), stage("forward"):
+            out = _forward(model, inputs.unsqueeze(0).to(DEVICE))[0]
+        return _note_frames_used(_format_output(behavior, out), behavior, data, inputs)
 
     except Exception as exc:
         # Fall back gracefully
@@ -310,28 +940,230 @@ def _predict(behavior: str, data: Any) -> Dict[str, Any]:
 # ---------------------------------------------------------------------------
 
 
+def _load_payload(path: str) -> Any:
+    """Read a request payload: binary frame container or (fallback) JSON."""
+
+    with stage("load_payload"):
+        if is_container(path):
+            return read_container(path)
+        with open(path, "r", encoding="utf-8") as fp:
+            return json.load(fp)
+
+
+def _instrumented(label: str, timings: bool | None, run: Callable[[], Any]) -> Any:
+    """``run()`` with request counters, optional profiling and ``timings`` block."""
+
+    t0 = time.perf_counter()
+    error = True
+    try:
+        with recording(timings) as rec, profiled(label):
+            result = run()
+        error = isinstance(result, dict) and ("error" in result or result.get("success") is False)
+        if rec is not None and isinstance(result, dict):
+            result["timings"] = rec.as_dict()
+        return result
+    finally:
+        record_request(label, (time.perf_counter() - t0) * 1000, error)
+
+
+def _handle_request(req: Dict[str, Any], emit: Callable[[Dict[str, Any]], None] | None = None) -> Dict[str, Any]:
+    """Run one worker request (single behaviour or batch) and return its result.
+
+    `emit` receives the per-entry results of a streamed batch.
+    """
+
+    # batch_analyzer/streaming are imported lazily since they import this
+    # module.  When running as __main__ register under our real name so the
+    # models are not loaded a second time.
+    sys.modules.setdefault("ml_analyzer", sys.modules[__name__])
+
+    op = req.get("op")
+    if op == "stats":
+        cache = get_cache()
+        return {"cache": cache.stats() if cache is not None else None}
+    if op == "metrics":
+        cache = get_cache()
+        return summary(cache=cache.stats() if cache is not None else None)
+
+    batch = "batch_file" in req or "behaviors" in req
+    label = op or ("batch" if batch else req.get("behavior") or "unknown")
+    return _instrumented(label, req.get("timings"), lambda: _dispatch(req, emit))
+
+
+def _dispatch(req: Dict[str, Any], emit: Callable[[Dict[str, Any]], None] | None = None) -> Dict[str, Any]:
+    op = req.get("op")
+    if op in ("stream_open", "stream_push", "stream_close"):
+        from streaming import get_manager
+
+        manager = get_manager()
+        if op == "stream_open":
+            return manager.open(req.get("behavior"), req.get("session_id"), tracking=req.get("tracking"))
+        if op == "stream_close":
+            return manager.close(req["session_id"])
+        data = _load_payload(req["data_file"]) if "data_file" in req else req.get("data")
+        return manager.push(req["session_id"], data)
+
+    # Per-request overrides of ML_TRACKING (ordered frame sequences),
+    # ML_FRAME_SELECT and ML_LANDMARK_ROI
+    with (
+        tracking_mode(req.get("tracking")),
+        frame_selection(req.get("frame_select")),
+        landmark_roi_mode(req.get("landmark_roi")),
+    ):
+        if "batch_file" in req or "behaviors" in req:
+            from batch_analyzer import analyze_batch, iter_batch_file, stream_batch
+
+            behaviors = req.get("behaviors")
+            if req.get("stream") and emit is not None:
+                return stream_batch(behaviors if behaviors is not None else iter_batch_file(req["batch_file"]), emit)
+            if behaviors is None:
+                behaviors = _load_payload(req["batch_file"])
+            return analyze_batch(behaviors)
+
+        behavior = req.get("behavior")
+        if not behavior:
+            raise ValueError("Missing behavior")
+        if "data_file" in req:
+            payload = _load_payload(req["data_file"])
+        else:
+            payload = req.get("data")
+        data = payload.get(behavior, payload) if isinstance(payload, dict) else payload
+        return _predict(behavior, data)
+
+
+def serve(stdin=None, stdout=None) -> None:
+    """Answer JSON-lines requests until stdin is closed.
+
+    The models are loaded once, then a ``{"ready": true}`` line is written
+    and each request line gets one response line:
+
+        -> {"id": "42", "behavior": "eye_gaze", "data_file": "/tmp/ml_data.json"}
+        <- {"id": "42", "result": {"detected": true, "confidence": 0.91, ...}}
+
+    A request may carry ``data`` inline instead of ``data_file``, or a
+    ``batch_file`` / ``behaviors`` list to run the batch analyzer (with
+    ``"stream": true`` each entry's result is written as soon as it is ready
+    as a ``{"id": "42", "partial": {"index": 0, "result": {...}}}`` line
+    before the final response, which then carries the summary only).
+    ``{"op": "stats"}`` returns the feature cache counters, ``{"op":
+    "metrics"}`` the request/stage counters (see instrumentation.py) and
+    ``{"op": "stream_open" | "stream_push" | "stream_close", "session_id":
+    ...}`` drive incremental sessions (see streaming.py).
+
+    Per request ``"tracking"``, ``"frame_select"`` and ``"landmark_roi"``
+    (true/false) override ML_TRACKING, ML_FRAME_SELECT and ML_LANDMARK_ROI,
+    and ``"timings": true`` attaches per-stage timings to the result.
+    """
+
+    global VIDEO_PATHS
+    stdin = stdin or sys.stdin
+    out = stdout or sys.stdout
+    # Requests come from HTTP clients: clips must arrive as data, never as
+    # a path on this machine
+    VIDEO_PATHS = False
+    # Anything else printed while serving (library chatter, debug prints)
+    # must not corrupt the response stream.
+    sys.stdout = sys.stderr
+
+    # A long-lived worker pays the model load once, before it reports ready
+    load_all_models()
+    out.write(json.dumps({"ready": True}) + "\n")
+    out.flush()
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        req_id = None
+
+        def emit(partial: Dict[str, Any]) -> None:
+            out.write(json.dumps({"id": req_id, "partial": partial}) + "\n")
+            out.flush()
+
+        try:
+            req = json.loads(line)
+            req_id = req.get("id")
+            response = {"id": req_id, "result": _handle_request(req, emit)}
+        except Exception as exc:
+            response = {"id": req_id, "error": str(exc)}
+        out.write(json.dumps(response) + "\n")
+        out.flush()
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Run ML analysis on behaviour data")
-    parser.add_argument("--data", required=True, help="Path to JSON file containing input data")
-    parser.add_argument("--behavior", required=True, help="Behavior type (e.g. eye_gaze)")
+    parser.add_argument("--data", help="Path to JSON file containing input data")
+    parser.add_argument("--video", help="Encoded video clip (webm, mp4, ...) to use as the frame sequence instead of --data")
+    parser.add_argument("--fps", type=float, default=None, help="With --video, frames sampled per second (default: $ML_VIDEO_FPS)")
+    parser.add_argument("--behavior", help="Behavior type (e.g. eye_gaze, or 'all' for every frame-based one)")
+    parser.add_argument("--holistic", action="store_true", help="With --behavior all, use one Holistic landmark pass per frame")
+    parser.add_argument("--serve", action="store_true", help="Run as a persistent JSON-lines worker on stdin/stdout")
+    parser.add_argument("--timings", action="store_true", help="Attach a per-stage 'timings' block to the result")
+    parser.add_argument("--profile", choices=["cprofile", "torch"], help="Write a profile per request (like ML_PROFILE)")
+    parser.add_argument("--profile-dir", help="Directory for profiles (default: $ML_PROFILE_DIR or the temp dir)")
+    parser.add_argument(
+        "--tracking",
+        action="store_true",
+        help="Track landmarks across ordered frame sequences (MediaPipe video mode, like ML_TRACKING=1)",
+    )
+    parser.add_argument(
+        "--frame-select",
+        action="store_true",
+        help="Drop near-duplicate frames and cap the sequence length first (like ML_FRAME_SELECT=1)",
+    )
+    parser.add_argument(
+        "--landmark-roi",
+        action="store_true",
+        help="Search landmarks on a downscaled frame, then in the previous frame's region (like ML_LANDMARK_ROI=1)",
+    )
+    parser.add_argument(
+        "--preprocess-workers",
+        type=int,
+        default=None,
+        help="Processes for frame decode/landmark extraction (default: $ML_PREPROCESS_WORKERS or serial)",
+    )
 
     args = parser.parse_args()
 
-    if not os.path.exists(args.data):
-        print(json.dumps({"error": f"Data file not found: {args.data}"}), file=sys.stderr)
+    global PREPROCESS_WORKERS, HOLISTIC
+    if args.preprocess_workers is not None:
+        PREPROCESS_WORKERS = args.preprocess_workers
+    if args.holistic:
+        HOLISTIC = True
+    if args.tracking:
+        _TRACKING_MODE.set(True)
+    if args.frame_select:
+        _FRAME_SELECT.set(True)
+    if args.landmark_roi:
+        _LANDMARK_ROI.set(True)
+    configure_profiling(args.profile, args.profile_dir)
+
+    if args.serve:
+        serve()
+        return
+
+    if not (args.data or args.video) or not args.behavior:
+        parser.error("--data (or --video) and --behavior are required unless --serve is given")
+
+    source = args.video or args.data
+    if not os.path.exists(source):
+        print(json.dumps({"error": f"Data file not found: {source}"}), file=sys.stderr)
         sys.exit(1)
 
-    try:
-        with open(args.data, "r", encoding="utf-8") as fp:
-            payload = json.load(fp)
-    except Exception as exc:
-        print(json.dumps({"error": f"Failed to read input file: {exc}"}), file=sys.stderr)
-        sys.exit(1)
+    def run() -> Dict[str, Any]:
+        if args.video:
+            return _predict(args.behavior, {"video": args.video, "fps": args.fps})
+        try:
+            payload = _load_payload(args.data)
+        except Exception as exc:
+            print(json.dumps({"error": f"Failed to read input file: {exc}"}), file=sys.stderr)
+            sys.exit(1)
 
-    # Extract behaviour-specific data from payload; the controller wrapped it
-    data = payload.get(args.behavior, payload)
+        # Extract behaviour-specific data from payload; the controller wrapped it
+        data = payload.get(args.behavior, payload)
+        return _predict(args.behavior, data)
 
-    result = _predict(args.behavior, data)
+    result = _instrumented(args.behavior, args.timings or None, run)
 
     # Output **only** JSON on stdout so Node.js can parse it directly
     sys.stdout.write(json.dumps(result))
@@ -7,7 +7,16 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
 try:
-    from models.architectures import WPMModel, EyeGazeLSTM, SitStandLSTM, TappingCNN
+    from models.architectures import (
+        WPMModel,
+        EyeGazeLSTM,
+        SitStandLSTM,
+        TappingCNN,
+        BackboneHeadModel,
+        FrameSequenceHead,
+        FrozenBackbone,
+        split_frame_state_dict,
+    )
     print("Successfully imported model architectures", file=sys.stderr)
 except ImportError as e:
     print(f"Failed to import architectures: {e}", file=sys.stderr)
@@ -16,42 +25,214 @@ except ImportError as e:
     print(f"Python path: {sys.path}")
     raise
 
-def load_all_models():
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}", file=sys.stderr)
-
-    # Map backend behavior_type -> model instance
-    models = {
-        "rapid_talking": WPMModel(),
-        "eye_gaze": EyeGazeLSTM(),
-        "sit_stand": SitStandLSTM(),
-        "tapping_feet": TappingCNN(),
-        "tapping_hands": TappingCNN(),
-    }
-
-    # Corresponding weight files
-    model_files = {
-        "rapid_talking": "models/rapid_talking.pth",
-        "eye_gaze": "models/eye_gaze.pth",
-        "sit_stand": "models/sit-stand.pth",
-        "tapping_feet": "models/tapping_feet.pth",
-        "tapping_hands": "models/tapping_hands.pth",
-    }
-
-    # Load weights and move to device
-    for key, model_path in model_files.items():
+from instrumentation import stage
+from weight_bundle import WeightBundle, WeightBundleError
+
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+# Map backend behavior_type -> model class
+MODEL_CLASSES = {
+    "rapid_talking": WPMModel,
+    "eye_gaze": EyeGazeLSTM,
+    "sit_stand": SitStandLSTM,
+    "tapping_feet": TappingCNN,
+    "tapping_hands": TappingCNN,
+}
+
+# Corresponding weight files (relative to the machine-learning folder)
+MODEL_FILES = {
+    "rapid_talking": "models/rapid_talking.pth",
+    "eye_gaze": "models/eye_gaze.pth",
+    "sit_stand": "models/sit-stand.pth",
+    "tapping_feet": "models/tapping_feet.pth",
+    "tapping_hands": "models/tapping_hands.pth",
+}
+
+# Image-sequence behaviors whose frozen MobileNetV2 features are shared.
+# Set ML_SHARED_BACKBONE=0 to give each one its own copy again.
+FRAME_BEHAVIORS = ("eye_gaze", "tapping_hands", "tapping_feet")
+SHARED_BACKBONE = os.environ.get("ML_SHARED_BACKBONE", "1") != "0"
+
+# All weights in one memory-mapped file (built by utils/weight_bundle.py);
+# used when present, per behaviour in preference to its .pth.  "0" disables it.
+WEIGHT_BUNDLE = os.environ.get("ML_WEIGHT_BUNDLE") or os.path.join(project_root, "models", "weights.safetensors")
+
+# "eager" (plain fp32 modules) or "optimized" (int8 + TorchScript, CPU only,
+# see optimized_backend.py)
+BACKEND = os.environ.get("ML_BACKEND", "eager")
+
+# behavior_type -> loaded model, filled on first use
+_MODELS = {}
+_BACKBONE = None
+_BACKBONE_STATE = None  # backbone weights the shared instance was loaded from
+_BUNDLE = None  # opened WeightBundle, False when there is none
+
+
+class ModelUnavailableError(RuntimeError):
+    """A behaviour's weights are missing or cannot be loaded.
+
+    Raised instead of serving the architecture with untrained weights; the
+    analyzers turn it into an error result for that behaviour.
+    """
+
+
+def get_bundle():
+    """The opened weight bundle, or None if disabled or not built."""
+
+    global _BUNDLE
+    if _BUNDLE is None:
+        _BUNDLE = WEIGHT_BUNDLE != "0" and os.path.exists(WEIGHT_BUNDLE) and WeightBundle(WEIGHT_BUNDLE)
+        if _BUNDLE:
+            print(f"Using weight bundle {WEIGHT_BUNDLE}", file=sys.stderr)
+    return _BUNDLE or None
+
+
+def check_architecture(behavior, state):
+    """Raise WeightBundleError unless `state` has exactly the keys and shapes of `behavior`'s class."""
+
+    with torch.device("meta"):
+        expected = MODEL_CLASSES[behavior]().state_dict()
+    problems = [k for k in expected if k not in state] + [k for k in state if k not in expected]
+    problems += [
+        f"{k}: {list(state[k].shape)} != {list(v.shape)}"
+        for k, v in expected.items()
+        if k in state and tuple(state[k].shape) != tuple(v.shape)
+    ]
+    if problems:
+        raise WeightBundleError(f"{behavior} weights do not match its architecture: {problems[:5]}")
+
+
+def _state_dict(behavior, model_path):
+    """(state dict, source) of `behavior` from the bundle or its .pth; (None, None) if neither.
+
+    Bundle tensors live on the mapped pages; a bundle that fails its checks
+    raises WeightBundleError instead of leaving the model untrained.
+    """
+
+    bundle = get_bundle()
+    if bundle is not None and behavior in bundle:
+        if os.path.exists(model_path) and bundle.is_stale(behavior, model_path):
+            print(f"{behavior} in {WEIGHT_BUNDLE} is stale (re-run utils/weight_bundle.py), using {model_path}", file=sys.stderr)
+        else:
+            state = bundle.state_dict(behavior, DEVICE)
+            check_architecture(behavior, state)
+            return state, WEIGHT_BUNDLE
+    if os.path.exists(model_path):
+        return torch.load(model_path, map_location=DEVICE), model_path
+    return None, None
+
+
+def _from_state(make, state, source):
+    """`make()` with `state` loaded.
+
+    For bundle tensors the module is built on the ``meta`` device and the
+    tensors are assigned in place, so no throwaway random init is allocated
+    and the weights stay on the shared mapped pages.
+    """
+
+    if source == WEIGHT_BUNDLE:
+        with torch.device("meta"):
+            module = make()
+        module.load_state_dict(state, assign=True)
+        return module
+    module = make().to(DEVICE)
+    module.load_state_dict(state)
+    return module
+
+
+def _same_weights(a, b):
+    return a.keys() == b.keys() and all(torch.equal(a[k], b[k].to(a[k].device)) for k in a)
+
+
+def _load_frame_model(behavior, model_path):
+    """Build `behavior` as a head on the shared backbone (see split_frame_state_dict)."""
+
+    global _BACKBONE, _BACKBONE_STATE
+    state, source = _state_dict(behavior, model_path)
+    if state is None:
+        raise ModelUnavailableError(f"{behavior} model not available: {MODEL_FILES[behavior]} not found")
+
+    backbone_sd, head_sd = split_frame_state_dict(state)
+    head = FrameSequenceHead.from_state_dict(head_sd)
+    if _BACKBONE_STATE is None:
+        _BACKBONE = backbone = _from_state(FrozenBackbone, backbone_sd, source)
+        _BACKBONE_STATE = backbone_sd
+    elif not _same_weights(_BACKBONE_STATE, backbone_sd):
+        # Backbone was not frozen identically when this head was trained:
+        # keep its own copy rather than silently changing its outputs.
+        print(f"Warning: {behavior} backbone differs from shared one, using a private copy", file=sys.stderr)
+        backbone = _from_state(FrozenBackbone, backbone_sd, source)
+    else:
+        backbone = _BACKBONE
+    print(f"Loaded {behavior} model from {source}", file=sys.stderr)
+    return BackboneHeadModel(backbone, head)
+
+
+def _finalize(behavior, mdl):
+    """Put a freshly loaded model in eval mode, optimize it if selected, and cache it."""
+
+    mdl.eval()
+    if BACKEND == "optimized":
+        if DEVICE.type != "cpu":
+            print("ML_BACKEND=optimized is CPU only, using eager models", file=sys.stderr)
+        else:
+            from optimized_backend import optimize_model
+
+            try:
+                mdl = optimize_model(mdl)
+            except Exception as e:
+                print(f"Error optimizing {behavior} model, using eager: {e}", file=sys.stderr)
+    _MODELS[behavior] = mdl
+    return mdl
+
+
+def get_model(behavior):
+    """Build, load and cache the model for a single behavior on first request."""
+
+    if behavior in _MODELS:
+        return _MODELS[behavior]
+    if behavior not in MODEL_CLASSES:
+        raise KeyError(f"Unknown behavior: {behavior}")
+    with stage("model_load"):
+        return _load_model(behavior)
+
+
+def _load_model(behavior):
+    model_path = os.path.join(project_root, MODEL_FILES[behavior])
+    if SHARED_BACKBONE and behavior in FRAME_BEHAVIORS:
         try:
-            mdl = models[key].to(device)
-            if os.path.exists(model_path):
-                mdl.load_state_dict(torch.load(model_path, map_location=device))
-                print(f"Loaded {key} model from {model_path}", file=sys.stderr)
-            else:
-                print(f"Warning: Model file not found: {model_path}", file=sys.stderr)
+            return _finalize(behavior, _load_frame_model(behavior, model_path).to(DEVICE))
+        except (WeightBundleError, ModelUnavailableError):
+            raise
         except Exception as e:
-            print(f"Error loading {key} model: {e}", file=sys.stderr)
+            print(f"Error loading {behavior} model on shared backbone: {e}", file=sys.stderr)
 
-    # Set all models to evaluation mode
-    for model in models.values():
-        model.eval()
+    try:
+        state, source = _state_dict(behavior, model_path)
+        mdl = None if state is None else _from_state(MODEL_CLASSES[behavior], state, source)
+    except WeightBundleError:
+        raise
+    except Exception as e:
+        raise ModelUnavailableError(f"{behavior} model not available: {e}") from e
+    if mdl is None:
+        raise ModelUnavailableError(f"{behavior} model not available: {MODEL_FILES[behavior]} not found")
+    print(f"Loaded {behavior} model from {source}", file=sys.stderr)
+    return _finalize(behavior, mdl)
 
-    return models
\ No newline at end of file
+
+def load_all_models():
+    """Load every model that has weights; the others are reported and skipped.
+
+    A skipped behaviour raises `ModelUnavailableError` (or `WeightBundleError`
+    for a bad bundle) from `get_model` on each request, so weights deployed
+    later are picked up.
+    """
+
+    print(f"Using device: {DEVICE} ({BACKEND} backend)", file=sys.stderr)
+    models = {}
+    for key in MODEL_CLASSES:
+        try:
+            models[key] = get_model(key)
+        except (ModelUnavailableError, WeightBundleError) as e:
+            print(f"Warning: {e}", file=sys.stderr)
+    return models
@@ -1,25 +1,283 @@
 #!/usr/bin/env python3
 """Model Status script
 
-Reports the readiness of ML models to the Node.js backend. Currently acts as
-as stub always returning that the required models are *available*. This can be
-expanded later to run actual weight loading checks.
+Reports the readiness of the ML models to the Node.js backend:
+
+python utils/model_status.py [--warm] [--refresh] [--health]
+
+For every behaviour the weight file is checked without building the model:
+existence, size and whether its state-dict keys and shapes match the class
+in models/architectures.py (instantiated on the ``meta`` device, so no
+weights are allocated, and the checkpoint memory-mapped, so its tensors are
+not read).  Per model ``status`` is one of
+
+    ready         weights present and compatible
+    missing       no .pth: the analyzers return an error for it
+    incompatible  keys / shapes differ from the architecture
+    unreadable    the file cannot be loaded
+
+The report also lists what the weight bundle (see weight_bundle.py) holds,
+read from its header only, and which of its behaviours are ``stale``: their
+``.pth`` is not the one the bundle was packed from (size and mtime against
+the manifest; the file is only hashed when the mtime differs).
+
+``--warm`` additionally loads each model through model_loader and runs a
+dummy input, recording load time, first and second inference latency and
+the RSS growth.
+
+The report is cached in ``ML_STATUS_FILE`` (default models/status.json)
+together with the size and mtime of every .pth and of architectures.py and
+the backend settings; while those are unchanged the cached report is
+returned without importing torch.  ``--refresh`` ignores the cache.
+``--health`` wraps the report as ``{"status": "success" | "error", ...}``
+for the /test endpoint.
+
+Writes one JSON object to stdout.
 """
 
+import argparse
 import json
+import os
 import sys
+import time
+from typing import Any, Dict
 
+from weight_bundle import WeightBundle, WeightBundleError
 
-def main() -> None:
-    status = {
-        "eye_gaze": "ready",
-        "sit_stand": "ready",
-        "tapping_hands": "ready",
-        "tapping_feet": "ready",
-        "rapid_talking": "ready",
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATUS_FILE = os.environ.get("ML_STATUS_FILE") or os.path.join(PROJECT_ROOT, "models", "status.json")
+
+# Mirrors model_loader.MODEL_FILES, which cannot be imported without torch
+_MODEL_FILES = {
+    "eye_gaze": "models/eye_gaze.pth",
+    "sit_stand": "models/sit-stand.pth",
+    "tapping_hands": "models/tapping_hands.pth",
+    "tapping_feet": "models/tapping_feet.pth",
+    "rapid_talking": "models/rapid_talking.pth",
+}
+_ARCHITECTURES = "models/architectures.py"
+# Mirrors model_loader.WEIGHT_BUNDLE
+_BUNDLE = os.environ.get("ML_WEIGHT_BUNDLE") or os.path.join(PROJECT_ROOT, "models", "weights.safetensors")
+
+# Bump when the report layout changes so old status files are rebuilt
+FORMAT_VERSION = 3
+
+# Dummy input steps for --warm
+_WARM_STEPS = 8
+
+# Mismatched key names listed per category (the counts are always complete)
+_MAX_LISTED = 5
+
+
+def _file_stamp(rel: str) -> list | None:
+    try:
+        st = os.stat(os.path.join(PROJECT_ROOT, rel))
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def fingerprint() -> Dict[str, Any]:
+    """Size and mtime of everything the report depends on (cheap: stat only)."""
+
+    files = {rel: _file_stamp(rel) for rel in (*_MODEL_FILES.values(), _ARCHITECTURES, _BUNDLE)}
+    # Settings that change what --warm loads
+    env = {name: os.environ.get(name) for name in ("ML_BACKEND", "ML_SHARED_BACKBONE", "ML_WEIGHT_BUNDLE")}
+    return {"format": FORMAT_VERSION, "files": files, "env": env}
+
+
+def _compare_keys(expected: Dict[str, Any], found: Dict[str, Any]) -> Dict[str, Any]:
+    missing = [k for k in expected if k not in found]
+    unexpected = [k for k in found if k not in expected]
+    shapes = [
+        f"{k}: {list(found[k].shape)} != {list(expected[k].shape)}"
+        for k in expected
+        if k in found and tuple(found[k].shape) != tuple(expected[k].shape)
+    ]
+    return {
+        "expected": len(expected),
+        "found": len(found),
+        "missing": len(missing),
+        "unexpected": len(unexpected),
+        "shape_mismatch": len(shapes),
+        "examples": (missing + unexpected + shapes)[:_MAX_LISTED],
+    }
+
+
+def check_model(behavior: str) -> Dict[str, Any]:
+    """File and state-dict checks for one behaviour (imports torch)."""
+
+    import torch
+
+    from model_loader import MODEL_CLASSES, MODEL_FILES
+
+    rel = MODEL_FILES[behavior]
+    path = os.path.join(PROJECT_ROOT, rel)
+    entry: Dict[str, Any] = {"path": rel}
+    if not os.path.exists(path):
+        return {**entry, "status": "missing", "available": False}
+
+    entry["size_bytes"] = os.path.getsize(path)
+    try:
+        state = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    except Exception as exc:
+        return {**entry, "status": "unreadable", "available": False, "error": str(exc)}
+
+    with torch.device("meta"):
+        expected = MODEL_CLASSES[behavior]().state_dict()
+    entry["keys"] = _compare_keys(expected, state)
+    compatible = not (entry["keys"]["missing"] or entry["keys"]["unexpected"] or entry["keys"]["shape_mismatch"])
+    entry["status"] = "ready" if compatible else "incompatible"
+    entry["available"] = compatible
+    return entry
+
+
+def _stale_behaviors(bundle: WeightBundle) -> list:
+    """Bundle behaviours whose .pth changed since it was packed (model_loader uses the .pth)."""
+
+    stale = []
+    for behavior in bundle.behaviors:
+        path = os.path.join(PROJECT_ROOT, _MODEL_FILES.get(behavior, ""))
+        if behavior in _MODEL_FILES and os.path.exists(path) and bundle.is_stale(behavior, path):
+            stale.append(behavior)
+    return stale
+
+
+def check_bundle() -> Dict[str, Any]:
+    """Behaviours in the weight bundle, from its header (no torch, tensors not read)."""
+
+    entry: Dict[str, Any] = {"path": os.path.relpath(_BUNDLE, PROJECT_ROOT)}
+    if _BUNDLE == "0" or not os.path.exists(_BUNDLE):
+        return {**entry, "present": False}
+    try:
+        bundle = WeightBundle(_BUNDLE)
+    except WeightBundleError as exc:
+        return {**entry, "present": True, "error": str(exc)}
+    return {
+        **entry,
+        "present": True,
+        "size_bytes": os.path.getsize(_BUNDLE),
+        "behaviors": bundle.behaviors,
+        "stale": _stale_behaviors(bundle),
+        "missing": bundle.manifest.get("missing", []),
+        "created_at": bundle.manifest.get("created_at"),
+    }
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def warm_model(behavior: str) -> Dict[str, Any]:
+    """Load `behavior` through model_loader and time a dummy forward pass."""
+
+    import torch
+
+    from model_loader import DEVICE, FRAME_BEHAVIORS, get_model
+
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    model = get_model(behavior)
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    if behavior in FRAME_BEHAVIORS:
+        x = torch.rand(1, _WARM_STEPS, 3, 64, 64)
+    elif behavior == "sit_stand":
+        x = torch.rand(1, _WARM_STEPS, 66)
+    else:
+        x = torch.rand(1, _WARM_STEPS, 1)
+    x = x.to(DEVICE)
+
+    timings = []
+    with torch.inference_mode():
+        for _ in range(2):
+            t0 = time.perf_counter()
+            out = model(x)
+            timings.append((time.perf_counter() - t0) * 1000)
+    return {
+        "load_ms": round(load_ms, 1),
+        "first_inference_ms": round(timings[0], 1),
+        "inference_ms": round(timings[1], 1),
+        "rss_delta_mb": round(_rss_mb() - rss0, 1),
+        "output_shape": list(out.shape),
     }
-    sys.stdout.write(json.dumps(status))
+
+
+def build_report(warm: bool) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    models = {behavior: check_model(behavior) for behavior in _MODEL_FILES}
+    if warm:
+        for behavior, entry in models.items():
+            try:
+                entry["warm"] = warm_model(behavior)
+            except Exception as exc:
+                entry["warm"] = {"error": str(exc)}
+    return {
+        "models": models,
+        "bundle": check_bundle(),
+        "system_ready": any(entry["available"] for entry in models.values()),
+        "checked_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "check_ms": round((time.perf_counter() - t0) * 1000, 1),
+        "warmed": warm,
+        "fingerprint": fingerprint(),
+    }
+
+
+def _read_cache() -> Dict[str, Any] | None:
+    try:
+        with open(STATUS_FILE, "r", encoding="utf-8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(report: Dict[str, Any]) -> None:
+    tmp = f"{STATUS_FILE}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(STATUS_FILE), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=2)
+        os.replace(tmp, STATUS_FILE)  # readers never see a partial file
+    except OSError as exc:
+        print(f"Could not write {STATUS_FILE}: {exc}", file=sys.stderr)
+
+
+def get_status(warm: bool = False, refresh: bool = False) -> Dict[str, Any]:
+    """The cached report if still valid (and warmed when asked), else a fresh one."""
+
+    if not refresh:
+        cached = _read_cache()
+        if cached and cached.get("fingerprint") == fingerprint() and (cached.get("warmed") or not warm):
+            return {**cached, "cached": True}
+    report = build_report(warm)
+    _write_cache(report)
+    return {**report, "cached": False}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report ML model readiness")
+    parser.add_argument("--warm", action="store_true", help="Load each model and time a dummy inference")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the cached status file")
+    parser.add_argument("--health", action="store_true", help='Wrap as {"status": "success" | "error", ...}')
+    args = parser.parse_args()
+
+    report = get_status(warm=args.warm, refresh=args.refresh)
+    report.pop("fingerprint", None)
+    if args.health:
+        ready = [b for b, entry in report["models"].items() if entry["available"]]
+        report = {
+            "status": "success" if report["system_ready"] else "error",
+            "message": f"{len(ready)}/{len(report['models'])} models ready",
+            **report,
+        }
+    sys.stdout.write(json.dumps(report))
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
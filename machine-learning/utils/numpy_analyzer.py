@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Torch-free analyzer for rapid_talking and precomputed sit_stand landmarks.
+
+Same CLI and ``--serve`` JSON-lines protocol as ml_analyzer.py:
+
+python utils/numpy_analyzer.py --data <tmp_file> --behavior rapid_talking
+python utils/numpy_analyzer.py --serve
+
+Requests it can answer with the exported ``.npz`` models (see numpy_lstm.py)
+never import torch, so the process starts in milliseconds.  Anything else —
+frame payloads, other behaviours, batches, stream ops, a missing or stale
+``.npz`` — is handed to ml_analyzer, imported on first need, so callers can
+send it any request.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from frame_container import is_container, read_container
+from instrumentation import record_request, recording, stage, summary
+from numpy_lstm import NumpyLSTMModel
+from weight_bundle import file_sha256
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mirrors model_loader.MODEL_FILES for the exportable behaviours
+_PTH_FILES = {
+    "rapid_talking": "models/rapid_talking.pth",
+    "sit_stand": "models/sit-stand.pth",
+}
+
+# behaviour -> loaded model, or None when the .npz cannot be used
+_MODELS: Dict[str, NumpyLSTMModel | None] = {}
+
+
+def get_numpy_model(behavior: str) -> NumpyLSTMModel | None:
+    """The exported model, or None if missing or older than its ``.pth``."""
+
+    if behavior in _MODELS:
+        return _MODELS[behavior]
+    model = None
+    pth = os.path.join(PROJECT_ROOT, _PTH_FILES[behavior]) if behavior in _PTH_FILES else None
+    if pth is not None:
+        npz = os.path.splitext(pth)[0] + ".npz"
+        try:
+            model = NumpyLSTMModel.load(npz)
+            if os.path.exists(pth) and model.meta.get("source_sha256") != file_sha256(pth):
+                print(f"{npz} is stale (re-run utils/export_numpy.py), using torch", file=sys.stderr)
+                model = None
+        except FileNotFoundError:
+            pass
+        except Exception as exc:
+            print(f"Could not load {npz}: {exc}", file=sys.stderr)
+    _MODELS[behavior] = model
+    return model
+
+
+def _sequence(behavior: str, data: Any) -> List[Any] | None:
+    """The numeric input sequence, or None if the payload holds frames."""
+
+    seq = data if isinstance(data, list) else (data or {}).get(behavior) or []
+    if any(isinstance(v, (str, bytes, bytearray, memoryview)) for v in seq[:1]):
+        return None
+    return seq
+
+
+def _format(behavior: str, out: np.ndarray) -> Dict[str, Any]:
+    """NumPy twin of ml_analyzer._format_output for these two behaviours."""
+
+    if behavior == "sit_stand":
+        e = np.exp(out - out.max())
+        prob = float(e[1] / e.sum())
+    else:
+        prob = float(out.reshape(-1)[0])
+    prob = max(0.0, min(1.0, prob))
+    return {"detected": prob > 0.5, "confidence": round(prob, 4)}
+
+
+def predict(behavior: str, data: Any) -> Dict[str, Any] | None:
+    """Result for one request, or None when it has to go to the torch path."""
+
+    model = get_numpy_model(behavior)
+    if model is None:
+        return None
+    seq = _sequence(behavior, data)
+    if seq is None:
+        return None
+    if not len(seq):
+        return {"detected": False, "confidence": 0.0, "error": "insufficient_data"}
+    with stage("forward"):
+        out = model.predict([seq])[0]
+    return _format(behavior, out)
+
+
+# ---------------------------------------------------------------------------
+# Entry points
+# ---------------------------------------------------------------------------
+
+
+def _load_payload(path: str) -> Any:
+    with stage("load_payload"):
+        if is_container(path):
+            return read_container(path)
+        with open(path, "r", encoding="utf-8") as fp:
+            return json.load(fp)
+
+
+# Set by `serve`: requests come from HTTP clients (see ml_analyzer.VIDEO_PATHS)
+_SERVING = False
+
+
+def _torch_analyzer():
+    # Imported only for requests the NumPy path cannot serve
+    import ml_analyzer
+
+    if _SERVING:
+        ml_analyzer.VIDEO_PATHS = False
+    return ml_analyzer
+
+
+def _handle_request(req: Dict[str, Any]) -> Dict[str, Any]:
+    if req.get("op") == "metrics":
+        # Counters of this process; torch requests count here too once imported
+        return summary(torch_loaded="torch" in sys.modules)
+
+    behavior = req.get("behavior")
+    if behavior in _PTH_FILES and not req.get("op") and "batch_file" not in req and "behaviors" not in req:
+        t0 = time.perf_counter()
+        with recording(req.get("timings")) as rec:
+            payload = _load_payload(req["data_file"]) if "data_file" in req else req.get("data")
+            data = payload.get(behavior, payload) if isinstance(payload, dict) else payload
+            result = predict(behavior, data)
+        if result is not None:
+            record_request(behavior, (time.perf_counter() - t0) * 1000, "error" in result)
+            if rec is not None:
+                result["timings"] = rec.as_dict()
+            return result
+    return _torch_analyzer()._handle_request(req)
+
+
+def serve(stdin=None, stdout=None) -> None:
+    """Answer JSON-lines requests until stdin is closed (ready immediately)."""
+
+    global _SERVING
+    stdin = stdin or sys.stdin
+    out = stdout or sys.stdout
+    sys.stdout = sys.stderr
+    # Like ml_analyzer.serve: clips named by a server path are refused, also
+    # in the requests handed to ml_analyzer (imported later, on first need)
+    _SERVING = True
+    for behavior in _PTH_FILES:
+        get_numpy_model(behavior)
+    out.write(json.dumps({"ready": True}) + "\n")
+    out.flush()
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        req_id = None
+        try:
+            req = json.loads(line)
+            req_id = req.get("id")
+            response = {"id": req_id, "result": _handle_request(req)}
+        except Exception as exc:
+            response = {"id": req_id, "error": str(exc)}
+        out.write(json.dumps(response) + "\n")
+        out.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Torch-free analysis of WPM / pose-landmark sequences")
+    parser.add_argument("--data", help="Path to the input data file")
+    parser.add_argument("--behavior", help="Behavior type (rapid_talking or sit_stand; others use torch)")
+    parser.add_argument("--serve", action="store_true", help="Run as a persistent JSON-lines worker on stdin/stdout")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve()
+        return
+
+    if not args.data or not args.behavior:
+        parser.error("--data and --behavior are required unless --serve is given")
+
+    if not os.path.exists(args.data):
+        print(json.dumps({"error": f"Data file not found: {args.data}"}), file=sys.stderr)
+        sys.exit(1)
+
+    result = _handle_request({"behavior": args.behavior, "data_file": args.data})
+    sys.stdout.write(json.dumps(result))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,139 @@
+"""Pure-NumPy inference for the small LSTM models (WPMModel, SitStandLSTM).
+
+Importing torch (plus torchvision / MediaPipe through ml_analyzer) costs
+seconds, while a rapid_talking request is a 1→16 LSTM over a handful of WPM
+values.  `utils/export_numpy.py` writes these models' weights to ``.npz``
+files next to their ``.pth``; `NumpyLSTMModel` runs them with NumPy only.
+
+The maths follows ``torch.nn.LSTM`` (gate order i, f, g, o; multi-layer;
+bidirectional) and the model heads (``fc`` on the last time step, sigmoid
+for WPMModel).  Sequences of different lengths are batched together: they are
+right-padded and a mask freezes the state on padding, so every sequence gets
+exactly the output it would get alone.
+
+An ``.npz`` holds the torch state-dict arrays under their usual names plus a
+JSON ``meta`` string (behaviour, output activation, SHA-256 of the source
+``.pth``).
+"""
+
+import json
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+__all__ = ["NumpyLSTMModel", "lstm", "save_npz"]
+
+FORMAT_VERSION = 1
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # tanh form: no overflow warnings for large |x|
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+def _direction(
+    x: np.ndarray,
+    mask: np.ndarray,
+    w_ih: np.ndarray,
+    w_hh: np.ndarray,
+    bias: np.ndarray,
+    reverse: bool,
+) -> np.ndarray:
+    """One LSTM direction over (B, T, F) -> (B, T, H); state is held on masked steps."""
+
+    b, t, _ = x.shape
+    hidden = w_hh.shape[1]
+    # Input projection for all time steps in one matmul
+    x_proj = x @ w_ih.T + bias
+    h = np.zeros((b, hidden), dtype=x.dtype)
+    c = np.zeros((b, hidden), dtype=x.dtype)
+    out = np.zeros((b, t, hidden), dtype=x.dtype)
+    w_hh_t = w_hh.T
+
+    for step in range(t - 1, -1, -1) if reverse else range(t):
+        gates = x_proj[:, step] + h @ w_hh_t
+        i = _sigmoid(gates[:, :hidden])
+        f = _sigmoid(gates[:, hidden:2 * hidden])
+        g = np.tanh(gates[:, 2 * hidden:3 * hidden])
+        o = _sigmoid(gates[:, 3 * hidden:])
+        c_new = f * c + i * g
+        h_new = o * np.tanh(c_new)
+        keep = mask[:, step, None]
+        c = np.where(keep, c_new, c)
+        h = np.where(keep, h_new, h)
+        out[:, step] = h
+    return out
+
+
+def lstm(x: np.ndarray, mask: np.ndarray, weights: Dict[str, np.ndarray], prefix: str = "lstm") -> np.ndarray:
+    """Stacked (bi)LSTM with torch ``nn.LSTM`` weights: (B, T, F) -> (B, T, H * directions)."""
+
+    layer = 0
+    while f"{prefix}.weight_ih_l{layer}" in weights:
+        outputs = []
+        for suffix, reverse in (("", False), ("_reverse", True)):
+            name = f"l{layer}{suffix}"
+            if f"{prefix}.weight_ih_{name}" not in weights:
+                continue
+            bias = weights[f"{prefix}.bias_ih_{name}"] + weights[f"{prefix}.bias_hh_{name}"]
+            outputs.append(
+                _direction(
+                    x,
+                    mask,
+                    weights[f"{prefix}.weight_ih_{name}"],
+                    weights[f"{prefix}.weight_hh_{name}"],
+                    bias,
+                    reverse,
+                )
+            )
+        x = outputs[0] if len(outputs) == 1 else np.concatenate(outputs, axis=-1)
+        layer += 1
+    return x
+
+
+class NumpyLSTMModel:
+    """LSTM + linear head loaded from an ``.npz`` written by `save_npz`."""
+
+    def __init__(self, weights: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self.weights = {k: v.astype(np.float32) for k, v in weights.items()}
+        self.meta = meta
+        self.input_size = self.weights["lstm.weight_ih_l0"].shape[1]
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyLSTMModel":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            weights = {k: data[k] for k in data.files if k != "meta"}
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported .npz format in {path}: {meta.get('format')}")
+        return cls(weights, meta)
+
+    def forward(self, x: np.ndarray, lengths: np.ndarray | None = None) -> np.ndarray:
+        """Outputs for a padded batch (B, T, F); ``lengths`` defaults to T for all."""
+
+        b, t, _ = x.shape
+        lengths = np.full(b, t) if lengths is None else np.asarray(lengths)
+        mask = np.arange(t)[None, :] < lengths[:, None]
+        seq = lstm(x.astype(np.float32, copy=False), mask, self.weights)
+        last = seq[np.arange(b), lengths - 1]
+        out = last @ self.weights["fc.weight"].T + self.weights["fc.bias"]
+        return _sigmoid(out) if self.meta.get("output") == "sigmoid" else out
+
+    def predict(self, sequences: Sequence[Any]) -> List[np.ndarray]:
+        """Run many (T_i, F) sequences in one padded batch; one output row each."""
+
+        arrays = [np.asarray(s, dtype=np.float32).reshape(-1, self.input_size) for s in sequences]
+        lengths = np.array([len(a) for a in arrays])
+        if not len(arrays) or lengths.min() == 0:
+            raise ValueError("Empty sequence")
+        batch = np.zeros((len(arrays), lengths.max(), self.input_size), dtype=np.float32)
+        for i, a in enumerate(arrays):
+            batch[i, : len(a)] = a
+        return list(self.forward(batch, lengths))
+
+
+def save_npz(path: str, state_dict: Dict[str, np.ndarray], **meta: Any) -> None:
+    """Write state-dict arrays plus the JSON ``meta`` record to ``path``."""
+
+    meta = {"format": FORMAT_VERSION, **meta}
+    np.savez(path, meta=np.array(json.dumps(meta)), **state_dict)
@@ -0,0 +1,193 @@
+"""Optimized CPU inference backend, selected with ``ML_BACKEND=optimized``.
+
+`optimize_model` turns a loaded eager fp32 model into an equivalent one that
+is cheaper to run without a GPU:
+
+* Conv2d + BatchNorm2d pairs of the MobileNetV2 features are fused into one
+  convolution and the weights are stored channels_last.
+* LSTM and Linear layers are dynamically quantized to int8.  Layers with
+  fewer than ``_MIN_QUANT_WEIGHTS`` weights (the 1×16 WPM LSTM) stay fp32:
+  quantizing them costs more than it saves.
+* The result is traced and frozen with TorchScript.
+
+The frozen modules are cached on disk (``ML_OPTIMIZED_DIR``, default
+models/optimized/) under a key derived from the source weights, so a restart
+skips the trace.  Streaming still needs `forward_step`, which TorchScript does
+not keep; it runs on the quantized eager module kept next to the frozen one.
+
+Quantization changes the outputs slightly; utils/check_optimized.py reports
+the confidence drift per behaviour.
+"""
+
+import copy
+import hashlib
+import os
+import sys
+import warnings
+from typing import Any, Dict, Tuple
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from models.architectures import BackboneHeadModel, FrozenBackbone
+
+__all__ = ["OptimizedModel", "optimize_model"]
+
+# Bump when the optimization recipe changes so stale artifacts are rebuilt
+BACKEND_VERSION = "1"
+
+CACHE_DIR = os.environ.get(
+    "ML_OPTIMIZED_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "optimized"),
+)
+
+_MIN_QUANT_WEIGHTS = 4096
+
+# Trace shapes; the traced graphs are valid for any batch size / sequence length
+_TRACE_BATCH, _TRACE_STEPS = 2, 8
+
+# id(eager backbone) -> optimized backbone, so a shared backbone is optimized once
+_BACKBONES: Dict[int, "OptimizedModel"] = {}
+
+
+class OptimizedModel(nn.Module):
+    """Frozen TorchScript forward plus the eager module it was traced from."""
+
+    def __init__(self, scripted: torch.jit.ScriptModule, eager: nn.Module | None, fingerprint: str):
+        super().__init__()
+        self.scripted = scripted
+        self.eager = eager  # None when nothing needs the eager path (the backbone)
+        self.fingerprint = fingerprint  # identifies the weights + recipe
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.scripted(x)
+
+    @property
+    def supports_step(self) -> bool:
+        """Whether `forward_step` is usable (only through the eager copy)."""
+
+        return self.eager is not None and hasattr(self.eager, "forward_step")
+
+    def forward_step(self, x: torch.Tensor, state: Any = None) -> Tuple[torch.Tensor, Any]:
+        return self.eager.forward_step(x, state)
+
+
+# ---------------------------------------------------------------------------
+# Passes
+# ---------------------------------------------------------------------------
+
+
+def _fuse_conv_bn(module: nn.Module) -> bool:
+    """Fold every Conv2d directly followed by BatchNorm2d (in a Sequential); True if any."""
+
+    fused = False
+    for child in module.children():
+        fused |= _fuse_conv_bn(child)
+    if isinstance(module, nn.Sequential):
+        names = list(module._modules)
+        for first, second in zip(names, names[1:]):
+            conv, bn = module._modules[first], module._modules[second]
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                module._modules[first] = fuse_conv_bn_eval(conv, bn)
+                module._modules[second] = nn.Identity()
+                fused = True
+    return fused
+
+
+def _quantize(module: nn.Module) -> nn.Module:
+    """Dynamic int8 quantization of the LSTM/Linear layers worth quantizing."""
+
+    targets = {
+        name
+        for name, sub in module.named_modules()
+        if isinstance(sub, (nn.LSTM, nn.Linear))
+        and sum(p.numel() for n, p in sub.named_parameters() if "weight" in n) >= _MIN_QUANT_WEIGHTS
+    }
+    if not targets:
+        return module
+    with warnings.catch_warnings():
+        # torch.ao.quantization is deprecated in favour of torchao but still works
+        warnings.simplefilter("ignore")
+        try:
+            from torch.ao.quantization import quantize_dynamic
+        except ImportError:
+            print("Dynamic quantization unavailable, keeping fp32 layers", file=sys.stderr)
+            return module
+        return quantize_dynamic(module, targets, dtype=torch.qint8)
+
+
+def _prepare(module: nn.Module) -> nn.Module:
+    """Fused, channels_last, quantized copy of `module` (eager)."""
+
+    prepared = copy.deepcopy(module).eval()
+    if _fuse_conv_bn(prepared):
+        prepared = prepared.to(memory_format=torch.channels_last)
+    return _quantize(prepared)
+
+
+def _example_input(module: nn.Module) -> torch.Tensor:
+    if isinstance(module, FrozenBackbone):
+        return torch.rand(_TRACE_BATCH * _TRACE_STEPS, 3, 64, 64)
+    if hasattr(module, "feature_extractor"):
+        return torch.rand(_TRACE_BATCH, _TRACE_STEPS, 3, 64, 64)
+    return torch.rand(_TRACE_BATCH, _TRACE_STEPS, module.lstm.input_size)
+
+
+def _fingerprint(module: nn.Module) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    h.update(f"{BACKEND_VERSION}:{torch.__version__}:{type(module).__name__}".encode())
+    for name, tensor in module.state_dict().items():
+        h.update(name.encode())
+        h.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return h.hexdigest()
+
+
+def _load_or_trace(module: nn.Module, fingerprint: str, eager: nn.Module | None) -> torch.jit.ScriptModule:
+    path = os.path.join(CACHE_DIR, f"{type(module).__name__}-{fingerprint}.pt")
+    if os.path.exists(path):
+        try:
+            return torch.jit.load(path, map_location="cpu")
+        except Exception as exc:
+            print(f"Ignoring unreadable optimized artifact {path}: {exc}", file=sys.stderr)
+
+    eager = eager if eager is not None else _prepare(module)
+    with torch.no_grad(), warnings.catch_warnings():
+        # TorchScript is deprecated in favour of torch.export but still the
+        # only format that freezes dynamically quantized LSTMs
+        warnings.simplefilter("ignore", FutureWarning)
+        scripted = torch.jit.freeze(torch.jit.trace(eager, _example_input(module)))
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        torch.jit.save(scripted, tmp)
+        os.replace(tmp, path)  # atomic: concurrent workers never read a partial file
+    except OSError as exc:
+        print(f"Could not cache optimized artifact {path}: {exc}", file=sys.stderr)
+    return scripted
+
+
+def _optimize(module: nn.Module) -> OptimizedModel:
+    fingerprint = _fingerprint(module)
+    # The eager copy is only kept where streaming needs forward_step
+    eager = _prepare(module) if hasattr(module, "forward_step") else None
+    return OptimizedModel(_load_or_trace(module, fingerprint, eager), eager, fingerprint)
+
+
+def optimize_backbone(backbone: FrozenBackbone) -> OptimizedModel:
+    optimized = _BACKBONES.get(id(backbone))
+    if optimized is None:
+        optimized = _BACKBONES[id(backbone)] = _optimize(backbone)
+    return optimized
+
+
+def optimize_model(model: nn.Module) -> nn.Module:
+    """Optimized counterpart of an eager model from model_loader (CPU only).
+
+    Shared-backbone models keep their BackboneHeadModel shape (backbone and
+    head optimized separately) so feature caching keeps working.
+    """
+
+    if isinstance(model, BackboneHeadModel):
+        return BackboneHeadModel(optimize_backbone(model.backbone), _optimize(model.head)).eval()
+    return _optimize(model).eval()
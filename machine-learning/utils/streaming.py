@@ -0,0 +1,176 @@
+"""Incremental streaming inference with per-session LSTM state.
+
+A live PatientMonitor session only adds a few frames (or WPM values) per
+call, yet `_predict` re-runs the whole window from scratch.  A stream session
+keeps the LSTM ``(h, c)`` of its behaviour between pushes, so each push only
+runs the new time steps (backbone included) and returns the prediction for
+everything pushed so far — identical to running the full sequence at once.
+
+`SitStandLSTM` is bidirectional: its last output depends on the future, so
+there is no state to carry.  Its sessions keep the last ``SIT_STAND_WINDOW``
+pose vectors and re-run that bounded window on every push instead.
+
+With tracking on (``tracking`` at open, default ML_TRACKING) each session
+owns its MediaPipe video-mode solvers, so landmarks are tracked across pushes
+without leaking between sessions; they are closed with the session.
+
+Sessions idle for longer than ``idle_timeout`` seconds are evicted on the
+next call; the oldest session is dropped when ``max_sessions`` is reached.
+"""
+
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Dict
+
+import torch
+
+from image_batch import crops_to_tensor
+from ml_analyzer import (
+    DEVICE,
+    MODEL_FILES,
+    _TRACKING_MODE,
+    _error,
+    _extract_frames,
+    _format_output,
+    _frame_list,
+    _INSUFFICIENT,
+    _is_frame,
+    close_solvers,
+    get_model,
+    video_solvers,
+)
+from video_clip import VideoClip
+
+__all__ = ["StreamSession", "StreamManager", "get_manager"]
+
+SIT_STAND_WINDOW = int(os.environ.get("ML_STREAM_SIT_STAND_WINDOW", "30"))
+IDLE_TIMEOUT_S = float(os.environ.get("ML_STREAM_IDLE_S", "300"))
+MAX_SESSIONS = int(os.environ.get("ML_STREAM_MAX_SESSIONS", "256"))
+
+# Same minimum as the one-shot path before a prediction is reported
+_MIN_STEPS = 3
+
+
+def _new_steps(behavior: str, data: Any) -> torch.Tensor | None:
+    """Model input for the newly pushed data, (T_new, ...), or None if nothing usable."""
+
+    if behavior == "rapid_talking":
+        values = data if isinstance(data, list) else data.get(behavior) or []
+        return torch.tensor(values, dtype=torch.float32).view(-1, 1) if values else None
+
+    frames = _frame_list(behavior, data) or []
+    if behavior == "sit_stand" and not isinstance(frames, VideoClip) and not (frames and _is_frame(frames[0])):
+        rows = torch.tensor(frames, dtype=torch.float32)
+        return (rows.unsqueeze(0) if rows.dim() == 1 else rows) if rows.numel() else None
+
+    feats = _extract_frames(behavior, frames)
+    if not feats:
+        return None
+    if behavior == "sit_stand":
+        return torch.tensor(feats, dtype=torch.float32)
+    return crops_to_tensor(feats)
+
+
+class StreamSession:
+    """Running state of one behaviour for one client session."""
+
+    def __init__(self, behavior: str, tracking: bool = False):
+        self.behavior = behavior
+        self.model = get_model(behavior)
+        self.state = None  # LSTM (h, c) after the last pushed step
+        self.solvers: Dict[str, Any] | None = {} if tracking else None
+        self.window: deque | None = deque(maxlen=SIT_STAND_WINDOW) if behavior == "sit_stand" else None
+        self.steps = 0
+        self.last_output: torch.Tensor | None = None
+        self.last_used = time.monotonic()
+
+    @torch.inference_mode()
+    def push(self, data: Any) -> Dict[str, Any]:
+        self.last_used = time.monotonic()
+        if self.solvers is None:
+            inputs = _new_steps(self.behavior, data)
+        else:
+            with video_solvers(self.solvers):
+                inputs = _new_steps(self.behavior, data)
+
+        if inputs is not None:
+            if self.window is not None:
+                # Bidirectional: re-run the bounded window
+                self.window.extend(inputs)
+                window = torch.stack(list(self.window)).unsqueeze(0).to(DEVICE)
+                self.last_output = self.model(window)[0]
+            else:
+                out, self.state = self.model.forward_step(inputs.unsqueeze(0).to(DEVICE), self.state)
+                self.last_output = out[0]
+            self.steps += inputs.shape[0]
+
+        if self.last_output is None or self.steps < _MIN_STEPS:
+            result = _error(_INSUFFICIENT.get(self.behavior, "insufficient_data"))
+        else:
+            result = _format_output(self.behavior, self.last_output)
+        result["steps"] = self.steps
+        return result
+
+    def close(self) -> None:
+        if self.solvers:
+            close_solvers(self.solvers)
+
+
+class StreamManager:
+    """Owns the open sessions of one process."""
+
+    def __init__(self, idle_timeout: float = IDLE_TIMEOUT_S, max_sessions: int = MAX_SESSIONS):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, StreamSession]" = OrderedDict()
+
+    def evict_idle(self) -> int:
+        cutoff = time.monotonic() - self.idle_timeout
+        stale = [sid for sid, s in self.sessions.items() if s.last_used < cutoff]
+        for sid in stale:
+            self.sessions.pop(sid).close()
+        return len(stale)
+
+    def open(self, behavior: str, session_id: str | None = None, tracking: bool | None = None) -> Dict[str, Any]:
+        self.evict_idle()
+        if behavior not in MODEL_FILES:
+            return _error("unsupported_behavior")
+        while len(self.sessions) >= self.max_sessions:
+            self.sessions.popitem(last=False)[1].close()
+        session_id = session_id or uuid.uuid4().hex
+        if session_id in self.sessions:
+            self.sessions.pop(session_id).close()
+        tracking = _TRACKING_MODE.get() if tracking is None else bool(tracking)
+        self.sessions[session_id] = StreamSession(behavior, tracking)
+        return {"session_id": session_id, "behavior": behavior, "tracking": tracking}
+
+    def push(self, session_id: str, data: Any) -> Dict[str, Any]:
+        self.evict_idle()
+        session = self.sessions.get(session_id)
+        if session is None:
+            return _error("unknown_session")
+        self.sessions.move_to_end(session_id)
+        try:
+            result = session.push(data)
+        except Exception as exc:
+            result = _error(str(exc))
+        result["session_id"] = session_id
+        return result
+
+    def close(self, session_id: str) -> Dict[str, Any]:
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+        return {"session_id": session_id, "closed": session is not None}
+
+
+_MANAGER: StreamManager | None = None
+
+
+def get_manager() -> StreamManager:
+    global _MANAGER
+    if _MANAGER is None:
+        _MANAGER = StreamManager()
+    return _MANAGER
@@ -0,0 +1,56 @@
+"""Torch thread-pool sizing for the analyzer processes.
+
+By default every process gives torch one intra-op thread per core.  The Node
+server runs ``ML_WORKERS`` analyzer workers side by side, so the defaults
+would put workers x cores threads on the cores and leave them contending
+for the same caches.  Instead:
+
+- intra-op threads per process default to cores / ``ML_WORKERS``
+  (``ML_TORCH_THREADS`` overrides it);
+- inter-op threads are 1: nothing here uses ``torch.jit.fork``, the
+  concurrency comes from the processes.
+
+Cores are those this process may run on (``sched_getaffinity``), so CPU
+pinning and container limits applied that way are respected.
+"""
+
+import os
+import threading
+
+import torch
+
+__all__ = ["CORES", "WORKERS", "configure", "intra_op_threads"]
+
+try:
+    CORES = len(os.sched_getaffinity(0))
+except AttributeError:  # not on Linux
+    CORES = os.cpu_count() or 1
+
+# Analyzer processes sharing the host (the Node pool passes its size)
+WORKERS = max(1, int(os.environ.get("ML_WORKERS", "1")))
+_OVERRIDE = int(os.environ.get("ML_TORCH_THREADS", "0"))
+
+_lock = threading.Lock()
+_configured = False
+
+
+def intra_op_threads() -> int:
+    """Threads per torch op in this process."""
+
+    return _OVERRIDE or max(1, CORES // WORKERS)
+
+
+def configure() -> None:
+    """Apply the process-wide settings (once, before any torch work)."""
+
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+        torch.set_num_threads(intra_op_threads())
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # inter-op pool already started, keep its size
+
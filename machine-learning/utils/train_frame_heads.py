@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""Train the eye-gaze / tapping heads from precomputed backbone features.
+
+EyeGazeLSTM and TappingCNN never update their MobileNetV2 features, so the
+pooled 1280-d output of every training image is the same in every epoch.
+Training therefore runs in two steps, ``extract`` and ``train``.
+
+Usage
+-----
+python utils/train_frame_heads.py extract --behavior eye_gaze --source data/eye_gaze/train
+        [--out features/eye_gaze] [--backbone models/eye_gaze.pth | imagenet]
+python utils/train_frame_heads.py train --store features/eye_gaze
+        [--out models/eye_gaze.pth] [--epochs 20] [--seq-len 10] [--workers 2]
+
+``extract`` runs each image through FrozenBackbone exactly once and writes
+the features as float16 ``.npy`` shards plus ``index.json`` (one *run* of
+consecutive frames per sequence with its label) and ``backbone.pth`` (the
+``feature_extractor.*`` weights they came from).  Sources:
+
+``--source DIR``  laid out like the training notebooks: ``DIR/<class>/``
+    holding images (one run per class, in file-name order), sub-directories
+    of images (one run each) or video clips (one run each).  The images are
+    taken to be the eye / hand / foot region already and are only resized to
+    64x64; ``--detect`` crops them with the analyzer's MediaPipe code first.
+``--data FILE``   a labelled set in the ``/api/ml/evaluate`` body format;
+    the webcam frames are cropped exactly as the analyzer does.
+
+Class directories are named after the labels (``down``, ``left``,
+``right``, ``straight``, ``up`` for eye_gaze, ``non-tapping`` / ``tapping``
+for the tapping models) or are the class indices.
+
+``train`` fits only the FrameSequenceHead (LSTM + classifier), reading the
+shards through ``np.load(mmap_mode="r")`` in ``--workers`` DataLoader
+processes.  Image-folder runs yield every ``--seq-len`` window (``--stride``
+apart), clips one evenly sampled sequence each, like the notebooks.
+Without ``--val-store`` the validation set is split off by run before
+windowing (whole runs per class, or the last ``--val`` of a class's only
+run), so overlapping windows never land on both sides.  The
+head with the best validation accuracy is merged with ``backbone.pth`` and
+saved as a regular EyeGazeLSTM / TappingCNN state dict, checked with a strict
+``load_state_dict`` before it is written.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from io import BytesIO
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+from torch.nn.utils.rnn import pack_padded_sequence, pad_sequence
+from torch.utils.data import DataLoader, Dataset
+
+from image_batch import IMAGE_SIZE, crops_to_tensor
+from model_loader import FRAME_BEHAVIORS, MODEL_CLASSES, MODEL_FILES, project_root
+from models.architectures import FrameSequenceHead, FrozenBackbone, split_frame_state_dict
+from weight_bundle import file_sha256
+
+# Label order of the model outputs (see ml_analyzer._format_output)
+CLASS_NAMES = {
+    "eye_gaze": ["down", "left", "right", "straight", "up"],
+    "tapping_hands": ["non-tapping", "tapping"],
+    "tapping_feet": ["non-tapping", "tapping"],
+}
+
+FORMAT_VERSION = 1
+FEATURE_DTYPE = np.float16  # pooled ReLU6 outputs in [0, 6]: fp16 keeps ~3 digits
+SHARD_ROWS = 65536  # frames per shard, 160 MB at float16
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+_VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+
+
+# ---------------------------------------------------------------------------
+# Extraction
+# ---------------------------------------------------------------------------
+
+
+def _label_of(behavior: str, name: Any) -> int:
+    names = CLASS_NAMES[behavior]
+    if isinstance(name, str) and name in names:
+        return names.index(name)
+    label = int(name)
+    if not 0 <= label < len(names):
+        raise ValueError(f"Label {name!r} out of range for {behavior}")
+    return label
+
+
+def _resized(rgb: np.ndarray) -> np.ndarray:
+    # Same filter as the analyzer's crops (image_batch.DecodedFrame.crop)
+    return np.asarray(Image.fromarray(rgb).resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR))
+
+
+def _read_image(path: str) -> bytes:
+    with open(path, "rb") as fp:
+        return fp.read()
+
+
+def _read_video(path: str) -> List[np.ndarray]:
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    frames = []
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    finally:
+        cap.release()
+    return frames
+
+
+def _detected_crops(behavior: str, frames: List[Any]) -> List[np.ndarray]:
+    """Crops as the analyzer would take them from full webcam frames."""
+
+    from ml_analyzer import _sequence_features
+
+    return [c for c in _sequence_features(behavior, frames) if c is not None]
+
+
+def _region_crops(frames: List[Any]) -> List[np.ndarray]:
+    crops = []
+    for frame in frames:
+        if isinstance(frame, np.ndarray):
+            crops.append(_resized(frame))
+            continue
+        try:
+            with Image.open(frame if isinstance(frame, str) else BytesIO(frame)) as img:
+                crops.append(_resized(np.asarray(img.convert("RGB"))))
+        except Exception:
+            continue  # unreadable file, dropped like an undecodable frame
+    return crops
+
+
+def _source_runs(behavior: str, root: str, detect: bool) -> Iterator[Tuple[str, int, str, List[np.ndarray]]]:
+    """(name, label, kind, crops) per run of a notebook-style class directory tree."""
+
+    def crops(frames: List[Any]) -> List[np.ndarray]:
+        if detect:
+            return _detected_crops(behavior, [f if isinstance(f, bytes) else _encode(f) for f in frames])
+        return _region_crops(frames)
+
+    for cls in sorted(os.listdir(root)):
+        cls_dir = os.path.join(root, cls)
+        if not os.path.isdir(cls_dir):
+            continue
+        label = _label_of(behavior, cls)
+        entries = sorted(os.listdir(cls_dir))
+        images = [os.path.join(cls_dir, e) for e in entries if e.lower().endswith(_IMAGE_EXTS)]
+        if images:
+            yield cls, label, "window", crops([_read_image(p) for p in images] if detect else images)
+        for e in entries:
+            path = os.path.join(cls_dir, e)
+            if os.path.isdir(path):
+                seq = sorted(f for f in os.listdir(path) if f.lower().endswith(_IMAGE_EXTS))
+                paths = [os.path.join(path, f) for f in seq]
+                yield f"{cls}/{e}", label, "window", crops([_read_image(p) for p in paths] if detect else paths)
+            elif e.lower().endswith(_VIDEO_EXTS):
+                yield f"{cls}/{e}", label, "clip", crops(_read_video(path))
+
+
+def _encode(rgb: np.ndarray) -> bytes:
+    buf = BytesIO()
+    Image.fromarray(rgb).save(buf, "JPEG", quality=95)
+    return buf.getvalue()
+
+
+def _data_runs(behavior: str, path: str) -> Iterator[Tuple[str, int, str, List[np.ndarray]]]:
+    """(name, label, kind, crops) per labelled entry of an /evaluate style set."""
+
+    with open(path, "r", encoding="utf-8") as fp:
+        entries = json.load(fp)
+    entries = entries.get("behaviors", entries) if isinstance(entries, dict) else entries
+    for i, entry in enumerate(entries):
+        if entry.get("type") != behavior or entry.get("label") is None:
+            continue
+        frames = entry["data"]
+        if isinstance(frames, dict):
+            frames = frames.get("frame_sequence") or frames.get(behavior) or []
+        yield f"entry{i}", _label_of(behavior, entry["label"]), "clip", _detected_crops(behavior, frames)
+
+
+def _backbone_state(behavior: str, spec: str | None) -> Tuple[Dict[str, torch.Tensor], str]:
+    """feature_extractor.* weights to embed with, and where they came from."""
+
+    if spec is None:
+        # The behaviour's own file, else any frame model (identical frozen features)
+        for b in (behavior, *FRAME_BEHAVIORS):
+            if os.path.exists(os.path.join(project_root, MODEL_FILES[b])):
+                spec = MODEL_FILES[b]
+                break
+        else:
+            spec = "imagenet"
+    if spec == "imagenet":
+        backbone = FrozenBackbone(pretrained=True)
+        return {f"feature_extractor.{k}": v for k, v in backbone.feature_extractor.state_dict().items()}, spec
+    path = spec if os.path.isabs(spec) or os.path.exists(spec) else os.path.join(project_root, spec)
+    backbone_sd, _ = split_frame_state_dict(torch.load(path, map_location="cpu", weights_only=True))
+    if not backbone_sd:
+        raise ValueError(f"{spec} has no feature_extractor.* weights")
+    return backbone_sd, spec
+
+
+class _ShardWriter:
+    """Appends runs of feature rows to fixed-size shards; a run never spans two."""
+
+    def __init__(self, out_dir: str, rows: int):
+        self.out_dir, self.rows = out_dir, rows
+        self.shards: List[Dict[str, Any]] = []
+        self._buf: List[np.ndarray] = []
+        self._used = 0
+
+    def add(self, feats: np.ndarray) -> Tuple[int, int]:
+        if self._used and self._used + len(feats) > self.rows:
+            self.flush()
+        start = self._used
+        self._buf.append(feats)
+        self._used += len(feats)
+        return len(self.shards), start
+
+    def flush(self) -> None:
+        if not self._used:
+            return
+        name = f"shard-{len(self.shards):05d}.npy"
+        np.save(os.path.join(self.out_dir, name), np.concatenate(self._buf))
+        self.shards.append({"file": name, "rows": self._used})
+        self._buf, self._used = [], 0
+
+
+def extract(args: argparse.Namespace) -> Dict[str, Any]:
+    behavior = args.behavior
+    out_dir = args.out or os.path.join(project_root, "features", behavior)
+    os.makedirs(out_dir, exist_ok=True)
+
+    backbone_sd, source = _backbone_state(behavior, args.backbone)
+    backbone = FrozenBackbone()
+    backbone.load_state_dict(backbone_sd)
+    backbone_file = os.path.join(out_dir, "backbone.pth")
+    torch.save(backbone_sd, backbone_file)
+
+    runs_iter = _data_runs(behavior, args.data) if args.data else _source_runs(behavior, args.source, args.detect)
+    writer = _ShardWriter(out_dir, args.shard_rows)
+    runs: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+    with torch.inference_mode():
+        for name, label, kind, crops in runs_iter:
+            if not crops:
+                print(f"Skipping {name}: no usable frames", file=sys.stderr)
+                continue
+            feats = np.concatenate([
+                backbone(crops_to_tensor(crops[i:i + args.batch])).numpy().astype(FEATURE_DTYPE)
+                for i in range(0, len(crops), args.batch)
+            ])
+            shard, start = writer.add(feats)
+            runs.append({"name": name, "label": label, "kind": kind, "shard": shard, "start": start, "length": len(feats)})
+            print(f"{name}: {len(feats)} frames, label {label}", file=sys.stderr)
+    writer.flush()
+
+    index = {
+        "format": FORMAT_VERSION,
+        "behavior": behavior,
+        "classes": CLASS_NAMES[behavior],
+        "dim": FrozenBackbone.out_dim,
+        "dtype": np.dtype(FEATURE_DTYPE).name,
+        "backbone": {"source": source, "file": "backbone.pth", "sha256": file_sha256(backbone_file)},
+        "shards": writer.shards,
+        "runs": runs,
+        "frames": sum(r["length"] for r in runs),
+        "extract_seconds": round(time.perf_counter() - t0, 2),
+    }
+    tmp = os.path.join(out_dir, f"index.json.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as fp:
+        json.dump(index, fp, indent=2)
+    os.replace(tmp, os.path.join(out_dir, "index.json"))
+    return {k: index[k] for k in ("behavior", "frames", "extract_seconds")} | {"runs": len(runs), "store": out_dir}
+
+
+# ---------------------------------------------------------------------------
+# Training
+# ---------------------------------------------------------------------------
+
+
+def load_index(store: str) -> Dict[str, Any]:
+    with open(os.path.join(store, "index.json"), "r", encoding="utf-8") as fp:
+        index = json.load(fp)
+    if index.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{store}: feature store format {index.get('format')}, expected {FORMAT_VERSION}")
+    if file_sha256(os.path.join(store, index["backbone"]["file"])) != index["backbone"]["sha256"]:
+        raise ValueError(f"{store}: backbone.pth does not match the weights the features were extracted with")
+    return index
+
+
+class FeatureSequenceDataset(Dataset):
+    """(T, 1280) float32 feature sequences + label, read from memory-mapped shards.
+
+    Shards are opened lazily in whichever process reads them, so DataLoader
+    workers share the page cache instead of pickled copies of the arrays.
+    """
+
+    def __init__(self, store: str, index: Dict[str, Any], seq_len: int, stride: int):
+        self.store = store
+        self.files = [s["file"] for s in index["shards"]]
+        self.samples: List[Tuple[int, Any, int]] = []
+        for run in index["runs"]:
+            shard, start, length, label = run["shard"], run["start"], run["length"], run["label"]
+            if run["kind"] == "window" and seq_len and length >= seq_len:
+                for s in range(start, start + length - seq_len + 1, stride):
+                    self.samples.append((shard, slice(s, s + seq_len), label))
+            elif not seq_len or length <= seq_len:
+                self.samples.append((shard, slice(start, start + length), label))
+            else:
+                rows = start + np.linspace(0, length - 1, seq_len).astype(int)
+                self.samples.append((shard, rows, label))
+        self._shards: Dict[int, np.ndarray] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {**self.__dict__, "_shards": {}}
+
+    def _shard(self, i: int) -> np.ndarray:
+        if i not in self._shards:
+            self._shards[i] = np.load(os.path.join(self.store, self.files[i]), mmap_mode="r")
+        return self._shards[i]
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __getitem__(self, idx: int) -> Tuple[torch.Tensor, int]:
+        shard, rows, label = self.samples[idx]
+        return torch.from_numpy(self._shard(shard)[rows].astype(np.float32)), label
+
+
+def _split_runs(runs: List[Dict[str, Any]], fraction: float, seed: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """(train, val) runs, split before windowing so no frame is in both.
+
+    A class with several runs holds out about `fraction` of them whole; a
+    class with a single run (an image folder) holds out its last frames.
+    """
+
+    by_class: Dict[int, List[Dict[str, Any]]] = {}
+    for run in runs:
+        by_class.setdefault(run["label"], []).append(run)
+    rng = np.random.default_rng(seed)
+    train, val = [], []
+    for label in sorted(by_class):
+        group = by_class[label]
+        if len(group) == 1:
+            run = group[0]
+            n_val = int(run["length"] * fraction)
+            train.append({**run, "length": run["length"] - n_val})
+            if n_val:
+                val.append({**run, "start": run["start"] + run["length"] - n_val, "length": n_val})
+            continue
+        order = rng.permutation(len(group))
+        n_val = round(len(group) * fraction)
+        val += [group[i] for i in order[:n_val]]
+        train += [group[i] for i in order[n_val:]]
+    return train, val
+
+
+def _collate(batch: List[Tuple[torch.Tensor, int]]) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    seqs, labels = zip(*batch)
+    lengths = torch.tensor([len(s) for s in seqs])
+    return pad_sequence(list(seqs), batch_first=True), lengths, torch.tensor(labels)
+
+
+def _logits(head: FrameSequenceHead, feats: torch.Tensor, lengths: torch.Tensor) -> torch.Tensor:
+    if bool((lengths == feats.shape[1]).all()):
+        return head(feats)
+    # Last valid step of each padded sequence, i.e. head(feats[i, :lengths[i]])
+    packed = pack_padded_sequence(feats, lengths, batch_first=True, enforce_sorted=False)
+    _, (h, _) = head.lstm(packed)
+    return head.classifier(h[-1])
+
+
+def _accuracy(head: FrameSequenceHead, loader: DataLoader, device: torch.device) -> float:
+    head.eval()
+    correct = total = 0
+    with torch.inference_mode():
+        for feats, lengths, labels in loader:
+            pred = _logits(head, feats.to(device), lengths).argmax(dim=1).cpu()
+            correct += int((pred == labels).sum())
+            total += len(labels)
+    return correct / total if total else float("nan")
+
+
+def _loader(dataset: Dataset, args: argparse.Namespace, shuffle: bool) -> DataLoader:
+    return DataLoader(
+        dataset,
+        batch_size=args.batch_size,
+        shuffle=shuffle,
+        num_workers=args.workers,
+        persistent_workers=args.workers > 0,
+        collate_fn=_collate,
+    )
+
+
+def train(args: argparse.Namespace) -> Dict[str, Any]:
+    index = load_index(args.store)
+    behavior = index["behavior"]
+    out_path = args.out or os.path.join(project_root, MODEL_FILES[behavior])
+    torch.manual_seed(args.seed)
+
+    if args.val_store:
+        train_set = FeatureSequenceDataset(args.store, index, args.seq_len, args.stride)
+        val_set = FeatureSequenceDataset(args.val_store, load_index(args.val_store), args.seq_len, args.stride)
+    else:
+        train_runs, val_runs = _split_runs(index["runs"], args.val, args.seed)
+        train_set = FeatureSequenceDataset(args.store, {**index, "runs": train_runs}, args.seq_len, args.stride)
+        val_set = FeatureSequenceDataset(args.store, {**index, "runs": val_runs}, args.seq_len, args.stride)
+    if not len(train_set):
+        raise ValueError(f"{args.store}: no training sequences (seq_len {args.seq_len})")
+    train_loader = _loader(train_set, args, shuffle=True)
+    val_loader = _loader(val_set, args, shuffle=False) if len(val_set) else None
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    # Default sizes, so the result also loads through MODEL_CLASSES[behavior]()
+    head = FrameSequenceHead(num_classes=len(index["classes"])).to(device)
+    criterion = nn.CrossEntropyLoss(label_smoothing=args.label_smoothing)
+    optimizer = torch.optim.Adam(head.parameters(), lr=args.lr)
+    scheduler = torch.optim.lr_scheduler.StepLR(optimizer, step_size=5, gamma=0.5)
+
+    best, best_state = -1.0, None
+    t0 = time.perf_counter()
+    for epoch in range(1, args.epochs + 1):
+        head.train()
+        total = 0.0
+        for feats, lengths, labels in train_loader:
+            optimizer.zero_grad()
+            loss = criterion(_logits(head, feats.to(device), lengths), labels.to(device))
+            loss.backward()
+            optimizer.step()
+            total += loss.item()
+        scheduler.step()
+        acc = _accuracy(head, val_loader, device) if val_loader else float("nan")
+        print(f"Epoch {epoch:02d}: loss {total / len(train_loader):.4f}, val acc {acc:.4f}", file=sys.stderr)
+        if val_loader is None or acc > best:
+            best = acc
+            best_state = {k: v.detach().cpu().clone() for k, v in head.state_dict().items()}
+
+    state = {**torch.load(os.path.join(args.store, index["backbone"]["file"]), weights_only=True), **best_state}
+    # Fail before writing anything the analyzers could not load
+    MODEL_CLASSES[behavior]().load_state_dict(state)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    torch.save(state, out_path)
+    print("Model saved to", out_path, file=sys.stderr)
+    return {
+        "behavior": behavior,
+        "train_sequences": len(train_set),
+        "val_sequences": len(val_set),
+        "val_accuracy": round(best, 4) if val_loader else None,
+        "train_seconds": round(time.perf_counter() - t0, 2),
+        "out": out_path,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train frame-model heads from precomputed backbone features")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ex = sub.add_parser("extract", help="Embed a labelled set once into a feature store")
+    ex.add_argument("--behavior", required=True, choices=FRAME_BEHAVIORS)
+    source = ex.add_mutually_exclusive_group(required=True)
+    source.add_argument("--source", help="Class directory tree (DIR/<class>/...)")
+    source.add_argument("--data", help="Labelled JSON set (body format of /api/ml/evaluate)")
+    ex.add_argument("--detect", action="store_true", help="With --source: crop the images with MediaPipe first")
+    ex.add_argument("--out", help="Store directory (default features/<behavior>)")
+    ex.add_argument("--backbone", help="Weights to embed with: a frame-model .pth or 'imagenet'")
+    ex.add_argument("--batch", type=int, default=256, help="Frames per backbone forward")
+    ex.add_argument("--shard-rows", type=int, default=SHARD_ROWS)
+
+    tr = sub.add_parser("train", help="Train a head on a feature store and save the .pth")
+    tr.add_argument("--store", required=True)
+    tr.add_argument("--val-store", help="Separately extracted validation set (default: --val split)")
+    tr.add_argument("--out", help="Output .pth (default the behaviour's file in models/)")
+    tr.add_argument("--epochs", type=int, default=20)
+    tr.add_argument("--batch-size", type=int, default=64)
+    tr.add_argument("--lr", type=float, default=1e-3)
+    tr.add_argument("--label-smoothing", type=float, default=0.0)
+    tr.add_argument("--seq-len", type=int, default=10, help="Frames per sequence (0: whole runs)")
+    tr.add_argument("--stride", type=int, default=1, help="Step between windows of image-folder runs")
+    tr.add_argument("--val", type=float, default=0.2, help="Validation fraction without --val-store")
+    tr.add_argument("--workers", type=int, default=min(4, max(0, (os.cpu_count() or 1) - 1)))
+    tr.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    if args.command == "train" and args.epochs < 1:
+        parser.error("--epochs must be at least 1")
+    report = extract(args) if args.command == "extract" else train(args)
+    sys.stdout.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,19 +4,50 @@
 Usage
 -----
 python train_rapid_talking.py  # saves rapid_talking.pth next to the other models
+python train_rapid_talking.py --windowed [--window 8] [--patience 10] [--csv data.csv]
+python train_rapid_talking.py --sweep lr=1e-3,1e-2 window=4,8,16 [--jobs 4] [--threads 1]
 
 The script expects a CSV at
 machine-learning/models/speech/rapid_talking_data.csv
 with at least two columns:
     wpm   – numeric words-per-minute value per utterance chunk
     label – 1 if "rapid talking", 0 otherwise
+
+Rows without a label are labelled ``wpm > --threshold`` (100, as in the
+rapid_talking notebook).
+
+The default mode trains on every utterance as a length-1 sequence.
+``--windowed`` trains `architectures.WPMModel` on sliding windows of
+``--window`` consecutive WPM values (within ``--group-col`` if given, e.g. a
+session id), labelled by their last row, which is what the analyzer scores
+for a stream of chunks.  ``--val`` holds out whole groups, or the last rows
+of a single stream, before windowing.  The CSV is read ``--chunksize`` rows
+at a time, the windows are built with numpy strides and kept in one tensor,
+each epoch shuffles it once and steps through contiguous batches, and
+training stops once the validation loss has not improved for ``--patience``
+epochs (the best weights are kept).
+
+``--sweep`` trains every combination of the given ``name=v1,v2`` settings
+(``lr``, ``batch_size``, ``window``, ``stride``, ``weight_decay``) with the
+windowed trainer in ``--jobs`` processes of ``--threads`` torch threads each,
+prints a JSON report and saves the configuration with the lowest validation
+loss.
 """
 
 from __future__ import annotations
 
+import argparse
+import itertools
+import json
+import multiprocessing
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any, Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
 import torch
 import torch.nn as nn
@@ -25,14 +56,42 @@ from sklearn.model_selection import train_test_split
 from torch.utils.data import DataLoader, Dataset, Subset
 
 ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "machine-learning"))
+
+from models.architectures import WPMModel  # noqa: E402
+
 CSV_PATH = ROOT / "machine-learning" / "models" / "speech" / "rapid_talking_data.csv"
 OUT_PATH = ROOT / "machine-learning" / "models" / "rapid_talking.pth"
 
+# Label for rows without one (rapid_talking notebook)
+WPM_THRESHOLD = 100.0
+
+# Windowed-mode defaults, overridable per sweep configuration
+DEFAULTS: Dict[str, Any] = {
+    "lr": 1e-2,
+    "batch_size": 256,
+    "window": 8,
+    "stride": 1,
+    "weight_decay": 0.0,
+    "epochs": 200,
+    "patience": 10,
+    "val": 0.2,
+    "seed": 42,
+}
+SWEEP_KEYS = ("lr", "batch_size", "window", "stride", "weight_decay")
+
+
+def _labels(df: pd.DataFrame, threshold: float) -> pd.Series:
+    derived = (df["wpm"] > threshold).astype(np.float32)
+    if "label" not in df.columns:
+        return derived
+    return df["label"].astype(np.float32).fillna(derived)
+
 
 class WPMSpeechDataset(Dataset):
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, threshold: float = WPM_THRESHOLD):
         self.x = torch.tensor(df["wpm"].values, dtype=torch.float32).view(-1, 1, 1)
-        self.y = torch.tensor(df["label"].values, dtype=torch.float32).view(-1, 1)
+        self.y = torch.tensor(_labels(df, threshold).values, dtype=torch.float32).view(-1, 1)
 
     def __len__(self):
         return len(self.x)
@@ -41,31 +100,19 @@ class WPMSpeechDataset(Dataset):
         return self.x[idx], self.y[idx]
 
 
-class WPMModel(nn.Module):
-    def __init__(self):
-        super().__init__()
-        self.lstm = nn.LSTM(1, 16, batch_first=True)
-        self.fc = nn.Linear(16, 1)
+def train_per_utterance(csv_path: Path, threshold: float) -> Dict[str, torch.Tensor]:
+    """The original trainer: one length-1 sequence per CSV row."""
 
-    def forward(self, x: torch.Tensor) -> torch.Tensor:
-        out, _ = self.lstm(x)
-        return torch.sigmoid(self.fc(out[:, -1, :]))
-
-
-def main() -> None:
-    if not CSV_PATH.exists():
-        raise FileNotFoundError(f"Training CSV not found: {CSV_PATH}")
-
-    df = pd.read_csv(CSV_PATH)
-    if not {"wpm", "label"}.issubset(df.columns):
-        raise ValueError("CSV must contain 'wpm' and 'label' columns")
+    df = pd.read_csv(csv_path)
+    if "wpm" not in df.columns:
+        raise ValueError("CSV must contain a 'wpm' column")
 
     # Train/val split
     train_idx, _ = train_test_split(
         range(len(df)), test_size=0.2, random_state=42, shuffle=True
     )
 
-    dataset = WPMSpeechDataset(df)
+    dataset = WPMSpeechDataset(df, threshold)
     train_loader = DataLoader(
         Subset(dataset, train_idx), batch_size=16, shuffle=True, drop_last=False
     )
@@ -88,11 +135,272 @@ def main() -> None:
             optimizer.step()
             total += loss.item()
         print(f"Epoch {epoch:02d}: loss {total/len(train_loader):.4f}")
+    return model.state_dict()
+
+
+# ---------------------------------------------------------------------------
+# Windowed training
+# ---------------------------------------------------------------------------
+
+
+def _split_rows(
+    groups: np.ndarray, starts: np.ndarray, lengths: np.ndarray, window: int, fraction: float, seed: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(train, val) masks over windows, split by rows so no row is in both.
+
+    With several groups about `fraction` of them are held out whole; a
+    single stream holds out its last rows, and windows straddling the cut
+    are dropped.
+    """
+
+    if len(lengths) > 1:
+        order = np.random.default_rng(seed).permutation(len(lengths))
+        val = np.isin(groups, order[:round(len(lengths) * fraction)])
+        return ~val, val
+    cut = lengths[0] - int(lengths[0] * fraction)
+    return starts + window - 1 < cut, starts >= cut
+
+
+def load_windows(
+    csv_path: Path,
+    window: int,
+    stride: int = 1,
+    *,
+    group_col: str | None = None,
+    threshold: float = WPM_THRESHOLD,
+    chunksize: int = 100_000,
+    val: float = 0.0,
+    seed: int = DEFAULTS["seed"],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Train and validation (N, window) WPM windows with the (N,) labels of their last rows.
+
+    The CSV is read in chunks; the last ``window - 1`` rows of every group
+    are carried into the next chunk, so windows spanning a chunk boundary
+    are not lost.  The validation rows are chosen before windowing (see
+    `_split_rows`): overlapping windows would otherwise put nearly every
+    validation window's values in the training set too.
+    """
+
+    xs: List[np.ndarray] = []
+    ys: List[np.ndarray] = []
+    gs: List[np.ndarray] = []
+    ss: List[np.ndarray] = []
+    ids: Dict[Any, int] = {}
+    tails: Dict[Any, Tuple[np.ndarray, np.ndarray, int]] = {}  # group -> (wpm, label, rows seen)
+    for chunk in pd.read_csv(csv_path, usecols=lambda c: c in ("wpm", "label", group_col), chunksize=chunksize):
+        if "wpm" not in chunk.columns:
+            raise ValueError("CSV must contain a 'wpm' column")
+        chunk = chunk.dropna(subset=["wpm"])
+        chunk = chunk.assign(label=_labels(chunk, threshold))
+        groups = chunk.groupby(group_col, sort=False) if group_col else [(None, chunk)]
+        for key, rows in groups:
+            prev_w, prev_y, seen = tails.get(key, (np.empty(0, np.float32), np.empty(0, np.float32), 0))
+            group = ids.setdefault(key, len(ids))
+            w = np.concatenate([prev_w, rows["wpm"].to_numpy(np.float32)])
+            y = np.concatenate([prev_y, rows["label"].to_numpy(np.float32)])
+            # Keep the group's stride phase: windows start at row k*stride
+            first = (len(prev_w) - seen) % stride
+            if len(w) >= window:
+                wins = np.lib.stride_tricks.sliding_window_view(w, window)[first::stride]
+                xs.append(wins.copy())
+                ys.append(y[window - 1:][first::stride])
+                gs.append(np.full(len(wins), group))
+                ss.append(seen - len(prev_w) + first + stride * np.arange(len(wins)))
+            keep = max(0, min(window - 1, len(w)))
+            tails[key] = (w[len(w) - keep:], y[len(y) - keep:], seen + len(rows))
+    if not xs:
+        empty_x, empty_y = np.empty((0, window), np.float32), np.empty(0, np.float32)
+        return empty_x, empty_y, empty_x, empty_y
+    x, y = np.concatenate(xs), np.concatenate(ys)
+    lengths = np.array([tails[key][2] for key in ids])
+    train, held = _split_rows(np.concatenate(gs), np.concatenate(ss), lengths, window, val, seed)
+    return x[train], y[train], x[held], y[held]
+
+
+def _set_threads(threads: int) -> None:
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed once any parallel work ran
+
+
+def train_windowed(
+    x: np.ndarray,
+    y: np.ndarray,
+    x_val: np.ndarray,
+    y_val: np.ndarray,
+    config: Dict[str, Any],
+    verbose: bool = True,
+) -> Dict[str, Any]:
+    """Train WPMModel on pre-built windows with early stopping on the validation windows.
+
+    Returns the best state dict with its validation loss / accuracy.
+    """
+
+    cfg = {**DEFAULTS, **config}
+    torch.manual_seed(cfg["seed"])
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    X_train = torch.from_numpy(x).to(device).unsqueeze(-1)  # (N, T, 1)
+    Y_train = torch.from_numpy(y).to(device).unsqueeze(-1)  # (N, 1)
+    X_val = torch.from_numpy(x_val).to(device).unsqueeze(-1)
+    Y_val = torch.from_numpy(y_val).to(device).unsqueeze(-1)
+    n_val = len(X_val)
+    if not len(X_train):
+        raise ValueError("No training windows (CSV shorter than the window?)")
+
+    model = WPMModel().to(device)
+    criterion = nn.BCELoss()
+    optimizer = optim.Adam(model.parameters(), lr=cfg["lr"], weight_decay=cfg["weight_decay"])
+    batch = cfg["batch_size"]
+
+    best = {"val_loss": float("inf"), "val_acc": 0.0, "epoch": 0, "state": None}
+    t0 = time.perf_counter()
+    for epoch in range(1, cfg["epochs"] + 1):
+        model.train()
+        # One gather per epoch, then contiguous slices: no per-sample indexing
+        order = torch.randperm(len(X_train), device=device)
+        xb_all, yb_all = X_train[order], Y_train[order]
+        total = 0.0
+        for i in range(0, len(xb_all), batch):
+            optimizer.zero_grad()
+            loss = criterion(model(xb_all[i:i + batch]), yb_all[i:i + batch])
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(xb_all[i:i + batch])
+        train_loss = total / len(xb_all)
+
+        model.eval()
+        with torch.no_grad():
+            X_eval, Y_eval = (X_val, Y_val) if n_val else (X_train, Y_train)
+            pred = model(X_eval)
+            val_loss = criterion(pred, Y_eval).item()
+            val_acc = ((pred > 0.5).float() == Y_eval).float().mean().item()
+        if verbose:
+            print(f"Epoch {epoch:03d}: loss {train_loss:.4f}, val loss {val_loss:.4f}, val acc {val_acc:.4f}")
+        if val_loss < best["val_loss"]:
+            state = {k: v.detach().cpu().clone() for k, v in model.state_dict().items()}
+            best = {"val_loss": val_loss, "val_acc": val_acc, "epoch": epoch, "state": state}
+        elif epoch - best["epoch"] >= cfg["patience"]:
+            break
+
+    return {
+        "config": {k: cfg[k] for k in SWEEP_KEYS},
+        "val_loss": round(best["val_loss"], 5),
+        "val_acc": round(best["val_acc"], 4),
+        "best_epoch": best["epoch"],
+        "epochs_run": epoch,
+        "train_windows": len(X_train),
+        "val_windows": n_val,
+        "seconds": round(time.perf_counter() - t0, 2),
+        "state": best["state"],
+    }
+
+
+def _sweep_one(job: Tuple[Dict[str, Any], Dict[str, Any]]) -> Dict[str, Any]:
+    """Run one sweep configuration (in a worker process)."""
+
+    config, data = job
+    windows = load_windows(
+        data["csv"],
+        config["window"],
+        config["stride"],
+        group_col=data["group_col"],
+        threshold=data["threshold"],
+        chunksize=data["chunksize"],
+        val=config["val"],
+        seed=config["seed"],
+    )
+    return train_windowed(*windows, config, verbose=False)
+
+
+def _parse_grid(specs: List[str]) -> List[Dict[str, Any]]:
+    grid: Dict[str, List[Any]] = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in SWEEP_KEYS or not values:
+            raise ValueError(f"Bad sweep setting {spec!r}: expected one of {', '.join(SWEEP_KEYS)} as name=v1,v2")
+        cast = type(DEFAULTS[name])
+        grid[name] = [cast(v) for v in values.split(",")]
+    names = list(grid)
+    return [dict(zip(names, combo)) for combo in itertools.product(*grid.values())]
+
+
+def sweep(args: argparse.Namespace, base: Dict[str, Any]) -> Dict[str, Any]:
+    configs = [{**base, **c} for c in _parse_grid(args.sweep)]
+    data = {"csv": args.csv, "group_col": args.group_col, "threshold": args.threshold, "chunksize": args.chunksize}
+    jobs = args.jobs or max(1, (os.cpu_count() or 1) // args.threads)
+
+    t0 = time.perf_counter()
+    if jobs == 1:
+        _set_threads(args.threads)
+        results = [_sweep_one((c, data)) for c in configs]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, len(configs)),
+            # spawn: each worker starts its own torch thread pools
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_set_threads,
+            initargs=(args.threads,),
+        ) as pool:
+            results = list(pool.map(_sweep_one, [(c, data) for c in configs]))
+
+    best = min(results, key=lambda r: r["val_loss"])
+    return {
+        "jobs": jobs,
+        "threads_per_job": args.threads,
+        "seconds": round(time.perf_counter() - t0, 2),
+        "best": {k: v for k, v in best.items() if k != "state"},
+        "results": [{k: v for k, v in r.items() if k != "state"} for r in results],
+        "state": best["state"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the rapid-talking (WPM) classifier")
+    parser.add_argument("--csv", type=Path, default=CSV_PATH)
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    parser.add_argument("--threshold", type=float, default=WPM_THRESHOLD, help="WPM above which unlabelled rows are rapid")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--windowed", action="store_true", help="Sliding-window training with early stopping")
+    mode.add_argument("--sweep", nargs="+", metavar="NAME=V1,V2", help="Grid of windowed configurations to train in parallel")
+    parser.add_argument("--group-col", help="Column whose rows form one ordered stream (default: the whole file)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="CSV rows read at a time")
+    for name in ("lr", "batch_size", "window", "stride", "weight_decay", "epochs", "patience", "val", "seed"):
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(DEFAULTS[name]), default=DEFAULTS[name])
+    parser.add_argument("--jobs", type=int, default=0, help="Sweep processes (default: cores / --threads)")
+    parser.add_argument("--threads", type=int, default=1, help="Torch threads per sweep process")
+    args = parser.parse_args()
+
+    if not args.csv.exists():
+        raise FileNotFoundError(f"Training CSV not found: {args.csv}")
+
+    base = {name: getattr(args, name) for name in DEFAULTS}
+    if args.sweep:
+        report = sweep(args, base)
+        state = report.pop("state")
+        print(json.dumps(report, indent=2))
+    elif args.windowed:
+        windows = load_windows(
+            args.csv,
+            args.window,
+            args.stride,
+            group_col=args.group_col,
+            threshold=args.threshold,
+            chunksize=args.chunksize,
+            val=args.val,
+            seed=args.seed,
+        )
+        result = train_windowed(*windows, base)
+        state = result.pop("state")
+        print(json.dumps(result))
+    else:
+        state = train_per_utterance(args.csv, args.threshold)
 
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    torch.save(model.state_dict(), OUT_PATH)
-    print("Model saved to", OUT_PATH)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    torch.save(state, args.out)
+    print("Model saved to", args.out)
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
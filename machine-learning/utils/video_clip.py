@@ -0,0 +1,150 @@
+"""Encoded video clips as frame sequences, decoded with OpenCV.
+
+Instead of one JPEG per frame, a frame-based behaviour payload may carry a
+short clip (webm, mp4, ...):
+
+    {"video": <bytes | base64 data-URL | file path>, "fps": 10}
+
+In a frame container the clip is one blob (``{"video": {"$frame": 0}}``,
+the Node controller stores ``data:video/...`` URLs that way).  `VideoClip`
+decodes it with ``cv2.VideoCapture`` as a stream and yields RGB uint8
+arrays sampled at ``fps`` (default ``ML_VIDEO_FPS``, 10 per second), at
+most ``ML_VIDEO_MAX_FRAMES`` (300) of them.  The analyzers crop these
+arrays directly (`image_batch.DecodedFrame.from_array`), no JPEG or PIL
+decode in between.
+
+Frames are decoded while the clip is iterated, one at a time; frames
+between two samples are only grabbed (decoded, not converted or copied).
+Sampling follows each frame's timestamp, since MediaRecorder webm files
+often carry no usable frame rate or frame count; where timestamps do not
+advance the container's frame rate (or 30 fps) is assumed.  Bytes are
+read through OpenCV's stream reader (OpenCV 4.10+), with older versions
+through a temporary file.
+
+Frame selection (ML_FRAME_SELECT) does not apply to clips: sampling at a
+fixed rate already takes its place.  OpenCV is imported when a clip is
+first decoded, not with this module.  File paths are only opened with
+``allow_path=True`` (CLI and batch callers); the worker serving HTTP
+requests leaves it off so clients cannot make it read server files.
+This module must not import torch.
+"""
+
+import base64
+import contextlib
+import io
+import os
+import tempfile
+from typing import Any, Callable, Iterator, Tuple
+
+import numpy as np
+
+__all__ = ["VIDEO_FPS", "VIDEO_MAX_FRAMES", "VideoClip", "is_video_payload"]
+
+VIDEO_FPS = float(os.environ.get("ML_VIDEO_FPS", "10"))
+VIDEO_MAX_FRAMES = int(os.environ.get("ML_VIDEO_MAX_FRAMES", "300"))
+
+# Frame rate assumed when a clip has neither timestamps nor a usable rate
+_DEFAULT_SOURCE_FPS = 30.0
+
+
+def is_video_payload(data: Any) -> bool:
+    """True for a ``{"video": ...}`` behaviour payload."""
+
+    return isinstance(data, dict) and "video" in data
+
+
+def _clip_bytes(source: str) -> bytes | None:
+    """Bytes of a ``data:video/...;base64,`` URL, None for a file path."""
+
+    if not source.startswith("data:"):
+        return None
+    # Codec parameters may contain commas (``codecs=vp8,opus``)
+    _, sep, b64 = source.partition(";base64,")
+    if not sep:
+        raise ValueError("Video data-URL must be base64 encoded")
+    return base64.b64decode(b64)
+
+
+def _open(source: Any, allow_path: bool) -> Tuple[Any, Callable[[], None]]:
+    """An opened ``cv2.VideoCapture`` for `source` and the cleanup to run after releasing it."""
+
+    import cv2
+
+    data = _clip_bytes(source) if isinstance(source, str) else bytes(source)
+    if data is None:
+        if not allow_path:
+            raise ValueError("Video must be a data:video/ URL")
+        if not os.path.isfile(source):
+            raise ValueError(f"Video file not found: {source}")
+        return cv2.VideoCapture(source), lambda: None
+
+    with contextlib.suppress(TypeError, cv2.error):
+        # OpenCV does not keep the reader alive, the cleanup closure does
+        stream = io.BytesIO(data)
+        cap = cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])
+        if cap.isOpened():
+            return cap, stream.close
+
+    # No stream reader in this OpenCV build
+    fd, path = tempfile.mkstemp(suffix=".video", prefix="ml_clip_")
+    with os.fdopen(fd, "wb") as fp:
+        fp.write(data)
+    return cv2.VideoCapture(path), lambda: os.unlink(path)
+
+
+class VideoClip:
+    """An encoded clip, decoded lazily into RGB frames sampled at `fps`."""
+
+    def __init__(
+        self,
+        source: Any,
+        fps: float | None = None,
+        max_frames: int | None = None,
+        allow_path: bool = False,
+    ):
+        self.source = source
+        self.allow_path = allow_path
+        self.fps = float(fps or VIDEO_FPS)
+        self.max_frames = int(max_frames or VIDEO_MAX_FRAMES)
+        if self.fps <= 0:
+            raise ValueError("Video sampling rate must be positive")
+
+    @property
+    def capacity(self) -> int:
+        """Most frames iterating can yield (to size buffers before decoding)."""
+
+        return self.max_frames
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        import cv2
+
+        cap, cleanup = _open(self.source, self.allow_path)
+        try:
+            if not cap.isOpened():
+                raise ValueError("Cannot decode video clip")
+            source_fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_ms = 1000 / (source_fps if 1 <= source_fps <= 240 else _DEFAULT_SOURCE_FPS)
+            step_ms = 1000 / self.fps
+            last_ms = next_ms = None
+            sampled = 0
+            while sampled < self.max_frames and cap.grab():
+                t = cap.get(cv2.CAP_PROP_POS_MSEC)
+                if last_ms is not None and t <= last_ms:
+                    t = last_ms + frame_ms  # no usable timestamps
+                last_ms = t
+                # Half a source frame of slack for rounded timestamps
+                if next_ms is not None and t < next_ms - frame_ms / 2:
+                    continue
+                ok, bgr = cap.retrieve()
+                if not ok:
+                    break
+                # Next sample time after t, on the grid started by the first frame
+                if next_ms is None:
+                    next_ms = t + step_ms
+                else:
+                    next_ms += step_ms * max(1, 1 + (t - next_ms) // step_ms)
+                sampled += 1
+                yield cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        finally:
+            cap.release()
+            cleanup()
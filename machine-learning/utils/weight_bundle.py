@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Pack every model's weights into one memory-mapped bundle.
+
+Usage
+-----
+python utils/weight_bundle.py [--out models/weights.safetensors] [--require-all]
+python utils/weight_bundle.py --verify [--out ...]
+
+Instead of one ``torch.load`` (unpickle + copy) per ``.pth``, model_loader
+memory-maps a single file and builds the tensors on its pages: workers on
+the same host share those pages through the page cache, and start-up only
+reads what the models touch.  The file uses the safetensors layout (u64 LE
+header length, JSON header, raw little-endian tensor data), so safetensors
+tooling can read it, without depending on the package:
+
+    header = {
+        "__metadata__": {"format": "ml-weights", "version": "1", "manifest": "<JSON>"},
+        "eye_gaze/lstm.weight_ih_l0": {"dtype": "F32", "shape": [...], "data_offsets": [a, b]},
+        ...
+    }
+
+The manifest records per behaviour the source ``.pth`` (size, mtime and
+SHA-256), and per tensor its shape, dtype and SHA-256; behaviours without a
+``.pth`` are listed under ``missing``.  Loading a behaviour checks its
+header entries against the manifest and its tensor checksums
+(``ML_BUNDLE_VERIFY=0`` skips the checksums) and raises `WeightBundleError`
+on any mismatch; model_loader also checks the shapes against
+models/architectures.py.  Re-run after retraining: model_loader falls back to the ``.pth`` of a behaviour that no
+longer matches the manifest (see `WeightBundle.is_stale`).
+
+Building refuses a ``.pth`` whose keys or shapes do not match its
+architecture, writes the bundle atomically (running workers keep their
+mapping of the old file) and verifies it by loading every behaviour back.
+Prints a JSON report.  Reading the header and manifest does not import torch.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterable, List
+
+__all__ = [
+    "BUNDLE_VERSION",
+    "VERIFY",
+    "WeightBundle",
+    "WeightBundleError",
+    "build",
+    "file_sha256",
+    "write_bundle",
+]
+
+BUNDLE_VERSION = 1
+VERIFY = os.environ.get("ML_BUNDLE_VERIFY", "1") != "0"
+
+_FORMAT = "ml-weights"
+# Header padded so tensor data starts 8-byte aligned; tensors are laid out
+# widest dtype first, so every tensor stays aligned to its item size.
+_ALIGN = 8
+
+# safetensors dtype name -> (torch dtype attribute, item size)
+_DTYPES = {
+    "F64": ("float64", 8),
+    "I64": ("int64", 8),
+    "F32": ("float32", 4),
+    "I32": ("int32", 4),
+    "F16": ("float16", 2),
+    "BF16": ("bfloat16", 2),
+    "I16": ("int16", 2),
+    "I8": ("int8", 1),
+    "U8": ("uint8", 1),
+    "BOOL": ("bool", 1),
+}
+
+
+class WeightBundleError(RuntimeError):
+    """The bundle is unreadable or does not match its manifest / the architectures."""
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file, read in 1 MiB blocks (shared by the torch-free tools)."""
+
+    h = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _dtype_name(tensor: Any) -> str:
+    name = str(tensor.dtype).rpartition(".")[2]
+    for key, (torch_name, _) in _DTYPES.items():
+        if torch_name == name:
+            return key
+    raise WeightBundleError(f"Unsupported tensor dtype {tensor.dtype}")
+
+
+def write_bundle(path: str, states: Dict[str, Dict[str, Any]], manifest: Dict[str, Any]) -> None:
+    """Write ``{behavior: state_dict}`` to `path`; `manifest` gains the tensor entries."""
+
+    import torch
+
+    tensors = []
+    for behavior, state in states.items():
+        entries = manifest["models"][behavior]["tensors"] = {}
+        for key, value in state.items():
+            value = value.detach().cpu().contiguous()
+            # Byte view of the tensor (bfloat16 has no NumPy dtype)
+            data = value.reshape(-1).view(torch.uint8).numpy().tobytes()
+            dtype = _dtype_name(value)
+            entries[key] = {"shape": list(value.shape), "dtype": dtype, "sha256": hashlib.sha256(data).hexdigest()}
+            tensors.append((f"{behavior}/{key}", dtype, list(value.shape), data))
+    tensors.sort(key=lambda t: -_DTYPES[t[1]][1])
+
+    header: Dict[str, Any] = {
+        "__metadata__": {"format": _FORMAT, "version": str(BUNDLE_VERSION), "manifest": json.dumps(manifest)}
+    }
+    offset = 0
+    for name, dtype, shape, data in tensors:
+        header[name] = {"dtype": dtype, "shape": shape, "data_offsets": [offset, offset + len(data)]}
+        offset += len(data)
+    raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    raw += b" " * (-(8 + len(raw)) % _ALIGN)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fp:
+        fp.write(struct.pack("<Q", len(raw)))
+        fp.write(raw)
+        for *_, data in tensors:
+            fp.write(data)
+    os.replace(tmp, path)  # mapped old files stay valid for running workers
+
+
+class WeightBundle:
+    """A memory-mapped bundle: header and manifest parsed, tensors built on demand."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            try:
+                (header_len,) = struct.unpack("<Q", fp.read(8))
+                if header_len > size - 8:
+                    raise ValueError("header length exceeds the file")
+                self.header = json.loads(fp.read(header_len))
+                meta = self.header.pop("__metadata__")
+                manifest = json.loads(meta["manifest"])
+            except (struct.error, ValueError, KeyError, TypeError) as exc:
+                raise WeightBundleError(f"{path}: not a weight bundle ({exc})") from exc
+            if meta.get("format") != _FORMAT or meta.get("version") != str(BUNDLE_VERSION):
+                raise WeightBundleError(
+                    f"{path}: bundle format {meta.get('format')} v{meta.get('version')}, "
+                    f"expected {_FORMAT} v{BUNDLE_VERSION} (rebuild with utils/weight_bundle.py)"
+                )
+            # Private (copy-on-write) mapping: pages are shared until written
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._data_start = 8 + header_len
+        self._size = size
+        self.manifest = manifest
+
+    def __contains__(self, behavior: str) -> bool:
+        return behavior in self.manifest["models"]
+
+    @property
+    def behaviors(self) -> List[str]:
+        return list(self.manifest["models"])
+
+    def is_stale(self, behavior: str, path: str) -> bool:
+        """Whether the ``.pth`` at `path` is not the one `behavior` was packed from.
+
+        Size and mtime decide when both match the manifest (no file read);
+        after a checkout the mtime differs and the SHA-256 decides instead.
+        """
+
+        entry = self.manifest["models"][behavior]
+        st = os.stat(path)
+        if st.st_size != entry.get("source_size"):
+            return True
+        if st.st_mtime_ns == entry.get("source_mtime_ns"):
+            return False
+        return file_sha256(path) != entry.get("source_sha256")
+
+    def _entries(self, behavior: str) -> Dict[str, Dict[str, Any]]:
+        expected = self.manifest["models"][behavior]["tensors"]
+        prefix = f"{behavior}/"
+        found = {name[len(prefix):]: entry for name, entry in self.header.items() if name.startswith(prefix)}
+        if found.keys() != expected.keys():
+            missing = sorted(expected.keys() - found.keys())[:5]
+            extra = sorted(found.keys() - expected.keys())[:5]
+            raise WeightBundleError(f"{self.path}: {behavior} tensors differ from the manifest ({missing} / {extra})")
+        for key, entry in found.items():
+            want = expected[key]
+            if entry["shape"] != want["shape"] or entry["dtype"] != want["dtype"]:
+                raise WeightBundleError(
+                    f"{self.path}: {behavior}/{key} is {entry['dtype']}{entry['shape']}, "
+                    f"manifest says {want['dtype']}{want['shape']}"
+                )
+            start, end = entry["data_offsets"]
+            count = 1
+            for dim in entry["shape"]:
+                count *= dim
+            if not 0 <= start <= end <= self._size - self._data_start or end - start != count * _DTYPES[entry["dtype"]][1]:
+                raise WeightBundleError(f"{self.path}: {behavior}/{key} has invalid data offsets")
+        return found
+
+    def state_dict(self, behavior: str, device: Any = None, verify: bool | None = None) -> Dict[str, Any]:
+        """Tensors of `behavior` on the mapped pages (copied only for a non-CPU `device`).
+
+        Raises `WeightBundleError` if the header disagrees with the manifest
+        or (with `verify`, default ``ML_BUNDLE_VERIFY``) a checksum differs.
+        """
+
+        import torch
+
+        if behavior not in self:
+            raise KeyError(f"{behavior} is not in {self.path}")
+        verify = VERIFY if verify is None else verify
+        checksums = self.manifest["models"][behavior]["tensors"]
+        state = {}
+        for key, entry in self._entries(behavior).items():
+            start, end = (self._data_start + o for o in entry["data_offsets"])
+            if verify and hashlib.sha256(memoryview(self._mmap)[start:end]).hexdigest() != checksums[key]["sha256"]:
+                raise WeightBundleError(f"{self.path}: checksum mismatch for {behavior}/{key}")
+            dtype = getattr(torch, _DTYPES[entry["dtype"]][0])
+            if end == start:
+                tensor = torch.empty(entry["shape"], dtype=dtype)
+            else:
+                count = (end - start) // _DTYPES[entry["dtype"]][1]
+                tensor = torch.frombuffer(self._mmap, dtype=dtype, count=count, offset=start).view(entry["shape"])
+            state[key] = tensor if device is None or torch.device(device).type == "cpu" else tensor.to(device)
+        return state
+
+
+# ---------------------------------------------------------------------------
+# Build step
+# ---------------------------------------------------------------------------
+
+
+def build(path: str, behaviors: Iterable[str], require_all: bool = False) -> Dict[str, Any]:
+    """Pack the ``.pth`` of `behaviors` into a bundle at `path`; returns the manifest."""
+
+    import torch
+
+    from model_loader import MODEL_FILES, check_architecture, project_root
+
+    states: Dict[str, Dict[str, Any]] = {}
+    manifest: Dict[str, Any] = {
+        "version": BUNDLE_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "models": {},
+        "missing": [],
+    }
+    for behavior in behaviors:
+        rel = MODEL_FILES[behavior]
+        pth = os.path.join(project_root, rel)
+        if not os.path.exists(pth):
+            if require_all:
+                raise FileNotFoundError(f"{pth} not found: refusing to bundle random weights")
+            manifest["missing"].append(behavior)
+            continue
+        state = torch.load(pth, map_location="cpu", weights_only=True)
+        check_architecture(behavior, state)
+        states[behavior] = state
+        st = os.stat(pth)
+        manifest["models"][behavior] = {
+            "source": rel,
+            "source_size": st.st_size,
+            "source_mtime_ns": st.st_mtime_ns,
+            "source_sha256": file_sha256(pth),
+        }
+    write_bundle(path, states, manifest)
+    return manifest
+
+
+def main() -> None:
+    from model_loader import MODEL_FILES, WEIGHT_BUNDLE, check_architecture
+
+    parser = argparse.ArgumentParser(description="Pack model weights into one memory-mapped bundle")
+    parser.add_argument("--out", default=WEIGHT_BUNDLE, help="Bundle path (default: $ML_WEIGHT_BUNDLE)")
+    parser.add_argument("--behavior", nargs="+", default=list(MODEL_FILES), choices=list(MODEL_FILES))
+    parser.add_argument("--require-all", action="store_true", help="Fail if any behaviour has no .pth")
+    parser.add_argument("--verify", action="store_true", help="Only check an existing bundle")
+    args = parser.parse_args()
+
+    try:
+        if not args.verify:
+            build(args.out, args.behavior, args.require_all)
+        bundle = WeightBundle(args.out)
+        report = {"path": args.out, "size_bytes": os.path.getsize(args.out), "models": {}}
+        for behavior in bundle.behaviors:
+            t0 = time.perf_counter()
+            state = bundle.state_dict(behavior, verify=True)
+            check_architecture(behavior, state)
+            report["models"][behavior] = {
+                "tensors": len(state),
+                "parameters": sum(t.numel() for t in state.values()),
+                "verify_ms": round((time.perf_counter() - t0) * 1000, 1),
+            }
+        report["missing"] = bundle.manifest["missing"]
+    except (WeightBundleError, FileNotFoundError) as exc:
+        sys.stdout.write(json.dumps({"ok": False, "error": str(exc)}, indent=2))
+        sys.exit(1)
+    sys.stdout.write(json.dumps({"ok": True, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import { spawn } from "child_process";
+import readline from "readline";
+import path from "path";
+import { fileURLToPath } from "url";
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+// ---------------------------------------------------------------------------
+// Pool of persistent `ml_analyzer.py --serve` workers
+// ---------------------------------------------------------------------------
+//
+// Each worker loads the models once and then answers JSON-lines requests, so
+// a request no longer pays for a Python start + torch/mediapipe import.
+// Workers handle one request at a time; extra requests wait in a FIFO queue.
+// Streaming sessions keep LSTM state inside one worker, so their requests are
+// pinned to that worker (`workerFor(sessionId)`) instead of the next free one.
+
+const WORKING_DIR = path.join(__dirname, "../../machine-learning");
+const WORKER_SCRIPT = path.join(WORKING_DIR, "utils/ml_analyzer.py");
+// Torch-free worker for rapid_talking / landmark sit_stand (numpy_analyzer.py)
+const NUMPY_WORKER_SCRIPT = path.join(WORKING_DIR, "utils/numpy_analyzer.py");
+
+const POOL_SIZE = parseInt(process.env.ML_WORKERS || "2", 10);
+const NUMPY_POOL_SIZE = parseInt(process.env.ML_NUMPY_WORKERS || "1", 10);
+const DEFAULT_TIMEOUT_MS = 60 * 1000;
+// Restart delay doubles with every restart until the worker reports ready
+// again, so a worker that cannot start (e.g. a corrupt weight bundle) is
+// not respawned every second forever.
+const RESTART_DELAY_MS = 1000;
+const MAX_RESTART_DELAY_MS = 60 * 1000;
+
+export class MLTimeoutError extends Error {
+  constructor(ms) {
+    super(`ML request timed out after ${ms / 1000} seconds`);
+    this.name = "MLTimeoutError";
+  }
+}
+
+class MLWorker {
+  constructor(pool, index) {
+    this.pool = pool;
+    this.index = index;
+    this.process = null;
+    this.ready = false;
+    this.current = null; // in-flight job
+    this.restartDelay = RESTART_DELAY_MS;
+    this.start();
+  }
+
+  start() {
+    this.ready = false;
+    const proc = spawn("python", [this.pool.script, "--serve"], {
+      cwd: WORKING_DIR,
+      stdio: ["pipe", "pipe", "pipe"],
+      // Lets each worker size its torch thread pools to its share of the
+      // cores (machine-learning/utils/torch_threads.py)
+      env: { ...process.env, ML_WORKERS: String(this.pool.size) },
+    });
+    this.process = proc;
+
+    readline.createInterface({ input: proc.stdout }).on("line", (line) => {
+      this.onLine(line);
+    });
+
+    proc.stderr.on("data", (data) => {
+      console.error(`ML worker ${this.index} stderr:`, data.toString());
+    });
+
+    // A failed spawn (e.g. ENOENT for python) emits `error` without `exit`
+    proc.on("error", (err) => {
+      if (this.process !== proc) return;
+      console.error(`ML worker ${this.index} failed to start:`, err);
+      proc.kill("SIGKILL");
+      this.stopped(err.message);
+    });
+
+    // EPIPE when the worker dies mid-write: without a handler it would
+    // crash the server.  Fail the job and let `exit` restart the worker.
+    proc.stdin.on("error", (err) => {
+      if (this.process !== proc) return;
+      console.error(`ML worker ${this.index} stdin error:`, err.message);
+      this.ready = false;
+      if (this.current) {
+        this.current.reject(new Error("ML worker exited during request"));
+        this.current = null;
+      }
+      proc.kill("SIGKILL");
+    });
+
+    proc.on("exit", (code, signal) => {
+      if (this.process !== proc) return;
+      console.error(
+        `ML worker ${this.index} exited (code: ${code}, signal: ${signal})`
+      );
+      this.stopped();
+    });
+  }
+
+  // The process is gone (or never started): fail its job and restart it.
+  // `startError` also fails the queued jobs pinned to this worker, which
+  // would otherwise wait out their timeout.
+  stopped(startError) {
+    this.process = null;
+    this.ready = false;
+    if (this.current) {
+      this.current.reject(new Error("ML worker exited during request"));
+      this.current = null;
+    }
+    if (startError) this.pool.rejectPinned(this.index, startError);
+    if (!this.pool.closed) {
+      const delay = this.restartDelay;
+      this.restartDelay = Math.min(delay * 2, MAX_RESTART_DELAY_MS);
+      setTimeout(() => this.start(), delay);
+    }
+  }
+
+  onLine(line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (err) {
+      console.error(`ML worker ${this.index} sent invalid JSON:`, line);
+      return;
+    }
+
+    if (message.ready) {
+      this.ready = true;
+      this.restartDelay = RESTART_DELAY_MS;
+      this.pool.dispatch();
+      return;
+    }
+
+    const job = this.current;
+    if (!job || message.id !== job.id) return;
+    if (message.partial !== undefined) {
+      // Streamed batch: one entry's result, the final response follows
+      if (job.onPartial) job.onPartial(message.partial);
+      return;
+    }
+    this.current = null;
+    if (message.error) {
+      job.reject(new Error(message.error));
+    } else {
+      job.resolve(message.result);
+    }
+    this.pool.dispatch();
+  }
+
+  send(job) {
+    this.current = job;
+    this.process.stdin.write(JSON.stringify({ id: job.id, ...job.payload }) + "\n");
+  }
+
+  // Called when the in-flight job times out: the worker is stuck, restart it.
+  kill() {
+    this.ready = false;
+    if (this.process) this.process.kill("SIGKILL");
+  }
+}
+
+class MLWorkerPool {
+  constructor(size, script = WORKER_SCRIPT) {
+    this.size = size;
+    this.script = script;
+    this.workers = [];
+    this.queue = [];
+    this.nextId = 1;
+    this.closed = false;
+  }
+
+  get started() {
+    return this.workers.length > 0;
+  }
+
+  ensureStarted() {
+    if (this.workers.length) return;
+    for (let i = 0; i < this.size; i += 1) {
+      this.workers.push(new MLWorker(this, i));
+    }
+  }
+
+  // Index of the worker that owns streaming session `sessionId`.
+  workerFor(sessionId) {
+    let hash = 0;
+    for (let i = 0; i < sessionId.length; i += 1) {
+      hash = (hash * 31 + sessionId.charCodeAt(i)) >>> 0;
+    }
+    return hash % this.size;
+  }
+
+  /**
+   * Send a request to the next free worker (or to `workerIndex` if given).
+   * payload: { behavior, data_file } | { behavior, data } | { batch_file }
+   *          | { op: "stream_open" | "stream_push" | "stream_close", ... }
+   * With `{ batch_file, stream: true }`, `onPartial` is called with every
+   * `{ index, result }` as the worker produces it; the promise resolves with
+   * the summary.
+   */
+  request(payload, timeoutMs = DEFAULT_TIMEOUT_MS, { workerIndex, onPartial } = {}) {
+    this.ensureStarted();
+
+    return new Promise((resolve, reject) => {
+      const job = { id: String(this.nextId++), payload, workerIndex, onPartial };
+
+      const settle = (fn) => (value) => {
+        clearTimeout(job.timer);
+        fn(value);
+      };
+      job.resolve = settle(resolve);
+      job.reject = settle(reject);
+
+      job.timer = setTimeout(() => {
+        const queued = this.queue.indexOf(job);
+        if (queued !== -1) {
+          this.queue.splice(queued, 1);
+        } else {
+          const worker = this.workers.find((w) => w.current === job);
+          if (worker) {
+            worker.current = null;
+            worker.kill();
+          }
+        }
+        reject(new MLTimeoutError(timeoutMs));
+      }, timeoutMs);
+
+      this.queue.push(job);
+      this.dispatch();
+    });
+  }
+
+  dispatch() {
+    for (const worker of this.workers) {
+      if (!this.queue.length) return;
+      if (!worker.ready || !worker.process || worker.current) continue;
+      const next = this.queue.findIndex(
+        (job) => job.workerIndex === undefined || job.workerIndex === worker.index
+      );
+      if (next !== -1) worker.send(this.queue.splice(next, 1)[0]);
+    }
+  }
+
+  // Fail the queued jobs that can only run on worker `index`.
+  rejectPinned(index, reason) {
+    this.queue = this.queue.filter((job) => {
+      if (job.workerIndex !== index) return true;
+      job.reject(new Error(`ML worker ${index} failed to start: ${reason}`));
+      return false;
+    });
+  }
+
+  close() {
+    this.closed = true;
+    for (const worker of this.workers) worker.kill();
+  }
+}
+
+const mlWorkerPool = new MLWorkerPool(POOL_SIZE);
+
+// Starts in milliseconds and never loads torch; any request it cannot answer
+// with the NumPy models is still handled (by importing ml_analyzer).
+export const numpyWorkerPool =
+  NUMPY_POOL_SIZE > 0 ? new MLWorkerPool(NUMPY_POOL_SIZE, NUMPY_WORKER_SCRIPT) : null;
+
+export default mlWorkerPool;
@@ -2,11 +2,23 @@ import { spawn } from "child_process";
 import path from "path";
 import { fileURLToPath } from "url";
 import fs from "fs";
+import crypto from "crypto";
 import os from "os";
+import mlWorkerPool, {
+  MLTimeoutError,
+  numpyWorkerPool,
+} from "../config/mlWorkerPool.js";
+import { writeMlPayload } from "../utils/frameContainer.js";
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
+// Batches can hold hundreds of windows, allow them more time than /analyze
+const BATCH_TIMEOUT_MS = 5 * 60 * 1000;
+
+// A cold health check imports torch and loads every model
+const HEALTH_CHECK_TIMEOUT_MS = 30 * 1000;
+
 // ML Model Test Controller
 export const testModels = async (req, res) => {
   try {
@@ -14,7 +26,7 @@ export const testModels = async (req, res) => {
 
     const pythonScript = path.join(
       __dirname,
-      "../../machine-learning/utils/health_check.py"
+      "../../machine-learning/utils/model_status.py"
     );
     const workingDir = path.join(__dirname, "../../machine-learning");
 
@@ -30,20 +42,27 @@ export const testModels = async (req, res) => {
       });
     }
 
-    const pythonProcess = spawn("python", [pythonScript], {
-      cwd: workingDir,
-      stdio: ["pipe", "pipe", "pipe"],
-    });
+    // Loads and warms every model; the result is cached in a status file,
+    // so only the first check after the weights change imports torch.
+    const pythonProcess = spawn(
+      "python",
+      [pythonScript, "--warm", "--health"],
+      {
+        cwd: workingDir,
+        stdio: ["pipe", "pipe", "pipe"],
+      }
+    );
 
-    // Short timeout for health check - 10 seconds
     const timeout = setTimeout(() => {
       pythonProcess.kill("SIGTERM");
-      console.error("Health check timed out after 10 seconds");
+      console.error(
+        `Health check timed out after ${HEALTH_CHECK_TIMEOUT_MS / 1000} seconds`
+      );
       res.status(408).json({
         success: false,
         message: "Model test timed out",
       });
-    }, 10 * 1000); // 10 seconds
+    }, HEALTH_CHECK_TIMEOUT_MS);
 
     let result = "";
     let error = "";
@@ -128,6 +147,17 @@ export const testModels = async (req, res) => {
   }
 };
 
+// WPM values and precomputed pose landmarks run on the torch-free workers
+const poolFor = (behaviorType, payload) => {
+  if (!numpyWorkerPool) return mlWorkerPool;
+  if (behaviorType === "rapid_talking") return numpyWorkerPool;
+  const first = Array.isArray(payload) ? payload[0] : undefined;
+  if (behaviorType === "sit_stand" && Array.isArray(first)) {
+    return numpyWorkerPool;
+  }
+  return mlWorkerPool;
+};
+
 // ML Analysis Controller
 export const analyzeBehavior = async (req, res) => {
   try {
@@ -139,6 +169,8 @@ export const analyzeBehavior = async (req, res) => {
     const frame = req.body.frame || req.body.Frame || null;
     const frame_sequence =
       req.body.frame_sequence || req.body.frameSequence || null;
+    // Or an encoded clip (data:video/webm;base64,...) sampled at `fps`
+    const video = req.body.video || null;
 
     // Validate request body size
     const contentLength = req.headers["content-length"];
@@ -150,17 +182,22 @@ export const analyzeBehavior = async (req, res) => {
       });
     }
 
-    const pythonScript = path.join(
-      __dirname,
-      "../../machine-learning/utils/ml_analyzer.py"
-    );
-    const workingDir = path.join(__dirname, "../../machine-learning");
-
-    if (!behaviorType || (!data && !frame && !frame_sequence)) {
+    if (!behaviorType || (!data && !frame && !frame_sequence && !video)) {
       return res.status(400).json({
         success: false,
         message:
-          "Behavior type and data, frame, or frame_sequence are required",
+          "Behavior type and data, frame, frame_sequence, or video are required",
+      });
+    }
+
+    // Clips must be sent as data: the workers never open server-side paths
+    if (
+      video &&
+      !(typeof video === "string" && video.startsWith("data:video/"))
+    ) {
+      return res.status(400).json({
+        success: false,
+        message: "video must be a data:video/... URL",
       });
     }
 
@@ -171,6 +208,7 @@ export const analyzeBehavior = async (req, res) => {
       "tapping_hands",
       "tapping_feet",
       "rapid_talking",
+      "all", // every frame-based behavior from one frame sequence
     ];
     if (!validTypes.includes(behaviorType)) {
       return res.status(400).json({
@@ -179,8 +217,9 @@ export const analyzeBehavior = async (req, res) => {
       });
     }
 
-    // Use data if present, otherwise use frame or frame_sequence
-    const payload = data || frame || frame_sequence;
+    // Use data if present, otherwise use frame, frame_sequence or video
+    const payload =
+      data || frame || frame_sequence || (video && { video, fps: req.body.fps });
 
     // Validate payload size
     const payloadSize = JSON.stringify(payload).length;
@@ -193,7 +232,7 @@ export const analyzeBehavior = async (req, res) => {
     }
 
     // Create a temporary file to store the data
-    const tempFile = path.join(os.tmpdir(), `ml_data_${Date.now()}.json`);
+    const tempFile = path.join(os.tmpdir(), `ml_data_${crypto.randomUUID()}.bin`);
 
     try {
       // Format data for the specific behavior type
@@ -203,24 +242,27 @@ export const analyzeBehavior = async (req, res) => {
         formattedData = {
           [behaviorType]: frame || frame_sequence,
         };
+      } else if (video) {
+        // The clip becomes one blob in the frame container
+        formattedData = {
+          [behaviorType]: payload,
+        };
       } else if (data) {
         // If we have structured data, format it for the specific behavior type
         formattedData = {
           [behaviorType]: data,
         };
       } else {
-        throw new Error("No data, frame, or frame_sequence provided");
+        throw new Error("No data, frame, frame_sequence, or video provided");
       }
 
-      // Write data to temporary file
-      fs.writeFileSync(tempFile, JSON.stringify(formattedData));
+      // Write data to temporary file (binary frame container unless disabled)
+      writeMlPayload(tempFile, formattedData);
 
       // Debug logging
       console.log("ML Analysis Debug:");
       console.log("- Behavior Type:", behaviorType);
       console.log("- Temp File:", tempFile);
-      console.log("- Python Script:", pythonScript);
-      console.log("- Working Dir:", workingDir);
       console.log("- Formatted Data Keys:", Object.keys(formattedData));
       console.log(
         "- Payload Size:",
@@ -228,121 +270,55 @@ export const analyzeBehavior = async (req, res) => {
         "MB"
       );
 
-      // Use command line arguments for behavior type and file path
-      const args = [
-        pythonScript,
-        "--data",
-        tempFile,
-        "--behavior",
-        behaviorType,
-      ];
-      console.log("- Python Args:", args);
-
-      const pythonProcess = spawn("python", args, {
-        cwd: workingDir,
-        stdio: ["pipe", "pipe", "pipe"],
-      });
-
-      // Set a timeout for the Python process (60 seconds)
-      const timeout = setTimeout(() => {
-        pythonProcess.kill("SIGTERM");
-        console.error("Python process timed out after 60 seconds");
-        res.status(408).json({
-          success: false,
-          message:
-            "ML analysis timed out. Please try with smaller data or contact support.",
+      // Hand the temp file to a persistent worker (models already loaded)
+      let analysisResult;
+      try {
+        analysisResult = await poolFor(behaviorType, payload).request({
+          behavior: behaviorType,
+          data_file: tempFile,
+          // Optional: track landmarks across the ordered frame sequence
+          tracking: req.body.tracking,
+          // Optional: per-stage timings in the result
+          timings: req.body.timings,
+          // Optional: drop near-duplicate frames / cap the sequence length
+          frame_select: req.body.frame_select,
+          // Optional: downscaled landmark search + previous-frame region reuse
+          landmark_roi: req.body.landmark_roi,
         });
-      }, 60 * 1000); // 60 seconds
-
-      let result = "";
-      let error = "";
-
-      pythonProcess.stdout.on("data", (data) => {
-        result += data.toString();
-      });
-
-      pythonProcess.stderr.on("data", (data) => {
-        error += data.toString();
-        // Log full stderr output for debugging
-        console.error("Python script stderr:", data.toString());
-      });
-
-      pythonProcess.on("close", (code) => {
-        // Clear the timeout
-        clearTimeout(timeout);
-
-        // Clean up temporary file
-        try {
-          fs.unlinkSync(tempFile);
-        } catch (cleanupError) {
-          console.error("Failed to cleanup temp file:", cleanupError);
-        }
-
-        // Debug logging
-        console.log(`Python process exited with code: ${code}`);
-        console.log(`Python stdout: "${result}"`);
-        console.log(`Python stderr: "${error}"`);
-
-        if (code !== 0) {
-          console.error("Python script error:", error);
-          return res.status(500).json({
-            success: false,
-            message: "ML analysis failed",
-            error: error,
-          });
-        }
-
-        try {
-          if (!result.trim()) {
-            console.error("Python script returned empty result");
-            return res.status(500).json({
-              success: false,
-              message: "ML analysis returned empty result",
-              error: "No output from Python script",
-            });
-          }
-
-          let analysisResult = JSON.parse(result);
-
-          // Ensure behavior_type key is present for frontend compatibility
-          analysisResult = {
-            behavior_type: behaviorType,
-            ...analysisResult,
-          };
-
-          console.log("Parsed analysis result:", analysisResult);
-          res.json({
-            success: true,
-            analysis: analysisResult,
-          });
-        } catch (parseError) {
-          console.error("JSON parse error:", parseError);
-          console.error("Raw result:", result);
-          res.status(500).json({
+      } catch (workerError) {
+        if (workerError instanceof MLTimeoutError) {
+          console.error("ML worker timed out:", workerError.message);
+          return res.status(408).json({
             success: false,
-            message: "Failed to parse ML results",
-            error: parseError.message,
+            message:
+              "ML analysis timed out. Please try with smaller data or contact support.",
           });
         }
-      });
-
-      pythonProcess.on("error", (err) => {
-        // Clear the timeout
-        clearTimeout(timeout);
-
-        // Clean up temporary file on error
+        console.error("ML worker error:", workerError);
+        return res.status(500).json({
+          success: false,
+          message: "ML analysis failed",
+          error: workerError.message,
+        });
+      } finally {
+        // Clean up temporary file
         try {
           fs.unlinkSync(tempFile);
         } catch (cleanupError) {
           console.error("Failed to cleanup temp file:", cleanupError);
         }
+      }
 
-        console.error("Failed to start Python process:", err);
-        res.status(500).json({
-          success: false,
-          message: "Failed to start ML analysis",
-          error: err.message,
-        });
+      // Ensure behavior_type key is present for frontend compatibility
+      analysisResult = {
+        behavior_type: behaviorType,
+        ...analysisResult,
+      };
+
+      console.log("Parsed analysis result:", analysisResult);
+      res.json({
+        success: true,
+        analysis: analysisResult,
       });
     } catch (fileError) {
       console.error("File operation error:", fileError);
@@ -403,7 +379,10 @@ export const getModelStatus = async (req, res) => {
         const status = JSON.parse(result);
         res.json({
           success: true,
-          models: status,
+          models: status.models,
+          system_ready: status.system_ready,
+          checked_at: status.checked_at,
+          cached: status.cached,
         });
       } catch (parseError) {
         res.status(500).json({
@@ -445,87 +424,67 @@ export const batchAnalysis = async (req, res) => {
     }
 
     // Create a temporary file to store the behaviors data
-    const tempFile = path.join(os.tmpdir(), `batch_data_${Date.now()}.json`);
+    const tempFile = path.join(os.tmpdir(), `batch_data_${crypto.randomUUID()}.bin`);
 
     try {
       // Write behaviors data to temporary file
-      fs.writeFileSync(tempFile, JSON.stringify(behaviors));
-
-      const pythonScript = path.join(
-        __dirname,
-        "../../machine-learning/utils/batch_analyzer.py"
-      );
-
-      // Set the working directory to the machine-learning folder
-      const workingDir = path.join(__dirname, "../../machine-learning");
-
-      const pythonProcess = spawn("python", [pythonScript, tempFile], {
-        cwd: workingDir,
-        stdio: ["pipe", "pipe", "pipe"],
-      });
-
-      let result = "";
-      let error = "";
+      writeMlPayload(tempFile, behaviors);
 
-      pythonProcess.stdout.on("data", (data) => {
-        result += data.toString();
-      });
-
-      pythonProcess.stderr.on("data", (data) => {
-        error += data.toString();
-      });
+      // `stream: true` answers with NDJSON: one { index, result } line per
+      // entry as soon as the worker has it, then the summary line
+      const stream = req.body.stream === true;
+      const writeLine = (line) => {
+        if (!res.headersSent) res.status(200).type("application/x-ndjson");
+        res.write(JSON.stringify(line) + "\n");
+      };
 
-      pythonProcess.on("close", (code) => {
-        // Clean up temporary file
-        try {
-          fs.unlinkSync(tempFile);
-        } catch (cleanupError) {
-          console.error("Failed to cleanup temp file:", cleanupError);
+      let batchResult;
+      try {
+        batchResult = await mlWorkerPool.request(
+          {
+            batch_file: tempFile,
+            frame_select: req.body.frame_select,
+            landmark_roi: req.body.landmark_roi,
+            stream,
+          },
+          BATCH_TIMEOUT_MS,
+          { onPartial: stream ? writeLine : undefined }
+        );
+      } catch (workerError) {
+        console.error("ML worker error:", workerError);
+        if (res.headersSent) {
+          // Partial results are already out: end the stream with the error
+          writeLine({ done: true, success: false, error: workerError.message });
+          return res.end();
         }
-
-        if (code !== 0) {
-          console.error("Python script error:", error);
-          return res.status(500).json({
+        return res
+          .status(workerError instanceof MLTimeoutError ? 408 : 500)
+          .json({
             success: false,
             message: "Batch analysis failed",
-            error: error,
-          });
-        }
-
-        try {
-          const batchResult = JSON.parse(result);
-
-          // `batchResult` looks like { success: bool, results: [...], total_analyzed: n }
-          // For consistency with /api/ml/analyze, flatten it so the client gets
-          // { success, results: [...], total_analyzed }
-          res.json({
-            success: Boolean(batchResult.success),
-            results: batchResult.results || [],
-            total_analyzed: batchResult.total_analyzed || 0,
-          });
-        } catch (parseError) {
-          res.status(500).json({
-            success: false,
-            message: "Failed to parse batch results",
-            error: parseError.message,
+            error: workerError.message,
           });
-        }
-      });
-
-      pythonProcess.on("error", (err) => {
-        // Clean up temporary file on error
+      } finally {
+        // Clean up temporary file
         try {
           fs.unlinkSync(tempFile);
         } catch (cleanupError) {
           console.error("Failed to cleanup temp file:", cleanupError);
         }
+      }
 
-        console.error("Failed to start Python process:", err);
-        res.status(500).json({
-          success: false,
-          message: "Failed to start batch analysis",
-          error: err.message,
-        });
+      if (stream) {
+        writeLine(batchResult);
+        return res.end();
+      }
+
+      // `batchResult` looks like { success: bool, results: [...], total_analyzed: n }
+      // For consistency with /api/ml/analyze, flatten it so the client gets
+      // { success, results: [...], total_analyzed }
+      res.json({
+        success: Boolean(batchResult.success),
+        results: batchResult.results || [],
+        total_analyzed: batchResult.total_analyzed || 0,
       });
     } catch (fileError) {
       console.error("File operation error:", fileError);
@@ -560,75 +519,205 @@ export const evaluateDataset = async (req, res) => {
     // Separate labels; batch_analyzer only needs type/data
     const unlabeled = behaviors.map((b) => ({ type: b.type, data: b.data }));
 
-    const tempFile = path.join(os.tmpdir(), `eval_data_${Date.now()}.json`);
+    const tempFile = path.join(os.tmpdir(), `eval_data_${crypto.randomUUID()}.bin`);
 
-    fs.writeFileSync(tempFile, JSON.stringify(unlabeled));
+    writeMlPayload(tempFile, unlabeled);
 
-    const pythonScript = path.join(
-      __dirname,
-      "../../machine-learning/utils/batch_analyzer.py"
-    );
+    let batchRes;
+    try {
+      batchRes = await mlWorkerPool.request(
+        {
+          batch_file: tempFile,
+          frame_select: req.body.frame_select,
+          landmark_roi: req.body.landmark_roi,
+        },
+        BATCH_TIMEOUT_MS
+      );
+    } catch (workerError) {
+      return res
+        .status(workerError instanceof MLTimeoutError ? 408 : 500)
+        .json({
+          success: false,
+          message: "Evaluation failed",
+          error: workerError.message,
+        });
+    } finally {
+      fs.unlink(tempFile, () => {});
+    }
 
-    const workingDir = path.join(__dirname, "../../machine-learning");
+    const predictions = batchRes.results || [];
 
-    const pythonProcess = spawn("python", [pythonScript, tempFile], {
-      cwd: workingDir,
-      stdio: ["pipe", "pipe", "pipe"],
+    let correct = 0;
+    predictions.forEach((pred, idx) => {
+      const expectedLabel = behaviors[idx].label;
+      if (expectedLabel !== undefined) {
+        const matches = pred.label == expectedLabel;
+        if (matches) correct += 1;
+      }
     });
 
-    let result = "";
-    let error = "";
+    const totalLabeled = behaviors.filter((b) => b.label !== undefined).length;
 
-    pythonProcess.stdout.on("data", (d) => (result += d.toString()));
-    pythonProcess.stderr.on("data", (d) => (error += d.toString()));
+    const accuracy = totalLabeled ? correct / totalLabeled : null;
 
-    pythonProcess.on("close", (code) => {
-      fs.unlink(tempFile, () => {});
+    res.json({
+      success: true,
+      total_samples: behaviors.length,
+      labeled_samples: totalLabeled,
+      correct,
+      accuracy,
+      predictions,
+    });
+  } catch (err) {
+    res
+      .status(500)
+      .json({ success: false, message: "Server error", error: err.message });
+  }
+};
 
-      if (code !== 0) {
-        return res.status(500).json({
-          success: false,
-          message: "Evaluation failed",
-          error,
-        });
-      }
+// ---------------------------------------------------------------------------
+// Streaming sessions: each push only runs the new frames/values, carrying
+// the LSTM state inside the worker that owns the session.
+// ---------------------------------------------------------------------------
+
+const STREAM_BEHAVIORS = [
+  "eye_gaze",
+  "sit_stand",
+  "tapping_hands",
+  "tapping_feet",
+  "rapid_talking",
+];
+
+const streamRequest = (sessionId, payload) =>
+  mlWorkerPool.request(
+    { ...payload, session_id: sessionId },
+    undefined,
+    { workerIndex: mlWorkerPool.workerFor(sessionId) }
+  );
+
+const sendStreamError = (res, error, message) => {
+  console.error(`${message}:`, error);
+  res.status(error instanceof MLTimeoutError ? 408 : 500).json({
+    success: false,
+    message,
+    error: error.message,
+  });
+};
 
-      try {
-        const batchRes = JSON.parse(result);
-        const predictions = batchRes.results || [];
-
-        let correct = 0;
-        predictions.forEach((pred, idx) => {
-          const expectedLabel = behaviors[idx].label;
-          if (expectedLabel !== undefined) {
-            const matches = pred.label == expectedLabel;
-            if (matches) correct += 1;
-          }
-        });
+// Open a streaming session for one behavior
+export const streamOpen = async (req, res) => {
+  const behaviorType = req.body.behaviorType || req.body.behavior_type;
+  if (!STREAM_BEHAVIORS.includes(behaviorType)) {
+    return res.status(400).json({
+      success: false,
+      message: "Invalid behavior type",
+    });
+  }
 
-        const totalLabeled = behaviors.filter(
-          (b) => b.label !== undefined
-        ).length;
+  const sessionId = crypto.randomUUID();
+  try {
+    const result = await streamRequest(sessionId, {
+      op: "stream_open",
+      behavior: behaviorType,
+      tracking: req.body.tracking,
+    });
+    res.json({
+      success: true,
+      session_id: result.session_id,
+      behavior_type: behaviorType,
+      tracking: result.tracking,
+    });
+  } catch (error) {
+    sendStreamError(res, error, "Failed to open stream");
+  }
+};
 
-        const accuracy = totalLabeled ? correct / totalLabeled : null;
+// Push new frames / values into a session and return the updated prediction
+export const streamPush = async (req, res) => {
+  const sessionId = req.body.sessionId || req.body.session_id;
+  const data =
+    req.body.data ?? req.body.frames ?? req.body.frame_sequence ?? null;
+  if (!sessionId || data === null) {
+    return res.status(400).json({
+      success: false,
+      message: "session_id and data (or frames) are required",
+    });
+  }
 
-        res.json({
-          success: true,
-          total_samples: behaviors.length,
-          labeled_samples: totalLabeled,
-          correct,
-          accuracy,
-          predictions,
-        });
-      } catch (e) {
-        res
-          .status(500)
-          .json({ success: false, message: "Parse error", error: e.message });
+  const tempFile = path.join(os.tmpdir(), `ml_stream_${crypto.randomUUID()}.bin`);
+  try {
+    writeMlPayload(tempFile, data);
+    const result = await streamRequest(sessionId, {
+      op: "stream_push",
+      data_file: tempFile,
+    });
+    if (result.error === "unknown_session") {
+      return res.status(404).json({
+        success: false,
+        message: "Stream session not found or expired",
+      });
+    }
+    res.json({ success: true, analysis: result });
+  } catch (error) {
+    sendStreamError(res, error, "Stream push failed");
+  } finally {
+    try {
+      fs.unlinkSync(tempFile);
+    } catch (cleanupError) {
+      if (cleanupError.code !== "ENOENT") {
+        console.error("Failed to cleanup temp file:", cleanupError);
       }
+    }
+  }
+};
+
+// Close a session and free its state
+export const streamClose = async (req, res) => {
+  const sessionId = req.body.sessionId || req.body.session_id;
+  if (!sessionId) {
+    return res.status(400).json({
+      success: false,
+      message: "session_id is required",
     });
-  } catch (err) {
-    res
-      .status(500)
-      .json({ success: false, message: "Server error", error: err.message });
   }
+
+  try {
+    const result = await streamRequest(sessionId, { op: "stream_close" });
+    res.json({ success: true, closed: Boolean(result.closed) });
+  } catch (error) {
+    sendStreamError(res, error, "Failed to close stream");
+  }
+};
+
+// ---------------------------------------------------------------------------
+// Worker counters (requests, per-stage time, frames) for scraping
+// ---------------------------------------------------------------------------
+
+const METRICS_TIMEOUT_MS = 5000;
+
+export const getMetrics = async (req, res) => {
+  const pools = { torch: mlWorkerPool, numpy: numpyWorkerPool };
+  const pending = [];
+  for (const [name, pool] of Object.entries(pools)) {
+    if (!pool) continue;
+    // Reading counters must not spawn the workers
+    if (!pool.started) {
+      pending.push({ pool: name, started: false });
+      continue;
+    }
+    for (let index = 0; index < pool.size; index += 1) {
+      pending.push(
+        pool
+          .request({ op: "metrics" }, METRICS_TIMEOUT_MS, { workerIndex: index })
+          .then((metrics) => ({ pool: name, worker: index, ...metrics }))
+          .catch((error) => ({ pool: name, worker: index, error: error.message }))
+      );
+    }
+  }
+
+  res.json({
+    success: true,
+    timestamp: new Date().toISOString(),
+    workers: await Promise.all(pending),
+  });
 };
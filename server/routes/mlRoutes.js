@@ -6,6 +6,10 @@ import {
   batchAnalysis,
   evaluateDataset,
   testModels,
+  streamOpen,
+  streamPush,
+  streamClose,
+  getMetrics,
 } from "../controllers/mlController.js";
 
 const mlRouter = express.Router();
@@ -50,6 +54,10 @@ mlRouter.post("/analyze", userAuth, mlDataMiddleware, analyzeBehavior);
 mlRouter.get("/status", userAuth, getModelStatus);
 mlRouter.post("/batch", userAuth, mlDataMiddleware, batchAnalysis);
 mlRouter.post("/evaluate", userAuth, mlDataMiddleware, evaluateDataset);
+mlRouter.post("/stream/open", userAuth, mlDataMiddleware, streamOpen);
+mlRouter.post("/stream/push", userAuth, mlDataMiddleware, streamPush);
+mlRouter.post("/stream/close", userAuth, mlDataMiddleware, streamClose);
 mlRouter.get("/test", testModels); // No auth required for testing
+mlRouter.get("/metrics", userAuth, getMetrics); // Worker counters
 
 export default mlRouter;
@@ -0,0 +1,67 @@
+import fs from "fs";
+
+// ---------------------------------------------------------------------------
+// Binary frame container (reader: machine-learning/utils/frame_container.py)
+// ---------------------------------------------------------------------------
+//
+// Layout: "BEAF" | u8 version | 3 reserved bytes | u32 LE metadata length |
+// metadata JSON | (u32 LE length + JPEG bytes) per frame.
+// Every base64 image or video data-URL in the payload becomes a raw blob and
+// is replaced in the metadata by { "$frame": index }.
+
+const MAGIC = Buffer.from("BEAF", "ascii");
+const VERSION = 1;
+
+// MediaRecorder types carry parameters: data:video/webm;codecs=vp8,opus;base64,
+const DATA_URL_PREFIX = /^data:(?:image|video)\/[a-z0-9+.-]+(?:;[^;]*)*?;base64,/i;
+
+const extractFrames = (node, blobs) => {
+  if (typeof node === "string") {
+    const match = DATA_URL_PREFIX.exec(node);
+    if (!match) return node;
+    blobs.push(Buffer.from(node.slice(match[0].length), "base64"));
+    return { $frame: blobs.length - 1 };
+  }
+  if (Array.isArray(node)) return node.map((v) => extractFrames(v, blobs));
+  if (node && typeof node === "object") {
+    const out = {};
+    for (const [key, value] of Object.entries(node)) {
+      out[key] = extractFrames(value, blobs);
+    }
+    return out;
+  }
+  return node;
+};
+
+// Write `payload` to `filePath` as a frame container.
+export const writeFrameContainer = (filePath, payload) => {
+  const blobs = [];
+  const meta = Buffer.from(JSON.stringify(extractFrames(payload, blobs)));
+
+  const header = Buffer.alloc(12);
+  MAGIC.copy(header, 0);
+  header.writeUInt8(VERSION, 4);
+  header.writeUInt32LE(meta.length, 8);
+
+  const parts = [header, meta];
+  for (const blob of blobs) {
+    const length = Buffer.alloc(4);
+    length.writeUInt32LE(blob.length, 0);
+    parts.push(length, blob);
+  }
+
+  fs.writeFileSync(filePath, Buffer.concat(parts));
+  return blobs.length;
+};
+
+// Set ML_BINARY_FRAMES=0 to fall back to the plain JSON temp files.
+export const binaryFramesEnabled = () => process.env.ML_BINARY_FRAMES !== "0";
+
+// Write `payload` either as a frame container or as JSON.
+export const writeMlPayload = (filePath, payload) => {
+  if (binaryFramesEnabled()) {
+    writeFrameContainer(filePath, payload);
+  } else {
+    fs.writeFileSync(filePath, JSON.stringify(payload));
+  }
+};